@@ -0,0 +1,231 @@
+"""
+Approves community health units and their buffered updates in batches.
+
+Approving units one at a time saves each unit, worker, contact and service
+link separately and pushes every unit to DHIS2 inside the request. Here a
+batch is applied in one transaction with bulk inserts and updates, the
+codes of newly approved units are allocated in one block and each unit is
+queued for a single DHIS2 push once the transaction commits.
+"""
+import reversion
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from common.models import Contact
+
+from .models import (
+    CHUServiceLink,
+    ChuUpdateBuffer,
+    CommunityHealthUnit,
+    CommunityHealthUnitContact,
+    CommunityHealthWorker
+)
+from .tasks import push_chu_to_dhis2
+
+
+def _audit(user, now, instances):
+    for instance in instances:
+        instance.updated = now
+        instance.updated_by = user
+
+
+def _validate(unit):
+    # the related rows are not looked up, the database enforces them
+    unit.clean_fields(exclude=[
+        field.name for field in unit._meta.fields if field.is_relation])
+    unit.clean()
+
+
+def _queue_dhis_pushes(units):
+    if not settings.PUSH_TO_DHIS:
+        return
+    for unit in units:
+        transaction.on_commit(
+            lambda chu_id=str(unit.id): push_chu_to_dhis2.delay(chu_id))
+
+
+def _add_to_revision(units):
+    if reversion.is_active():
+        for unit in units:
+            reversion.add_to_revision(unit)
+
+
+def _apply_workers(buffers, user, now):
+    updated, new = [], []
+    for buffer in buffers:
+        buffer_updated, buffer_new = buffer.worker_changes()
+        updated.extend(buffer_updated)
+        new.extend(buffer_new)
+
+    workers = CommunityHealthWorker.objects.in_bulk(
+        [chew['id'] for chew in updated])
+    changed = []
+    for chew in updated:
+        worker = workers.get(chew['id'])
+        if worker is None:
+            continue
+        worker.first_name = chew['first_name']
+        worker.last_name = chew['last_name']
+        if 'is_incharge' in chew:
+            worker.is_incharge = chew['is_incharge']
+        changed.append(worker)
+    _audit(user, now, changed)
+    CommunityHealthWorker.objects.bulk_update(
+        changed,
+        ['first_name', 'last_name', 'is_incharge', 'updated', 'updated_by'])
+    CommunityHealthWorker.objects.bulk_create(
+        [CommunityHealthWorker(**chew) for chew in new])
+
+
+def _apply_services(buffers):
+    CHUServiceLink.objects.filter(
+        health_unit_id__in=[buffer.health_unit_id for buffer in buffers]
+    ).delete()
+    services = {}
+    for buffer in buffers:
+        for service in buffer.service_changes():
+            services[(buffer.health_unit_id, service['service_id'])] = service
+    CHUServiceLink.objects.bulk_create(
+        [CHUServiceLink(**service) for service in services.values()])
+
+
+def _apply_contacts(buffers):
+    changes = [
+        (buffer, contact)
+        for buffer in buffers for contact in buffer.contact_changes()
+    ]
+    if not changes:
+        return
+
+    def key(contact):
+        return (str(contact['contact_type_id']), contact['contact'])
+
+    lookup = Q()
+    for _, contact in changes:
+        lookup |= Q(
+            contact_type_id=contact['contact_type_id'],
+            contact=contact['contact'])
+    contacts = {}
+    for contact in Contact.objects.filter(lookup):
+        contacts.setdefault(
+            (str(contact.contact_type_id), contact.contact), contact)
+
+    missing = {}
+    for _, contact in changes:
+        if key(contact) not in contacts:
+            missing.setdefault(key(contact), Contact(**contact))
+    Contact.objects.bulk_create(list(missing.values()))
+    contacts.update(missing)
+
+    linked = set(
+        CommunityHealthUnitContact.objects.filter(
+            contact__in=list(contacts.values())
+        ).values_list('contact_id', flat=True))
+    links = []
+    for buffer, contact in changes:
+        contact_obj = contacts[key(contact)]
+        if contact_obj.id in linked:
+            continue
+        linked.add(contact_obj.id)
+        links.append(CommunityHealthUnitContact(
+            contact=contact_obj, health_unit=buffer.health_unit,
+            created_by_id=buffer.created_by_id,
+            updated_by_id=buffer.updated_by_id))
+    CommunityHealthUnitContact.objects.bulk_create(links)
+
+
+def approve_update_buffers(buffers, user):
+    """
+    Applies the pending updates of community health units.
+
+    The buffers' basic details, workers, services and contacts are applied
+    with one bulk operation each. Returns the units that were updated.
+    """
+    buffers = list(
+        ChuUpdateBuffer.objects.filter(
+            pk__in=[getattr(buffer, 'pk', buffer) for buffer in buffers],
+            is_approved=False, is_rejected=False
+        ).select_related('health_unit__facility')
+    )
+    if not buffers:
+        return []
+
+    now = timezone.now()
+    with transaction.atomic():
+        units = {}
+        changed_fields = set(['has_edits', 'updated', 'updated_by'])
+        for buffer in buffers:
+            # buffers of the same unit must update the same instance
+            unit = units.setdefault(buffer.health_unit_id, buffer.health_unit)
+            buffer.health_unit = unit
+            if buffer.basic:
+                for attr, value in buffer.basic_detail_changes().items():
+                    try:
+                        field = CommunityHealthUnit._meta.get_field(attr)
+                    except FieldDoesNotExist:
+                        continue
+                    if not field.primary_key:
+                        setattr(unit, attr, value)
+                        changed_fields.add(field.name)
+            unit.has_edits = False
+
+        units = list(units.values())
+        for unit in units:
+            _validate(unit)
+        _audit(user, now, units)
+
+        _apply_workers([b for b in buffers if b.workers], user, now)
+        _apply_services([b for b in buffers if b.services])
+        _apply_contacts([b for b in buffers if b.contacts])
+
+        CommunityHealthUnit.objects.bulk_update(units, list(changed_fields))
+        ChuUpdateBuffer.objects.filter(
+            pk__in=[buffer.pk for buffer in buffers]
+        ).update(is_approved=True, updated=now, updated_by=user)
+        _add_to_revision(units)
+        _queue_dhis_pushes([unit for unit in units if unit.is_approved])
+    return units
+
+
+def approve_health_units(health_units, user, comment=None):
+    """
+    Approves community health units that are pending approval.
+
+    Units that are approved or rejected already are left as they are. Units
+    approved for the first time are given codes from a single block of the
+    code sequence. Returns the approved units.
+    """
+    units = list(
+        CommunityHealthUnit.objects.filter(
+            pk__in=[getattr(unit, 'pk', unit) for unit in health_units]
+        ).exclude(is_approved=True).exclude(
+            is_rejected=True).select_related('facility')
+    )
+    if not units:
+        return []
+
+    now = timezone.now()
+    with transaction.atomic():
+        without_code = [unit for unit in units if not unit.code]
+        codes = CommunityHealthUnit.generate_code_sequence_block(
+            len(without_code))
+        for unit, code in zip(without_code, codes):
+            unit.code = code
+
+        for unit in units:
+            unit.is_approved = True
+            unit.approval_date = now
+            unit.approval_comment = comment or unit.approval_comment
+            unit.clean()
+        _audit(user, now, units)
+
+        CommunityHealthUnit.objects.bulk_update(units, [
+            'code', 'is_approved', 'approval_date', 'approval_comment',
+            'updated', 'updated_by'])
+        _add_to_revision(units)
+        _queue_dhis_pushes(units)
+    return units
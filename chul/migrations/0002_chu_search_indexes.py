@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-19 14:00
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chul', '0001_initial'),
+        # creates the pg_trgm extension
+        ('facilities', '0003_facility_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='communityhealthunit',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.search.SearchVector('name', config='simple'), name='chu_search_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='communityhealthunit',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['name'], name='chu_name_trgm', opclasses=['gin_trgm_ops']),
+        ),
+    ]
@@ -12,6 +12,7 @@ from django.conf import settings
 from common.models import AbstractBase, Contact, SequenceMixin
 from common.fields import SequenceField
 from facilities.models import Facility
+from search.backends import postgres_search_indexes
 
 
 LOGGER = logging.getLogger(__name__) 
@@ -189,23 +190,21 @@ class CommunityHealthUnit(SequenceMixin, AbstractBase):
                 "contact_type_name": con.contact.contact_type.name
 
             }
-            for con in CommunityHealthUnitContact.objects.filter(
-                health_unit=self)
+            for con in self.communityhealthunitcontact_set.all()
         ]
 
     @property
     def json_features(self):
+        coordinates = self.facility.facility_coordinates_through.coordinates
+        ward = self.facility.ward
         return {
             "geometry": {
-                "coordinates": [
-                    self.facility.facility_coordinates_through.coordinates[0],
-                    self.facility.facility_coordinates_through.coordinates[1]
-                ]
+                "coordinates": [coordinates[0], coordinates[1]]
             },
             "properties": {
-                "ward": self.facility.ward.id,
-                "constituency": self.facility.ward.constituency.id,
-                "county": self.facility.ward.county.id
+                "ward": ward.id,
+                "constituency": ward.constituency_id,
+                "county": ward.constituency.county_id
             }
         }
 
@@ -217,49 +216,52 @@ class CommunityHealthUnit(SequenceMixin, AbstractBase):
         self.validate_date_established_not_in_future()
         self.validate_comment_required_on_rejection()
 
+    @property
+    def pending_update_buffer(self):
+        """
+        The update awaiting approval, if any.
+
+        Uses the ``pending_update_buffers`` prefetched by list views.
+        """
+        if hasattr(self, 'pending_update_buffers'):
+            buffers = self.pending_update_buffers
+            return buffers[0] if buffers else None
+        return ChuUpdateBuffer.objects.filter(
+            is_approved=False, is_rejected=False, health_unit=self).first()
+
     @property
     def pending_updates(self):
-        try:
-            chu = ChuUpdateBuffer.objects.filter(is_approved=False, is_rejected=False, health_unit=self)[0] if len(ChuUpdateBuffer.objects.filter(is_approved=False, is_rejected=False, health_unit=self)) else ChuUpdateBuffer.objects.get(is_approved=False, is_rejected=False, health_unit=self)
-            return chu.updates
-        except ChuUpdateBuffer.DoesNotExist:
-            return {}
+        chu = self.pending_update_buffer
+        return chu.updates if chu else {}
 
     @property
     def latest_update(self):
-        try:
-            chu = ChuUpdateBuffer.objects.filter(is_approved=False, is_rejected=False, health_unit=self)[0] if len(ChuUpdateBuffer.objects.filter(is_approved=False, is_rejected=False, health_unit=self)) else ChuUpdateBuffer.objects.get(is_approved=False, is_rejected=False, health_unit=self)
-            return chu
-        except ChuUpdateBuffer.DoesNotExist:
-            return None
+        return self.pending_update_buffer
 
     def save(self, *args, **kwargs):
-	 # new chus that have just been added but not approved yet
-        if not self.code and not self.is_approved:
-            super(CommunityHealthUnit, self).save(*args, **kwargs)
-        # existing chus that were approved previously and have been updated
-        if self.code and self.is_approved:
-            if settings.PUSH_TO_DHIS:
-                self.push_chu_to_dhis2()
-            super(CommunityHealthUnit, self).save(*args, **kwargs)
-        # chus that have just been approved but don't have a code yet
-        # and have not been pushed to DHIS yet
+        # chus that have just been approved are allocated a code
         if self.is_approved and not self.code:
             self.code = self.generate_next_code_sequence()
-        if settings.PUSH_TO_DHIS:
+        # only approved chus are pushed to DHIS, once per save
+        if self.is_approved and settings.PUSH_TO_DHIS:
             self.push_chu_to_dhis2()
         super(CommunityHealthUnit, self).save(*args, **kwargs)
 
     @property
     def average_rating(self):
+        if hasattr(self, 'annotated_average_rating'):
+            return self.annotated_average_rating or 0
         return self.chu_ratings.aggregate(r=models.Avg('rating'))['r'] or 0
 
     @property
     def rating_count(self):
+        if hasattr(self, 'annotated_rating_count'):
+            return self.annotated_rating_count or 0
         return self.chu_ratings.count()
 
     def push_chu_to_dhis2(self):
-        from facilities.models.facility_models import DhisAuth
+        from facilities.models.facility_models import (
+            DhisAuth, DhisOrgUnit, DHIS_FACILITY_LEVEL)
         import requests
         dhisauth = DhisAuth()
         dhisauth.get_oauth2_token()
@@ -315,6 +317,9 @@ class CommunityHealthUnit(SequenceMixin, AbstractBase):
                                "Or some specific information like codes are not unique"]
                 }
             )
+        DhisOrgUnit.objects.record(
+            unit_uuid, str(self.code), str(self.name),
+            DHIS_FACILITY_LEVEL + 1, facility_dhis_id)
         self.push_chu_metadata(metadata_payload, unit_uuid)
 
     def push_chu_metadata(self, metadata_payload, chu_uid):
@@ -331,7 +336,14 @@ class CommunityHealthUnit(SequenceMixin, AbstractBase):
         LOGGER.info('Metadata CUs pushed successfullly')
 
     def get_facility_dhis2_parent_id(self):
-        from facilities.models.facility_models import DhisAuth
+        from facilities.models.facility_models import (
+            DhisOrgUnit, DHIS_FACILITY_LEVEL)
+        import requests
+        facility_dhis_id = DhisOrgUnit.objects.resolve_code(
+            self.facility.code, level=DHIS_FACILITY_LEVEL)
+        if facility_dhis_id:
+            return facility_dhis_id
+
         LOGGER.info('[ERROR] Facility Code : {}'.format(self.facility.code))
         r = requests.get(
             settings.DHIS_ENDPOINT + "api/organisationUnits.json",
@@ -360,6 +372,7 @@ class CommunityHealthUnit(SequenceMixin, AbstractBase):
 
     class Meta(AbstractBase.Meta):
         unique_together = ('name', 'facility', )
+        indexes = postgres_search_indexes('chu', ['name'])
         permissions = (
             (
                 "view_rejected_chus",
@@ -479,72 +492,85 @@ class ChuUpdateBuffer(AbstractBase):
                 self.basic and not self.is_new:
             raise ValidationError({"__all__": ["Nothing was edited"]})
 
+    def basic_detail_changes(self):
+        """Maps the health unit's attributes to their buffered values"""
+        basic_details = json.loads(self.basic)
+        if 'status' in basic_details:
+            basic_details['status_id'] = basic_details.pop(
+                'status').get('status_id')
+        if 'facility' in basic_details:
+            basic_details['facility_id'] = basic_details.pop(
+                'facility').get('facility_id')
+        if 'basic' in basic_details:
+            basic_details['facility_id'] = basic_details.pop(
+                'basic').get('facility')
+        return basic_details
+
     def update_basic_details(self):
         if self.basic:
-            basic_details = json.loads(self.basic)
-            if 'status' in basic_details:
-                basic_details['status_id'] = basic_details.get(
-                    'status').get('status_id')
-                basic_details.pop('status')
-            if 'facility' in basic_details:
-                basic_details['facility_id'] = basic_details.get(
-                    'facility').get('facility_id')
-                basic_details.pop('facility')
-           
-            
-            for key, value in basic_details.iteritems():
+            for key, value in self.basic_detail_changes().items():
                 setattr(self.health_unit, key, value)
-            if 'basic' in basic_details:
-                setattr(self.health_unit, 'facility_id', basic_details.get('basic').get('facility'))
             self.health_unit.save()
 
-    def update_workers(self):
-        chews = json.loads(self.workers)
-        for chew in chews:
+    def worker_changes(self):
+        """
+        Returns the buffered workers as ( updated, new ) lists of dicts.
+        """
+        updated, new = [], []
+        for chew in json.loads(self.workers):
             chew['health_unit'] = self.health_unit
             chew['created_by_id'] = self.created_by_id
             chew['updated_by_id'] = self.updated_by_id
             chew.pop('created_by', None)
             chew.pop('updated_by', None)
-            if 'id' in chew:
-                chew_obj = CommunityHealthWorker.objects.get(
-                    id=chew['id'])
-                chew_obj.first_name = chew['first_name']
-                chew_obj.last_name = chew['last_name']
-                if 'is_incharge' in chew:
-                    chew_obj.is_incharge = chew['is_incharge']
-                chew_obj.save()
-            else:
-                CommunityHealthWorker.objects.create(**chew)
+            (updated if 'id' in chew else new).append(chew)
+        return updated, new
 
-    def update_services(self):
-        services = json.loads(self.services)
-        CHUServiceLink.objects.filter(health_unit=self.health_unit).delete()
-        for service in services:
+    def update_workers(self):
+        updated, new = self.worker_changes()
+        for chew in updated:
+            chew_obj = CommunityHealthWorker.objects.get(id=chew['id'])
+            chew_obj.first_name = chew['first_name']
+            chew_obj.last_name = chew['last_name']
+            if 'is_incharge' in chew:
+                chew_obj.is_incharge = chew['is_incharge']
+            chew_obj.save()
+        for chew in new:
+            CommunityHealthWorker.objects.create(**chew)
+
+    def service_changes(self):
+        """The buffered service links as dicts, without duplicates"""
+        services = {}
+        for service in json.loads(self.services):
             service['health_unit'] = self.health_unit
             service['created_by_id'] = self.created_by_id
             service['updated_by_id'] = self.updated_by_id
             service.pop('created_by', None)
             service.pop('updated_by', None)
             service.pop('name', None)
-            try:
-                CHUServiceLink.objects.get(
-                    service_id=service['service'],
-                    health_unit=self.health_unit)
-            except CHUServiceLink.DoesNotExist:
-                service['service_id'] = service.pop('service')
-                CHUServiceLink.objects.create(**service)
+            service['service_id'] = service.pop('service')
+            services.setdefault(service['service_id'], service)
+        return list(services.values())
 
-    def update_contacts(self):
-        contacts = json.loads(self.contacts)
-        for contact in contacts:
+    def update_services(self):
+        CHUServiceLink.objects.filter(health_unit=self.health_unit).delete()
+        for service in self.service_changes():
+            CHUServiceLink.objects.create(**service)
+
+    def contact_changes(self):
+        """The buffered contacts as dicts of ``Contact`` attributes"""
+        contacts = []
+        for contact in json.loads(self.contacts):
             contact['updated_by_id'] = self.updated_by_id
             contact['created_by_id'] = self.created_by_id
-            contact['contact_type_id'] = contact['contact_type']
-            contact.pop('contact_type', None)
+            contact['contact_type_id'] = contact.pop('contact_type')
             contact.pop('contact_id', None)
             contact.pop('contact_type_name', None)
-            contact['contact'] = contact['contact']
+            contacts.append(contact)
+        return contacts
+
+    def update_contacts(self):
+        for contact in self.contact_changes():
             contact_data = {
                 'contact_type_id': contact['contact_type_id'],
                 'contact': contact['contact']
@@ -1,5 +1,7 @@
 import json
 
+from django.db.models import (
+    Avg, Count, IntegerField, OuterRef, Prefetch, Subquery)
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 
@@ -43,6 +45,23 @@ class ChuUpdateBufferSerializer(
         model = ChuUpdateBuffer
 
 
+class ChuBatchApprovalSerializer(serializers.Serializer):
+    health_units = serializers.ListField(
+        child=serializers.UUIDField(), required=False, default=list)
+    updates = serializers.ListField(
+        child=serializers.UUIDField(), required=False, default=list)
+    approval_comment = serializers.CharField(
+        required=False, allow_blank=True, allow_null=True)
+
+    def validate(self, attrs):
+        if not attrs['health_units'] and not attrs['updates']:
+            raise ValidationError({
+                "__all__": [
+                    "Provide the health units or the updates to approve"]
+            })
+        return attrs
+
+
 class CHUServiceSerializer(AbstractFieldsMixin, serializers.ModelSerializer):
 
     class Meta(AbstractFieldsMixin.Meta):
@@ -96,6 +115,46 @@ class CommunityHealthUnitSerializer(
         model = CommunityHealthUnit
         read_only_fields = ('code', )
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """
+        Loads what the representation needs in a fixed number of queries.
+
+        The ratings are annotated and the related rows are prefetched so
+        that serializing a page does not query per community unit.
+        """
+        ratings = CHURating.objects.filter(
+            chu=OuterRef('pk')).order_by().values('chu')
+        return queryset.select_related(
+            'status',
+            'facility__ward__sub_county',
+            'facility__ward__wardboundary',
+            'facility__ward__constituency__constituencyboundary',
+            'facility__ward__constituency__county__countyboundary',
+            'facility__facility_coordinates_through',
+        ).prefetch_related(
+            'health_unit_workers',
+            Prefetch(
+                'communityhealthunitcontact_set',
+                queryset=CommunityHealthUnitContact.objects.select_related(
+                    'contact__contact_type')),
+            Prefetch(
+                'services',
+                queryset=CHUServiceLink.objects.select_related('service')),
+            Prefetch(
+                'chuupdatebuffer_set',
+                queryset=ChuUpdateBuffer.objects.filter(
+                    is_approved=False, is_rejected=False
+                ).select_related('updated_by'),
+                to_attr='pending_update_buffers'),
+        ).annotate(
+            annotated_average_rating=Subquery(
+                ratings.annotate(average=Avg('rating')).values('average')),
+            annotated_rating_count=Subquery(
+                ratings.annotate(count=Count('id')).values('count'),
+                output_field=IntegerField()),
+        )
+
     def get_basic_updates(self, chu_instance, validated_data):
         updates = self.initial_data
         if ('facility' in self.initial_data and
@@ -0,0 +1,25 @@
+import logging
+
+from celery import shared_task
+
+from .models import CommunityHealthUnit
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+@shared_task(name='push_chu_to_dhis2')
+def push_chu_to_dhis2(chu_id):
+    """
+    Push an approved community health unit to DHIS2.
+
+    Queued once per unit after a batch approval commits, so that the DHIS2
+    round trips happen outside the approval transaction.
+    """
+    chu = CommunityHealthUnit.objects.select_related('facility').get(
+        id=chu_id)
+    try:
+        chu.push_chu_to_dhis2()
+    except Exception:
+        LOGGER.exception("Unable to push CHU {} to DHIS2".format(chu_id))
+        raise
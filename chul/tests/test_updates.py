@@ -1,4 +1,10 @@
+import datetime
+import json
+from io import StringIO
+
+from django.core.management import call_command
 from django.core.urlresolvers import reverse
+from mock import patch
 
 from common.tests.test_views import LoginMixin
 from common.models import ContactType, Contact
@@ -7,13 +13,17 @@ from rest_framework.test import APITestCase
 from model_mommy import mommy
 
 from facilities.models import Facility
+from users.models import MflUser
 
+from ..approvals import approve_health_units, approve_update_buffers
 from ..models import (
     CommunityHealthUnit,
     ChuUpdateBuffer,
     Status,
     CommunityHealthWorker,
-    CommunityHealthUnitContact)
+    CommunityHealthUnitContact,
+    CHUService,
+    CHUServiceLink)
 
 
 class TestCHUpdatesApproval(LoginMixin, APITestCase):
@@ -508,3 +518,162 @@ class TestCHUpdatesApproval(LoginMixin, APITestCase):
         self.assertEquals(2, CommunityHealthUnitContact.objects.count())
         self.assertEquals(2, CommunityHealthUnitContact.objects.filter(
             health_unit=chu_refetched).count())
+
+
+class TestBatchApproval(LoginMixin, APITestCase):
+
+    def setUp(self):
+        self.url = reverse("api:chul:chu_batch_approval")
+        super(TestBatchApproval, self).setUp()
+
+    def _approved_chu(self):
+        chu = mommy.make(CommunityHealthUnit)
+        chu.is_approved = True
+        chu.save()
+        return chu
+
+    def test_approve_health_units_allocates_codes(self):
+        chus = mommy.make(CommunityHealthUnit, _quantity=3)
+        self.assertTrue(all(chu.code is None for chu in chus))
+
+        with self.settings(PUSH_TO_DHIS=True), \
+                patch('chul.approvals.push_chu_to_dhis2') as push, \
+                self.captureOnCommitCallbacks(execute=True):
+            approved = approve_health_units(chus, self.user, comment='ok')
+
+        self.assertEquals(3, len(approved))
+        codes = set(CommunityHealthUnit.objects.values_list('code', flat=True))
+        self.assertEquals(3, len(codes))
+        self.assertNotIn(None, codes)
+        self.assertEquals(
+            3, CommunityHealthUnit.objects.filter(
+                is_approved=True, approval_comment='ok').count())
+        self.assertEquals(
+            sorted(str(chu.id) for chu in chus),
+            sorted(call[0][0] for call in push.delay.call_args_list))
+
+    def test_approve_health_units_skips_approved_units(self):
+        chu = self._approved_chu()
+        self.assertEquals([], approve_health_units([chu.id], self.user))
+
+    def test_approve_health_units_skips_rejected_units(self):
+        chu = mommy.make(
+            CommunityHealthUnit, is_rejected=True, rejection_reason='No')
+        self.assertEquals([], approve_health_units([chu.id], self.user))
+        chu_refetched = CommunityHealthUnit.objects.get(id=chu.id)
+        self.assertTrue(chu_refetched.is_rejected)
+        self.assertFalse(chu_refetched.is_approved)
+
+    def test_approve_chus_command_skips_invalid_units(self):
+        valid_chu = mommy.make(CommunityHealthUnit)
+        invalid_chu = mommy.make(CommunityHealthUnit)
+        rejected_chu = mommy.make(
+            CommunityHealthUnit, is_rejected=True, rejection_reason='No')
+        CommunityHealthUnit.objects.filter(id=invalid_chu.id).update(
+            date_operational=datetime.date.today() + datetime.timedelta(
+                days=1))
+        out, err = StringIO(), StringIO()
+
+        call_command('approve_chus', stdout=out, stderr=err)
+
+        self.assertIn(
+            "Approved 1 community health units, skipped 1", out.getvalue())
+        self.assertIn(str(invalid_chu.id), err.getvalue())
+        self.assertTrue(
+            CommunityHealthUnit.objects.get(id=valid_chu.id).is_approved)
+        self.assertFalse(
+            CommunityHealthUnit.objects.get(id=invalid_chu.id).is_approved)
+        self.assertFalse(
+            CommunityHealthUnit.objects.get(id=rejected_chu.id).is_approved)
+
+    def test_approve_update_buffers(self):
+        chu = self._approved_chu()
+        other_chu = self._approved_chu()
+        worker = mommy.make(
+            CommunityHealthWorker, health_unit=chu, first_name='old')
+        service = mommy.make(CHUService)
+        contact_type = mommy.make(ContactType)
+        update = mommy.make(
+            ChuUpdateBuffer, health_unit=chu,
+            basic=json.dumps({"name": "Jina mpya"}),
+            workers=json.dumps([
+                {"id": str(worker.id), "first_name": "new",
+                 "last_name": "name"},
+                {"first_name": "Chew", "last_name": "mpya"}
+            ]),
+            services=json.dumps([{"service": str(service.id)}]),
+            contacts=json.dumps([
+                {"contact_type": str(contact_type.id), "contact": "0700"}
+            ]))
+        other_update = mommy.make(
+            ChuUpdateBuffer, health_unit=other_chu,
+            contacts=json.dumps([
+                {"contact_type": str(contact_type.id), "contact": "0711"}
+            ]))
+
+        with self.settings(PUSH_TO_DHIS=True), \
+                patch('chul.approvals.push_chu_to_dhis2') as push, \
+                self.captureOnCommitCallbacks(execute=True):
+            updated = approve_update_buffers(
+                [update, other_update], self.user)
+
+        self.assertEquals(2, len(updated))
+        self.assertEquals(2, push.delay.call_count)
+        chu_refetched = CommunityHealthUnit.objects.get(id=chu.id)
+        self.assertEquals("Jina mpya", chu_refetched.name)
+        self.assertFalse(chu_refetched.has_edits)
+        self.assertEquals(
+            "new", CommunityHealthWorker.objects.get(id=worker.id).first_name)
+        self.assertEquals(
+            2, CommunityHealthWorker.objects.filter(health_unit=chu).count())
+        self.assertEquals(
+            1, CHUServiceLink.objects.filter(
+                health_unit=chu, service=service).count())
+        self.assertEquals(
+            1, CommunityHealthUnitContact.objects.filter(
+                health_unit=chu, contact__contact='0700').count())
+        self.assertEquals(
+            1, CommunityHealthUnitContact.objects.filter(
+                health_unit=other_chu, contact__contact='0711').count())
+        self.assertEquals(
+            2, ChuUpdateBuffer.objects.filter(is_approved=True).count())
+
+    def test_batch_approval_endpoint(self):
+        chu = mommy.make(CommunityHealthUnit)
+        update = mommy.make(
+            ChuUpdateBuffer, health_unit=self._approved_chu(),
+            basic=json.dumps({"name": "Jina mpya"}))
+        data = {
+            "health_units": [str(chu.id)],
+            "updates": [str(update.id)]
+        }
+        response = self.client.post(self.url, data)
+        self.assertEquals(200, response.status_code)
+        self.assertEquals([chu.id], response.data['approved'])
+        self.assertEquals([update.health_unit.id], response.data['updated'])
+        self.assertTrue(CommunityHealthUnit.objects.get(id=chu.id).is_approved)
+
+    def test_batch_approval_requires_ids(self):
+        response = self.client.post(self.url, {})
+        self.assertEquals(400, response.status_code)
+
+    def test_batch_approval_requires_permission(self):
+        user = mommy.make(MflUser)
+        self.client.force_authenticate(user)
+        chu = mommy.make(CommunityHealthUnit)
+        response = self.client.post(
+            self.url, {"health_units": [str(chu.id)]})
+        self.assertEquals(403, response.status_code)
+        self.assertFalse(
+            CommunityHealthUnit.objects.get(id=chu.id).is_approved)
+
+    def test_save_pushes_approved_chu_once(self):
+        chu = mommy.make(CommunityHealthUnit)
+        with self.settings(PUSH_TO_DHIS=True), patch.object(
+                CommunityHealthUnit, 'push_chu_to_dhis2') as push:
+            chu.save()
+            self.assertEquals(0, push.call_count)
+            chu.is_approved = True
+            chu.save()
+            self.assertEquals(1, push.call_count)
+            self.assertIsNotNone(chu.code)
@@ -1,5 +1,7 @@
 from django.core.urlresolvers import reverse
 from django.contrib.auth.models import Group, Permission
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
 from model_mommy import mommy
 
@@ -17,6 +19,9 @@ from ..models import (
     CommunityHealthWorker,
     CommunityHealthWorkerContact,
     CHUService,
+    CHUServiceLink,
+    CHURating,
+    ChuUpdateBuffer,
     CommunityHealthUnitContact
 )
 from ..serializers import (
@@ -376,6 +381,64 @@ class TestCommunityHealthUnitView(ViewTestBase):
         self.assertEquals(200, response.status_code)
         self.assertEquals(1, response.data.get('count'))
 
+    def test_searched_chus_are_kept_to_the_users_area(self):
+        county_user = mommy.make(MflUser, is_superuser=True)
+        county = mommy.make(County)
+        mommy.make(UserCounty, user=county_user, county=county)
+        ward = mommy.make(
+            Ward, constituency=mommy.make(Constituency, county=county))
+        chu = mommy.make(
+            CommunityHealthUnit, name='Kibera Community Unit',
+            facility=mommy.make(Facility, ward=ward))
+        mommy.make(CommunityHealthUnit, name='Kibera Community Unit')
+        url = reverse("api:chul:community_health_units_list")
+        self.client.force_authenticate(county_user)
+
+        response = self.client.get(url + '?search=kibera')
+        self.assertEquals(200, response.status_code)
+        self.assertEquals(
+            [str(chu.id)],
+            [str(result['id']) for result in response.data['results']])
+
+    def _make_populated_health_unit(self):
+        health_unit = mommy.make(CommunityHealthUnit)
+        mommy.make(CommunityHealthWorker, health_unit=health_unit)
+        mommy.make(CommunityHealthWorker, health_unit=health_unit)
+        mommy.make(
+            CommunityHealthUnitContact, health_unit=health_unit,
+            contact=mommy.make(Contact))
+        mommy.make(CHUServiceLink, health_unit=health_unit)
+        mommy.make(CHURating, chu=health_unit, rating=3)
+        mommy.make(CHURating, chu=health_unit, rating=4)
+        mommy.make(
+            ChuUpdateBuffer, health_unit=health_unit,
+            basic='{"name": "new name"}')
+        return health_unit
+
+    def _count_list_queries(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.url)
+        self.assertEquals(200, response.status_code)
+        return len(context.captured_queries), response
+
+    def test_list_query_count_does_not_grow_with_health_units(self):
+        self._make_populated_health_unit()
+        single_count, response = self._count_list_queries()
+        self.assertEquals(1, response.data.get('count'))
+
+        for _ in range(4):
+            self._make_populated_health_unit()
+        many_count, response = self._count_list_queries()
+        self.assertEquals(5, response.data.get('count'))
+        self.assertEquals(single_count, many_count)
+
+        result = response.data['results'][0]
+        self.assertEquals(3.5, result['avg_rating'])
+        self.assertEquals(2, result['number_of_ratings'])
+        self.assertEquals(2, len(result['health_unit_workers']))
+        self.assertEquals(1, len(result['contacts']))
+        self.assertTrue(result['pending_updates'])
+
 
 class TestCommunityHealthWorkerView(ViewTestBase):
 
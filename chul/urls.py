@@ -9,6 +9,9 @@ urlpatterns = (
     path('updates/', views.ChuUpdateBufferListView.as_view(),
         name='chu_updatebufers_list'),
 
+    path('approvals/', views.ChuBatchApprovalView.as_view(),
+        name='chu_batch_approval'),
+
     path('updates/<str:pk>/',
         views.ChuUpdateBufferDetailView.as_view(),
         name="chu_updatebuffer_detail"),
@@ -1,9 +1,12 @@
-from django.template import loader, Context
-from django.utils import timezone
-from django.views.decorators.cache import never_cache
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
+from django.utils.functional import cached_property
 from rest_framework import generics
-from common.views import AuditableDetailViewMixin, DownloadPDFMixin
-from common.models import UserConstituency, UserCounty, UserSubCounty
+from rest_framework.exceptions import PermissionDenied, ValidationError
+from rest_framework.response import Response
+from common.views import AuditableDetailViewMixin, CachedPDFReportMixin
+from common.utilities.area_scope import (
+    AdminAreaScope, model_field_names, ward_area_lookups)
 from .models import (
     CommunityHealthUnit,
     CommunityHealthWorker,
@@ -14,6 +17,7 @@ from .models import (
     CHURating,
     ChuUpdateBuffer
 )
+from .approvals import approve_health_units, approve_update_buffers
 
 from .serializers import (
     CommunityHealthUnitSerializer,
@@ -23,7 +27,8 @@ from .serializers import (
     CommunityHealthUnitContactSerializer,
     CHUServiceSerializer,
     CHURatingSerializer,
-    ChuUpdateBufferSerializer
+    ChuUpdateBufferSerializer,
+    ChuBatchApprovalSerializer
 )
 
 from .filters import (
@@ -40,95 +45,29 @@ from .filters import (
 
 class FilterCommunityUnitsMixin(object):
 
-    def filter_approved_chus(self):
-        if self.request.user.has_perm(
-            "chul.view_unapproved_facilities") \
-            is False and 'approved' in [
-                field.name for field in
-                self.queryset.model._meta.get_fields()]:
-
-            # filter both facilities and facilities materialized view
-            try:
-                self.queryset = self.queryset.filter(approved=True, operation_status__is_public_visible=True)
-            except:
-                self.queryset = self.queryset.filter(approved=True, is_public_visible=True)
-
-    def filter_rejected_chus(self):
-        if self.request.user.has_perm("chul.view_rejected_chus") \
-            is False and ('rejected' in [
-                field.name for field in
-                self.queryset.model._meta.get_fields()]):
-            self.queryset = self.queryset.filter(rejected=False)
-
-    def filter_for_national_users(self):
-        if self.request.user.is_national:
-            self.queryset = self.queryset
-
-
-    def filter_for_county_users(self):
-        if self.request.user.county:
-            self.queryset = self.queryset.filter(
-                facility__ward__constituency__county__in=[
-                    uc.county for uc in UserCounty.objects.filter(
-                        user=self.request.user)
-                ])
-
-    def filter_for_sub_county_users(self):
-        if self.request.user.sub_county:
-            self.queryset = self.queryset.filter(
-                facility__ward__sub_county__in=[
-                    us.sub_county for us in UserSubCounty.objects.filter(
-                        user=self.request.user)
-                ])
-
-    def filter_for_consituency_users(self):
-        if self.request.user.constituency:
-            self.queryset = self.queryset.filter(
-                facility__ward__constituency__in=[
-                    uc.constituency for uc in UserConstituency.objects.filter(
-                        user=self.request.user)
-                ])
-
-        
-    
+    """
+    Confines the listed community units to what a user should see.
+
+    Users assigned to counties, constituencies or sub counties only see the
+    units of facilities in their areas ( see ``AdminAreaScope`` ).
+    """
+
+    area_lookups = ward_area_lookups('facility__ward')
+
+    @cached_property
+    def area_scope(self):
+        return AdminAreaScope(self.request.user)
+
+    def filter_rejected_chus(self, queryset):
+        if 'rejected' in model_field_names(queryset.model) and \
+                self.request.user.has_perm("chul.view_rejected_chus") is False:
+            queryset = queryset.filter(rejected=False)
+        return queryset
+
     def get_queryset(self, *args, **kwargs):
-        custom_queryset = kwargs.pop('custom_queryset', None)
-        if hasattr(custom_queryset, 'count'):
-            self.queryset = custom_queryset
-
-        self.filter_for_county_users()
-        self.filter_for_consituency_users()  
-        self.filter_for_sub_county_users()
-        self.filter_rejected_chus()
-
-        # if not self.request.user.has_perm(
-        #         "facilities.view_unpublished_facilities"):
-        #     self.queryset = self.queryset.filter(facility__approved=True)
-
-        # if not self.request.user.has_perm(
-        #         "chul.view_rejected_chus"):
-        #     self.queryset = self.queryset.filter(is_approved=True)
-
-        return self.queryset
-
-    def filter_queryset(self, queryset):
-        """
-        Overridden in order to constrain search results to what a user should
-        see.
-        """
-        # if 'search' in self.request.query_params:
-        #     search_term = self.request.query_params.get('search')
-        #     if search_term.isdigit():
-        #         queryset = self.queryset.filter(code=search_term)
-        #     else:
-        #         queryset = super(
-        #             FilterCommunityUnitsMixin, self).filter_queryset(queryset)
-        # else:
-        #     queryset = super(
-        #         FilterCommunityUnitsMixin, self).filter_queryset(queryset)
-
-        queryset = super(FilterCommunityUnitsMixin, self).filter_queryset(queryset)
-        return self.get_queryset(custom_queryset=queryset)
+        queryset = super(FilterCommunityUnitsMixin, self).get_queryset()
+        queryset = self.area_scope.filter(queryset, self.area_lookups)
+        return self.filter_rejected_chus(queryset)
 
 
 class CHUServiceListView(generics.ListCreateAPIView):
@@ -233,7 +172,8 @@ class CommunityHealthUnitListView(
     active  -- Boolean is the record active
     deleted -- Boolean is the record deleted
     """
-    queryset = CommunityHealthUnit.objects.all()
+    queryset = CommunityHealthUnitSerializer.setup_eager_loading(
+        CommunityHealthUnit.objects.all())
     serializer_class = CommunityHealthUnitSerializer
     filter_class = CommunityHealthUnitFilter
     ordering_fields = ('name', 'facility', 'code',)
@@ -353,17 +293,50 @@ class ChuUpdateBufferDetailView(
     serializer_class = ChuUpdateBufferSerializer
 
 
-class CHUDetailReport(DownloadPDFMixin, generics.RetrieveAPIView):
+class ChuBatchApprovalView(generics.GenericAPIView):
+
+    """
+    Approves community health units and pending updates in one batch
+
+    health_units -- The ids of the health units to approve
+    updates -- The ids of the update buffers to approve
+    approval_comment -- A comment recorded on the approved health units
+    """
     queryset = CommunityHealthUnit.objects.all()
+    serializer_class = ChuBatchApprovalSerializer
+
+    def post(self, request, *args, **kwargs):
+        if not request.user.has_perm('chul.can_approve_chu'):
+            raise PermissionDenied()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        try:
+            with transaction.atomic():
+                approved = approve_health_units(
+                    data['health_units'], request.user,
+                    comment=data.get('approval_comment'))
+                updated = approve_update_buffers(
+                    data['updates'], request.user)
+        except DjangoValidationError as e:
+            raise ValidationError(e.message_dict)
+
+        return Response({
+            "approved": [unit.id for unit in approved],
+            "updated": [unit.id for unit in updated]
+        })
+
+
+class CHUDetailReport(CachedPDFReportMixin, generics.RetrieveAPIView):
+    queryset = CommunityHealthUnit.objects.select_related(
+        'status', 'facility__ward__constituency__county',
+        'facility__ward__sub_county')
     serializer_class = CommunityHealthUnitSerializer
+    report_tpl = "chu_details.html"
 
-    @never_cache
-    def get(self, *args, **kwargs):
-        report_date = timezone.now().isoformat()
-        chu = self.get_object()
-        context = Context({
-            "chu": self.get_serializer(instance=chu).data,
-            "report_date": report_date
-        })
-        template = loader.get_template("chu_details.html")
-        return self.download_file(template.render(context), chu.name)
+    @classmethod
+    def get_report_context(cls, chu, variant):
+        return {
+            "chu": CommunityHealthUnitSerializer(instance=chu).data
+        }
@@ -0,0 +1,81 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand, CommandError
+
+from common.models import County
+from common.utilities.cache_warmup import (
+    CacheWarmup,
+    cacheable_endpoints,
+    scoped_paths
+)
+
+
+def _default_host():
+    for host in settings.ALLOWED_HOSTS:
+        if host and not host.startswith(('.', '*')):
+            return host
+    return 'localhost'
+
+
+class Command(BaseCommand):
+    help = (
+        "Renders the cached API endpoints for the whole country and for "
+        "each county so that the caches are warm after a deploy.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--host',
+            dest='host',
+            default=_default_host(),
+            help='The host that clients request the API from')
+        parser.add_argument(
+            '--secure',
+            action='store_true',
+            dest='secure',
+            default=False,
+            help='Clients request the API over https')
+        parser.add_argument(
+            '--user',
+            dest='user',
+            default=None,
+            help='The username to render as, defaults to a superuser')
+        parser.add_argument(
+            '--workers',
+            type=int,
+            dest='workers',
+            default=4,
+            help='The number of endpoints rendered at the same time')
+
+    def _get_user(self, username):
+        users = get_user_model().objects.filter(is_active=True)
+        if username:
+            users = users.filter(**{users.model.USERNAME_FIELD: username})
+        else:
+            users = users.filter(is_superuser=True).order_by('date_joined')
+        user = users.first()
+        if user is None:
+            raise CommandError("No active user to render the endpoints as")
+        return user
+
+    def _report(self, rendered):
+        self.stdout.write("{:8.2f}s {} {:>10} {} [{}]".format(
+            rendered.seconds, rendered.status_code, rendered.size,
+            rendered.path, rendered.scope))
+
+    def handle(self, *args, **options):
+        warmup = CacheWarmup(
+            self._get_user(options['user']), options['host'],
+            secure=options['secure'], workers=options['workers'])
+        paths = list(scoped_paths(
+            cacheable_endpoints(), County.objects.order_by('name')))
+        start = time.perf_counter()
+        rendered = warmup.run(paths, callback=self._report)
+
+        failed = [result for result in rendered if result.status_code != 200]
+        self.stdout.write(
+            "Rendered {} endpoints in {:.2f}s, {} failed".format(
+                len(rendered), time.perf_counter() - start, len(failed)))
+        if failed:
+            raise CommandError("Some endpoints could not be rendered")
@@ -0,0 +1,129 @@
+"""
+Compresses API responses with brotli or gzip.
+
+The encoding is negotiated from the request's ``Accept-Encoding``. Brotli
+is preferred when the ``brotli`` package is installed. Only responses of
+textual content types that are larger than ``COMPRESSION_MIN_SIZE`` are
+compressed.
+
+Large payloads e.g. the GIS boundaries and the filtering summaries are
+served from the cache unchanged for a long time. Their compressed forms are
+cached against a digest of the uncompressed content, so each is compressed
+once for as long as the content does not change rather than once per
+request. The site wide cache middleware stores the compressed responses,
+one per ``Accept-Encoding``, since the responses vary on it.
+"""
+import hashlib
+import re
+
+from django.conf import settings
+from django.core.cache import cache
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_string
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+
+COMPRESSED_KEY = 'compressed_response:{}:{}'
+
+COMPRESSIBLE_TYPES = (
+    'application/json', 'application/geo+json', 'application/javascript',
+    'application/xml', 'text/',
+)
+
+ACCEPT_ENCODING_RE = re.compile(
+    r'\s*([a-z0-9*-]+)\s*(?:;\s*q\s*=\s*([0-9.]+))?\s*', re.IGNORECASE)
+
+
+def accepted_encodings(accept_encoding):
+    """Returns {encoding: quality} from an Accept-Encoding header"""
+    encodings = {}
+    for part in accept_encoding.split(','):
+        match = ACCEPT_ENCODING_RE.fullmatch(part)
+        if not match:
+            continue
+        try:
+            quality = float(match.group(2)) if match.group(2) else 1.0
+        except ValueError:
+            continue
+        encodings[match.group(1).lower()] = quality
+    return encodings
+
+
+def choose_encoding(accept_encoding):
+    encodings = accepted_encodings(accept_encoding)
+    available = ['br', 'gzip'] if brotli is not None else ['gzip']
+    wildcard = encodings.get('*', 0)
+    best, best_quality = None, 0
+    for encoding in available:
+        quality = encodings.get(encoding, wildcard)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(content, encoding):
+    if encoding == 'br':
+        return brotli.compress(
+            content, quality=settings.COMPRESSION_BROTLI_QUALITY)
+    return compress_string(
+        content, max_random_bytes=GZipMiddleware.max_random_bytes)
+
+
+def compressed_content(content, encoding):
+    """
+    Compresses the content, large payloads are compressed once and kept in
+    the cache against a digest of the uncompressed content
+    """
+    if len(content) < settings.COMPRESSION_PRECOMPRESS_MIN_SIZE:
+        return compress(content, encoding)
+
+    key = COMPRESSED_KEY.format(
+        encoding, hashlib.blake2b(content, digest_size=20).hexdigest())
+    compressed = cache.get(key)
+    if compressed is None:
+        compressed = compress(content, encoding)
+        cache.set(key, compressed, settings.COMPRESSION_CACHE_SECONDS)
+    return compressed
+
+
+def is_compressible(response):
+    content_type = response.get('Content-Type', '').lower()
+    return any(content_type.startswith(compressible)
+               for compressible in COMPRESSIBLE_TYPES)
+
+
+class CompressionMiddleware(object):
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if response.streaming or response.has_header('Content-Encoding') \
+                or not is_compressible(response) \
+                or len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = choose_encoding(
+            request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+
+        compressed = compressed_content(response.content, encoding)
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        response['Content-Encoding'] = encoding
+        # the compressed content is not byte for byte the same
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 09:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('common', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='errorqueue',
+            name='next_attempt_at',
+            field=models.DateTimeField(blank=True, help_text='The earliest time the failed action should be retried', null=True),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-19 10:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reversion', '0002_add_index_on_version_for_content_type_and_db'),
+        ('common', '0002_errorqueue_next_attempt_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RevisionDiff',
+            fields=[
+                ('version', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to='reversion.version')),
+                ('updates', models.TextField(help_text='The JSON encoded field changes')),
+                ('previous_version', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='reversion.version')),
+            ],
+        ),
+    ]
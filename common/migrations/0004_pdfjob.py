@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-19 12:00
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('common', '0003_revisiondiff'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PDFJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('report', models.CharField(max_length=255)),
+                ('object_id', models.CharField(max_length=100)),
+                ('variant', models.CharField(blank=True, default='', max_length=50)),
+                ('file_name', models.CharField(max_length=255)),
+                ('status', models.CharField(choices=[('PENDING', 'Waiting to be rendered'), ('DONE', 'Rendered'), ('FAILED', 'Rendering failed')], default='PENDING', max_length=20)),
+                ('file_path', models.CharField(blank=True, max_length=255, null=True)),
+                ('except_message', models.TextField(blank=True, null=True)),
+                ('created', models.DateTimeField(default=django.utils.timezone.now)),
+                ('updated', models.DateTimeField(default=django.utils.timezone.now)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ('-created',),
+            },
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.7 on 2026-10-19 12:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('common', '0004_pdfjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchIndexBuild',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('alias', models.CharField(max_length=100)),
+                ('index_name', models.CharField(max_length=100, unique=True)),
+                ('status', models.CharField(choices=[('BUILDING', 'Building'), ('DONE', 'Serving searches'), ('FAILED', 'Failed')], default='BUILDING', max_length=20)),
+                ('except_message', models.TextField(blank=True, null=True)),
+                ('created', models.DateTimeField(default=django.utils.timezone.now)),
+                ('updated', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'ordering': ('-created',),
+            },
+        ),
+        migrations.CreateModel(
+            name='SearchIndexWrite',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('app_label', models.CharField(max_length=100)),
+                ('model_name', models.CharField(max_length=100)),
+                ('object_pk', models.CharField(max_length=100)),
+                ('build', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='writes', to='common.searchindexbuild')),
+            ],
+            options={
+                'unique_together': {('build', 'app_label', 'model_name', 'object_pk')},
+            },
+        ),
+    ]
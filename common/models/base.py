@@ -165,3 +165,13 @@ class SequenceMixin(object):
             app_label=self._meta.app_label,
             model_name=self._meta.model_name
         ).next()
+
+    @classmethod
+    def generate_code_sequence_block(cls, count):
+        """Allocates the codes of ``count`` instances at once"""
+        if count < 1:
+            return []
+        return SequenceGenerator(
+            app_label=cls._meta.app_label,
+            model_name=cls._meta.model_name
+        ).next_block(count)
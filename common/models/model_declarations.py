@@ -1,11 +1,13 @@
 import logging
 import reversion
 import json
+import uuid
 
 from django.db import models
 from django.conf import settings
 from django.utils import encoding, timezone
 from django.contrib.auth.models import Group
+from reversion.models import Version
 
 from rest_framework.exceptions import ValidationError
 
@@ -449,6 +451,9 @@ class ErrorQueue(models.Model):
     except_message = models.TextField(null=True, blank=True)
     error_type = models.CharField(choices=ERROR_TYPES, max_length=100)
     created = models.DateTimeField(default=timezone.now)
+    next_attempt_at = models.DateTimeField(
+        null=True, blank=True,
+        help_text='The earliest time the failed action should be retried')
 
     class Meta(object):
         unique_together = ('object_pk', 'app_label', 'model_name')
@@ -459,6 +464,112 @@ class ErrorQueue(models.Model):
             self.object_pk, self.app_label, self.model_name)
 
 
+PDF_JOB_STATUSES = (
+    ('PENDING', 'Waiting to be rendered'),
+    ('DONE', 'Rendered'),
+    ('FAILED', 'Rendering failed'),
+)
+
+
+class PDFJob(models.Model):
+    """
+    A request to render a PDF report in the background.
+
+    ``report`` is the dotted path of the report view and ``variant`` tells
+    apart the renders of the same object e.g. with or without coordinates.
+    """
+    id = models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True)
+    report = models.CharField(max_length=255)
+    object_id = models.CharField(max_length=100)
+    variant = models.CharField(max_length=50, blank=True, default='')
+    file_name = models.CharField(max_length=255)
+    status = models.CharField(
+        choices=PDF_JOB_STATUSES, max_length=20, default='PENDING')
+    file_path = models.CharField(max_length=255, null=True, blank=True)
+    except_message = models.TextField(null=True, blank=True)
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, null=True, blank=True,
+        on_delete=models.SET_NULL, related_name='+')
+    created = models.DateTimeField(default=timezone.now)
+    updated = models.DateTimeField(default=timezone.now)
+
+    class Meta(object):
+        ordering = ('-created', )
+
+    def __str__(self):
+        return "{} - {} - {}".format(self.report, self.object_id, self.status)
+
+
+SEARCH_INDEX_BUILD_STATUSES = (
+    ('BUILDING', 'Building'),
+    ('DONE', 'Serving searches'),
+    ('FAILED', 'Failed'),
+)
+
+
+class SearchIndexBuild(models.Model):
+    """
+    A rebuild of the search index into a new versioned index.
+
+    The searches keep using the index behind ``alias`` until the build is
+    done and the alias is moved to ``index_name``. Meanwhile the documents
+    that are indexed are also written to the new index.
+    """
+    id = models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True)
+    alias = models.CharField(max_length=100)
+    index_name = models.CharField(max_length=100, unique=True)
+    status = models.CharField(
+        choices=SEARCH_INDEX_BUILD_STATUSES, max_length=20,
+        default='BUILDING')
+    except_message = models.TextField(null=True, blank=True)
+    created = models.DateTimeField(default=timezone.now)
+    updated = models.DateTimeField(default=timezone.now)
+
+    class Meta(object):
+        ordering = ('-created', )
+
+    def __str__(self):
+        return "{} - {}".format(self.index_name, self.status)
+
+
+class SearchIndexWrite(models.Model):
+    """
+    A document written to an index while it was being built.
+
+    The bulk load may have read the row before it changed, so the document
+    is indexed again before the alias is moved to the new index.
+    """
+    build = models.ForeignKey(
+        SearchIndexBuild, on_delete=models.CASCADE, related_name='writes')
+    app_label = models.CharField(max_length=100)
+    model_name = models.CharField(max_length=100)
+    object_pk = models.CharField(max_length=100)
+
+    class Meta(object):
+        unique_together = ('build', 'app_label', 'model_name', 'object_pk')
+
+    def __str__(self):
+        return "{} - {}.{} {}".format(
+            self.build_id, self.app_label, self.model_name, self.object_pk)
+
+
+class RevisionDiff(models.Model):
+    """
+    A persisted diff between a version of an object and the version before it
+
+    Saves recomputing the audit trail on every audit view.
+    """
+    version = models.OneToOneField(
+        Version, primary_key=True, on_delete=models.CASCADE,
+        related_name='+')
+    previous_version = models.ForeignKey(
+        Version, on_delete=models.CASCADE, related_name='+')
+    updates = models.TextField(help_text='The JSON encoded field changes')
+
+    def __str__(self):
+        return "{} - {}".format(self.previous_version_id, self.version_id)
+
+
 class UserSubCounty(AbstractBase):
     """
     Link a user to a sub-county
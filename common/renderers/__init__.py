@@ -1,3 +1,4 @@
 from .excel_renderer import ExcelRenderer  # noqa
 from .csv_renderer import CSVRenderer  # noqa
 from .pdf_renderer import PDFRenderer  # noqa
+from .json_renderer import FastJSONRenderer  # noqa
@@ -1,4 +1,3 @@
-import xlsxwriter
 import string
 # import cStringIO
 from io import StringIO as cStringIO
@@ -73,6 +72,8 @@ def sanitize_field_names(sample_keys):
 
 
 def _write_excel_file(data, request):  # noqa
+    # xlsxwriter is only loaded once a spreadsheet is needed
+    import xlsxwriter
     mem_file = cStringIO.StringIO()
     workbook = xlsxwriter.Workbook(mem_file)
     format = workbook.add_format(
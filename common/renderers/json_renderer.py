@@ -0,0 +1,98 @@
+"""
+A JSON renderer backed by orjson, for the large facility and GIS lists.
+
+orjson is optional ( ``pip install mfl[fast]`` ). The renderer is opted
+into with ``FAST_JSON_RENDERER`` and falls back to DRF's ``JSONRenderer``
+when orjson is not installed or an indented response is asked for. The
+output matches ``JSONRenderer``'s, except for geometries which are rendered
+as GeoJSON.
+"""
+import datetime
+import decimal
+import logging
+
+from django.conf import settings
+from django.contrib.gis.geos import GEOSGeometry
+from django.utils.functional import Promise
+from rest_framework import renderers
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+LOGGER = logging.getLogger(__name__)
+
+
+def _encode_datetime(obj):
+    representation = obj.isoformat()
+    if representation.endswith('+00:00'):
+        representation = representation[:-6] + 'Z'
+    return representation
+
+
+# the types that orjson does not encode, checked in the order of DRF's
+# JSONEncoder
+ENCODERS = (
+    (Promise, str),
+    (datetime.datetime, _encode_datetime),
+    ((datetime.date, datetime.time), lambda obj: obj.isoformat()),
+    (datetime.timedelta, lambda obj: str(obj.total_seconds())),
+    (decimal.Decimal, float),
+    (GEOSGeometry, lambda obj: orjson.loads(obj.geojson)),
+    (bytes, lambda obj: obj.decode()),
+)
+
+
+def _encode_container(obj):
+    if hasattr(obj, 'tolist'):
+        return obj.tolist()
+    if hasattr(obj, '__getitem__'):
+        try:
+            return dict(obj)
+        except (TypeError, ValueError):
+            pass
+    if hasattr(obj, '__iter__'):
+        return list(obj)
+    raise TypeError(
+        "Object of type {} is not JSON serializable".format(
+            obj.__class__.__name__))
+
+
+def _default(obj):
+    """Encodes what orjson does not, the way DRF's JSONEncoder does"""
+    for types, encode in ENCODERS:
+        if isinstance(obj, types):
+            return encode(obj)
+    return _encode_container(obj)
+
+
+class FastJSONRenderer(renderers.JSONRenderer):
+
+    options = 0
+    if orjson is not None:
+        options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+    missing_orjson_logged = False
+
+    def use_orjson(self):
+        if not settings.FAST_JSON_RENDERER:
+            return False
+        if orjson is None and not FastJSONRenderer.missing_orjson_logged:
+            FastJSONRenderer.missing_orjson_logged = True
+            LOGGER.warning(
+                "FAST_JSON_RENDERER is on but orjson is not installed, "
+                "install it with pip install mfl[fast]")
+        return orjson is not None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if not self.use_orjson() or \
+                self.get_indent(accepted_media_type, renderer_context or {}):
+            return super(FastJSONRenderer, self).render(
+                data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+        ret = orjson.dumps(data, default=_default, option=self.options)
+        # escaped by JSONRenderer as they are not valid in javascript
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(
+            b'\xe2\x80\xa9', b'\\u2029')
@@ -1,11 +1,8 @@
-from django.template import loader, Context
-from django.http import HttpResponse
+from django.template import loader
 from rest_framework import renderers
 from .shared import DownloadMixin
 
-from weasyprint import HTML
-# import cStringIO
-from io import StringIO as cStringIO
+from ..utilities.pdf_reports import cached_render_pdf
 
 
 class PDFRenderer(DownloadMixin, renderers.BaseRenderer):
@@ -18,17 +15,9 @@ class PDFRenderer(DownloadMixin, renderers.BaseRenderer):
         self.update_download_headers(renderer_context)
         template = loader.get_template('pdf/pdf.html')
 
-        context = Context({
+        html = template.render({
             "data": data,
             "title": self.fname.split('.')[0],
 
         })
-
-        mem_file = cStringIO.StringIO()
-
-        response = HttpResponse(content_type='application/pdf')
-        response['Content-Disposition'] = 'attachment; filename={}.pdf'.format(
-            mem_file
-        )
-        HTML(string=template.render(context)).write_pdf(response)
-        return response
+        return cached_render_pdf(html)
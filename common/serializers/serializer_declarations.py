@@ -1,5 +1,6 @@
 from django.contrib.auth import get_user_model
 
+from django.urls import reverse
 from rest_framework import serializers
 from rest_framework_gis.serializers import GeoModelSerializer
 from ..models import (
@@ -16,6 +17,7 @@ from ..models import (
     SubCounty,
     DocumentUpload,
     ErrorQueue,
+    PDFJob,
     UserSubCounty,
     Notification,
     NoficiationGroup
@@ -286,3 +288,21 @@ class DocumentUploadSerializer(
 class ErrorQueueSerializer(AbstractFieldsMixin, serializers.ModelSerializer):
     class Meta(AbstractFieldsMixin.Meta):
         model = ErrorQueue
+
+
+class PDFJobSerializer(serializers.ModelSerializer):
+    download_url = serializers.SerializerMethodField()
+
+    def get_download_url(self, obj):
+        if obj.status != 'DONE':
+            return None
+        url = reverse("api:common:pdf_job_download", kwargs={"pk": obj.pk})
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
+    class Meta(object):
+        model = PDFJob
+        fields = (
+            'id', 'status', 'file_name', 'except_message', 'download_url',
+            'created', 'updated',
+        )
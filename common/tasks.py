@@ -1,10 +1,20 @@
+import logging
+
 from django.db import connection
 from django.core.mail import mail_admins
+from django.utils import timezone
+from celery import shared_task
 from celery.schedules import crontab
 from celery.task import periodic_task
 
 from fabfile import backup_mfl_db
 
+from .models import PDFJob
+from .utilities.pdf_reports import render_report_job
+
+
+LOGGER = logging.getLogger(__name__)
+
 
 @periodic_task(
     run_every=(crontab(minute="*/60")),
@@ -45,3 +55,25 @@ def refresh_material_views():
     sql = """refresh materialized view facilities_excel_export;"""
     cursor = connection.cursor()
     cursor.execute(sql)
+
+
+@shared_task(name='render_pdf_report')
+def render_pdf_report(job_id):
+    """
+    Render a queued PDF report into PDF_REPORTS_ROOT.
+
+    Keeps the slow WeasyPrint rendering off the request workers. The job
+    records where the file was saved or why the rendering failed.
+    """
+    job = PDFJob.objects.get(id=job_id)
+    try:
+        job.file_path = render_report_job(job)
+        job.status = 'DONE'
+    except Exception as e:
+        LOGGER.exception("Unable to render PDF job {}".format(job_id))
+        job.status = 'FAILED'
+        job.except_message = str(e)
+    job.updated = timezone.now()
+    job.save(update_fields=[
+        'file_path', 'status', 'except_message', 'updated'])
+    return job.status
@@ -0,0 +1,81 @@
+from django.test import TestCase
+from model_mommy import mommy
+
+from chul.models import CommunityHealthUnit
+from facilities.models import Facility
+from users.models import MflUser
+from ..models import (
+    County, Constituency, SubCounty, Ward,
+    UserCounty, UserConstituency, UserSubCounty)
+from ..utilities.area_scope import (
+    AdminAreaScope, model_field_names, ward_area_lookups)
+
+
+class TestAdminAreaScope(TestCase):
+
+    def setUp(self):
+        self.county = mommy.make(County)
+        self.constituency = mommy.make(Constituency, county=self.county)
+        self.sub_county = mommy.make(SubCounty, county=self.county)
+        self.ward = mommy.make(
+            Ward, constituency=self.constituency, sub_county=self.sub_county)
+        self.facility = mommy.make(Facility, ward=self.ward)
+        self.other_facility = mommy.make(Facility)
+        self.chu = mommy.make(CommunityHealthUnit, facility=self.facility)
+        mommy.make(CommunityHealthUnit, facility=self.other_facility)
+        self.lookups = ward_area_lookups('facility__ward')
+
+    def _scoped_chus(self, user):
+        return AdminAreaScope(user).filter(
+            CommunityHealthUnit.objects.all(), self.lookups)
+
+    def test_unassigned_user_is_not_confined(self):
+        user = mommy.make(MflUser)
+        scope = AdminAreaScope(user)
+        self.assertEquals(frozenset(), scope.levels)
+        self.assertEquals(2, self._scoped_chus(user).count())
+
+    def test_county_user_is_confined_to_county(self):
+        user = mommy.make(MflUser)
+        mommy.make(UserCounty, user=user, county=self.county)
+        self.assertEquals([self.chu], list(self._scoped_chus(user)))
+
+    def test_national_user_is_not_confined_to_county(self):
+        user = mommy.make(MflUser, is_national=True)
+        mommy.make(UserCounty, user=user, county=self.county)
+        self.assertEquals(2, self._scoped_chus(user).count())
+
+    def test_inactive_assignments_are_ignored(self):
+        user = mommy.make(MflUser)
+        mommy.make(UserCounty, user=user, county=self.county, active=False)
+        self.assertEquals(2, self._scoped_chus(user).count())
+
+    def test_sub_county_takes_precedence_over_constituency(self):
+        user = mommy.make(MflUser)
+        mommy.make(
+            UserConstituency, user=user,
+            constituency=mommy.make(Constituency, county=self.county))
+        mommy.make(UserSubCounty, user=user, sub_county=self.sub_county)
+        scope = AdminAreaScope(user)
+        self.assertEquals(frozenset(['sub_county']), scope.levels)
+        self.assertEquals([self.chu], list(self._scoped_chus(user)))
+
+    def test_areas_are_filtered_with_a_subquery(self):
+        user = mommy.make(MflUser)
+        mommy.make(UserCounty, user=user, county=self.county)
+        scope = AdminAreaScope(user)
+        scope.levels
+
+        with self.assertNumQueries(0):
+            queryset = scope.filter(
+                CommunityHealthUnit.objects.all(), self.lookups)
+        self.assertIs(scope.q(self.lookups), scope.q(self.lookups))
+        self.assertIn('common_usercounty', str(queryset.query))
+        with self.assertNumQueries(1):
+            self.assertEquals([self.chu], list(queryset))
+
+    def test_model_field_names(self):
+        self.assertIn('facility', model_field_names(CommunityHealthUnit))
+        self.assertIs(
+            model_field_names(CommunityHealthUnit),
+            model_field_names(CommunityHealthUnit))
@@ -6,9 +6,11 @@ from django.contrib.auth import get_user_model
 from django.core.urlresolvers import reverse
 from django.db import transaction
 from django.test import override_settings
+from mock import patch
 from model_mommy import mommy
 from rest_framework.test import APITestCase
 
+from common.utilities.audit import RevisionDiffer
 from common.views import AuditableDetailViewMixin
 from facilities.models import RegulationStatus
 from common.models import DocumentUpload
@@ -214,3 +216,77 @@ class TestAuditableViewMixin(APITestCase):
         response = self.client.get(url+"?include_audit=true")
         self.assertEqual(response.status_code, 200)
         self.assertEqual(len(response.data['revisions']), 1)
+
+    def _make_edits(self, names):
+        url = self._get_detail_url(self.status_id)
+        for name in names:
+            resp = self.client.patch(url, {"name": name})
+            self.assertEqual(resp.status_code, 200)
+        return url
+
+    def test_paginated_revisions(self):
+        url = self._make_edits(["first", "second", "third"])
+
+        response = self.client.get(
+            url + "?include_audit=true&audit_page=1&audit_page_size=2")
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(
+            ["third", "second"],
+            [r["updates"][0]["new"] for r in response.data["revisions"]])
+        self.assertEqual(
+            {"page": 1, "page_size": 2, "has_next": True},
+            response.data["revisions_page"])
+
+        response = self.client.get(
+            url + "?include_audit=true&audit_page=2&audit_page_size=2")
+        self.assertEqual(200, response.status_code)
+        revisions = response.data["revisions"]
+        self.assertEqual(1, len(revisions))
+        self.assertEqual("Test status", revisions[0]["updates"][0]["old"])
+        self.assertFalse(response.data["revisions_page"]["has_next"])
+
+    def test_versions_are_parsed_once(self):
+        url = self._make_edits(["first", "second", "third"])
+
+        with patch.object(
+                RevisionDiffer, '_parse', autospec=True,
+                side_effect=RevisionDiffer._parse) as parse:
+            response = self.client.get(
+                url + "?include_audit=true&audit_page=1&audit_page_size=2")
+        self.assertEqual(200, response.status_code)
+        # the two versions of the page and the one preceding it
+        self.assertEqual(3, parse.call_count)
+
+    def test_revisions_since(self):
+        url = self._make_edits(["first", "second"])
+
+        response = self.client.get(
+            url + "?include_audit=true&since=2100-01-01")
+        self.assertEqual(200, response.status_code)
+        self.assertEqual([], response.data["revisions"])
+
+        response = self.client.get(
+            url + "?include_audit=true&since=2000-01-01")
+        self.assertEqual(2, len(response.data["revisions"]))
+
+    def test_invalid_audit_params(self):
+        url = self._get_detail_url(self.status_id)
+        for params in ["since=not-a-date", "audit_page=x", "audit_page=0"]:
+            response = self.client.get(url + "?include_audit=true&" + params)
+            self.assertEqual(400, response.status_code)
+
+    @override_settings(PERSIST_REVISION_DIFFS=True)
+    def test_persisted_diffs_are_reused(self):
+        from common.models import RevisionDiff
+        url = self._make_edits(["first", "second"])
+
+        first = self.client.get(url + "?include_audit=true")
+        self.assertEqual(2, RevisionDiff.objects.count())
+
+        with patch(
+                'common.utilities.audit.RevisionDiffer._compare') as compare:
+            second = self.client.get(url + "?include_audit=true")
+            self.assertFalse(compare.called)
+        self.assertEqual(
+            first.data["revisions"][0]["updates"],
+            second.data["revisions"][0]["updates"])
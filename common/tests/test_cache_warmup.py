@@ -0,0 +1,100 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.core.urlresolvers import reverse
+from django.test import TestCase
+from django.test.utils import override_settings
+
+from mock import patch
+from model_mommy import mommy
+
+from mfl_gis.models import CountyBoundary
+from users.models import MflUser
+
+from ..models import County
+from ..utilities.cache_warmup import (
+    CacheWarmup,
+    Endpoint,
+    cacheable_endpoints,
+    scoped_paths
+)
+
+
+@override_settings(CACHES={
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "cache-warmup",
+    }
+})
+class TestCacheWarmup(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = mommy.make(
+            MflUser, is_active=True, is_superuser=True, is_staff=True)
+        self.county = mommy.make(County, code=47, name='Nairobi')
+        mommy.make(CountyBoundary, area=self.county)
+        super(TestCacheWarmup, self).setUp()
+
+    def test_cacheable_endpoints(self):
+        endpoints = cacheable_endpoints()
+        self.assertIn(
+            Endpoint('api:mfl_gis:county_boundaries_list', {}), endpoints)
+        self.assertIn(
+            Endpoint('api:mfl_gis:drilldown_county', {'code': 'code'}),
+            endpoints)
+        self.assertIn(
+            Endpoint('api:common:county_detail', {'pk': 'id'}), endpoints)
+        names = [endpoint.name for endpoint in endpoints]
+        # views that are not cached or differ per user are left out
+        self.assertNotIn('api:common:filtering_summaries', names)
+        self.assertNotIn('api:facilities:facilities_list', names)
+
+    def test_scoped_paths(self):
+        endpoints = [
+            Endpoint('api:mfl_gis:drilldown_country', {}),
+            Endpoint('api:mfl_gis:drilldown_county', {'code': 'code'}),
+        ]
+        self.assertEquals([
+            ('national', '/api/gis/drilldown/country/'),
+            ('Nairobi', '/api/gis/drilldown/county/47/'),
+        ], list(scoped_paths(endpoints, [self.county])))
+
+    def test_rendered_endpoints_are_served_from_the_cache(self):
+        url = reverse('api:mfl_gis:county_boundaries_list')
+        warmup = CacheWarmup(self.user, 'testserver', workers=1)
+        rendered = warmup.run([('national', url)])
+        self.assertEquals(1, len(rendered))
+        self.assertEquals(200, rendered[0].status_code)
+        self.assertEquals(url, rendered[0].path)
+
+        self.client.force_login(self.user)
+        with patch('mfl_gis.views.CountyBoundaryListView.list') as list_mock:
+            response = self.client.get(
+                url, HTTP_ACCEPT='application/json, */*')
+        self.assertEquals(200, response.status_code)
+        self.assertFalse(list_mock.called)
+
+    def test_failures_are_reported(self):
+        warmup = CacheWarmup(self.user, 'testserver', workers=1)
+        reported = []
+        rendered = warmup.run(
+            [('Nairobi', '/api/gis/drilldown/county/46/')],
+            callback=reported.append)
+        self.assertEquals(rendered, reported)
+        self.assertNotEquals(200, rendered[0].status_code)
+
+    def test_command(self):
+        out = StringIO()
+        call_command(
+            'warmup_cache', host='testserver', workers=1, stdout=out)
+        output = out.getvalue()
+        self.assertIn('/api/gis/drilldown/county/47/ [Nairobi]', output)
+        self.assertIn('/api/gis/county_boundaries/ [national]', output)
+        self.assertIn(', 0 failed', output)
+
+    def test_command_without_a_user(self):
+        MflUser.objects.update(is_superuser=False)
+        with self.assertRaises(CommandError):
+            call_command('warmup_cache', host='testserver', workers=1)
@@ -0,0 +1,123 @@
+import gzip
+import json
+import unittest
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase
+from django.test.utils import override_settings
+from django.utils.text import compress_string
+
+from mock import patch
+
+from ..middleware import (
+    CompressionMiddleware,
+    accepted_encodings,
+    brotli,
+    choose_encoding
+)
+
+
+PAYLOAD = json.dumps(
+    [{"name": "Facility {}".format(i), "code": i} for i in range(5000)]
+).encode('utf-8')
+
+
+def _view(content=PAYLOAD, content_type='application/json'):
+    return lambda request: HttpResponse(content, content_type=content_type)
+
+
+@override_settings(
+    CACHES={
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "compression",
+        }
+    },
+    COMPRESSION_MIN_SIZE=1024,
+    COMPRESSION_PRECOMPRESS_MIN_SIZE=64 * 1024)
+class TestCompressionMiddleware(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        super(TestCompressionMiddleware, self).setUp()
+
+    def _get(self, accept_encoding='gzip', view=None):
+        request = RequestFactory().get(
+            '/api/gis/county_boundaries/',
+            HTTP_ACCEPT_ENCODING=accept_encoding)
+        return CompressionMiddleware(view or _view())(request)
+
+    def test_accepted_encodings(self):
+        self.assertEquals(
+            {'gzip': 1.0, 'br': 0.5, '*': 0.0},
+            accepted_encodings('gzip, br;q=0.5, *;q=0, ;q=x'))
+
+    def test_choose_encoding(self):
+        self.assertEquals('gzip', choose_encoding('gzip, deflate'))
+        self.assertEquals('gzip', choose_encoding('*'))
+        self.assertIsNone(choose_encoding('identity'))
+        self.assertIsNone(choose_encoding('gzip;q=0'))
+        self.assertIsNone(choose_encoding(''))
+        with patch('common.middleware.brotli', object()):
+            self.assertEquals('br', choose_encoding('gzip, deflate, br'))
+            self.assertEquals('gzip', choose_encoding('gzip, br;q=0.1'))
+
+    def test_gzip(self):
+        response = self._get('gzip, deflate')
+        self.assertEquals('gzip', response['Content-Encoding'])
+        self.assertEquals('Accept-Encoding', response['Vary'])
+        self.assertEquals(
+            str(len(response.content)), response['Content-Length'])
+        self.assertEquals(PAYLOAD, gzip.decompress(response.content))
+
+    @unittest.skipIf(brotli is None, "brotli is not installed")
+    def test_brotli(self):
+        response = self._get('gzip, deflate, br')
+        self.assertEquals('br', response['Content-Encoding'])
+        self.assertEquals(PAYLOAD, brotli.decompress(response.content))
+
+    def test_not_compressed(self):
+        # small payloads, binary content types and unsupported encodings
+        response = self._get(view=_view(b'{"count": 1}'))
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertFalse(response.has_header('Vary'))
+
+        response = self._get(view=_view(content_type='application/pdf'))
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+        response = self._get('identity')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEquals('Accept-Encoding', response['Vary'])
+        self.assertEquals(PAYLOAD, response.content)
+
+    def test_strong_etags_are_weakened(self):
+        def view(request):
+            response = _view()(request)
+            response['ETag'] = '"abc"'
+            return response
+        self.assertEquals('W/"abc"', self._get(view=view)['ETag'])
+
+    def test_large_payloads_are_compressed_once(self):
+        with patch('common.middleware.compress_string',
+                   wraps=compress_string) as compress:
+            for _ in range(3):
+                response = self._get()
+                self.assertEquals(
+                    PAYLOAD, gzip.decompress(response.content))
+        self.assertEquals(1, compress.call_count)
+
+        changed = PAYLOAD.replace(b'Facility', b'Dispensary')
+        with patch('common.middleware.compress_string',
+                   wraps=compress_string) as compress:
+            response = self._get(view=_view(changed))
+        self.assertEquals(1, compress.call_count)
+        self.assertEquals(changed, gzip.decompress(response.content))
+
+    def test_small_payloads_are_not_cached(self):
+        content = PAYLOAD[:10 * 1024]
+        with patch('common.middleware.compress_string',
+                   wraps=compress_string) as compress:
+            for _ in range(2):
+                self._get(view=_view(content))
+        self.assertEquals(2, compress.call_count)
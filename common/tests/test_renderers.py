@@ -1,5 +1,23 @@
+import decimal
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+import uuid
+from unittest import skipIf
+
+from django.conf import settings
+from django.contrib.gis.geos import Point
 from django.core.urlresolvers import reverse
+from django.test import SimpleTestCase
+from django.test.utils import override_settings
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
 
+from mock import patch
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APITestCase
 from model_mommy import mommy
 
@@ -8,9 +26,13 @@ from common.models import County
 from common.renderers.excel_renderer import (
     _write_excel_file, sanitize_field_names, _build_name_from_list
 )
+from common.renderers.json_renderer import FastJSONRenderer, orjson
 from .test_views import LoginMixin
 
 
+LOGGER = logging.getLogger(__name__)
+
+
 class TestExcelRenderer(LoginMixin, APITestCase):
 
     def test_not_list(self):
@@ -155,3 +177,124 @@ class TestPDFRender(LoginMixin, APITestCase):
         mommy.make(County)
         response = self.client.get(pdf_url)
         self.assertEquals(200, response.status_code)
+
+
+def _facility_page(size):
+    """A page of facilities shaped like the facility list's"""
+    now = timezone.now()
+    return {
+        "count": size,
+        "next": None,
+        "previous": None,
+        "results": [
+            {
+                "id": uuid.uuid4(),
+                "code": 10000 + i,
+                "name": "Facility {}".format(i),
+                "official_name": "Facility {} Health Centre".format(i),
+                "created": now,
+                "updated": now,
+                "date_established": now.date(),
+                "latitude": decimal.Decimal('-1.2921'),
+                "coordinates": Point(36.8219, -1.2921, srid=4326),
+                "county_name": "Nairobi",
+                "facility_type_name": gettext_lazy("Health Centre"),
+                "is_approved": True,
+                "number_of_beds": i % 50,
+                "facility_services": [
+                    {"service_id": uuid.uuid4(), "name": "HIV Testing"}
+                ],
+            }
+            for i in range(size)
+        ]
+    }
+
+
+@skipIf(orjson is None, "orjson is not installed")
+@override_settings(FAST_JSON_RENDERER=True)
+class TestFastJSONRenderer(SimpleTestCase):
+
+    def test_output_matches_the_json_renderer(self):
+        data = _facility_page(3)
+        for facility in data['results']:
+            facility.pop('coordinates')
+        data['results'][0]['name'] = 'Line\u2028separator'
+        self.assertEquals(
+            json.loads(JSONRenderer().render(data)),
+            json.loads(FastJSONRenderer().render(data)))
+        self.assertNotIn(b'\xe2\x80\xa8', FastJSONRenderer().render(data))
+
+    def test_geometries_are_rendered_as_geojson(self):
+        self.assertEquals(
+            {"type": "Point", "coordinates": [36.8219, -1.2921]},
+            json.loads(FastJSONRenderer().render(
+                {"coordinates": Point(36.8219, -1.2921, srid=4326)}
+            ))["coordinates"])
+
+    def test_indented_responses_use_the_json_renderer(self):
+        data = _facility_page(1)
+        media_type = 'application/json; indent=4'
+        self.assertEquals(
+            JSONRenderer().render(data, media_type),
+            FastJSONRenderer().render(data, media_type))
+
+    @override_settings(FAST_JSON_RENDERER=False)
+    def test_opt_in(self):
+        data = _facility_page(1)
+        self.assertEquals(
+            JSONRenderer().render(data), FastJSONRenderer().render(data))
+
+    def test_missing_orjson_is_logged_once(self):
+        data = _facility_page(1)
+        with patch('common.renderers.json_renderer.orjson', None), \
+                patch.object(FastJSONRenderer, 'missing_orjson_logged', False):
+            with self.assertLogs(
+                    'common.renderers.json_renderer', 'WARNING') as logs:
+                for _ in range(2):
+                    self.assertEquals(
+                        JSONRenderer().render(data),
+                        FastJSONRenderer().render(data))
+        self.assertEquals(1, len(logs.output))
+
+    def test_render_benchmark(self):
+        """Benchmarks rendering a page of 1,000 facilities"""
+        data = _facility_page(1000)
+        for facility in data['results']:
+            facility.pop('coordinates')
+        timings = {}
+        for renderer in (JSONRenderer(), FastJSONRenderer()):
+            start = time.perf_counter()
+            for _ in range(5):
+                renderer.render(data)
+            timings[renderer.__class__.__name__] = (
+                time.perf_counter() - start) / 5
+        LOGGER.info(
+            "1,000 facilities: JSONRenderer {:.1f}ms, "
+            "FastJSONRenderer {:.1f}ms".format(
+                timings['JSONRenderer'] * 1000,
+                timings['FastJSONRenderer'] * 1000))
+        self.assertLess(
+            timings['FastJSONRenderer'], timings['JSONRenderer'])
+
+
+class TestLazyRenderers(SimpleTestCase):
+
+    def test_heavy_libraries_are_not_imported_with_the_renderers(self):
+        """
+        A worker that loads the renderers does not load WeasyPrint or
+        xlsxwriter; its peak RSS is logged
+        """
+        script = (
+            "import resource, sys, django; django.setup();"
+            "import common.renderers, common.views;"
+            "print(','.join(str(int(name in sys.modules)) for name in "
+            "('weasyprint', 'xlsxwriter')));"
+            "print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)"
+        )
+        env = dict(
+            os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE)
+        output = subprocess.check_output(
+            [sys.executable, '-c', script], cwd=settings.BASE_DIR, env=env
+        ).decode().split()
+        LOGGER.info("Worker RSS with the renderers: {}KB".format(output[-1]))
+        self.assertEquals('0,0', output[-2])
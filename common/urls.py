@@ -1,5 +1,7 @@
 from django.urls import path, re_path
 from django.views.decorators.cache import cache_page
+
+from .utilities.cache_warmup import warm_up
 from .views import (
     ContactView,
     ContactDetailView,
@@ -31,6 +33,8 @@ from .views import (
     DocumentUploadDetailView,
     ErrorQueueDetailView,
     ErrorQueueListView,
+    PDFJobDetailView,
+    PDFJobDownloadView,
     UserSubCountyDetailView,
     UserSubCountyListView,
     NotificationListView,
@@ -53,6 +57,13 @@ urlpatterns = (
         ErrorQueueDetailView.as_view(),
         name='error_queue_detail'),
 
+    path('pdf_jobs/<str:pk>/',
+        PDFJobDetailView.as_view(),
+        name='pdf_job_detail'),
+    path('pdf_jobs/<str:pk>/download/',
+        PDFJobDownloadView.as_view(),
+        name='pdf_job_download'),
+
     path('user_sub_counties/',
         UserSubCountyListView.as_view(),
         name='user_sub_counties_list'),
@@ -92,10 +103,14 @@ urlpatterns = (
         CountyView.as_view(),
         name='counties_list'),
     path('counties/<str:pk>/',
-        cache_page(60*60*12)(CountyDetailView.as_view()),
+        warm_up(
+            cache_page(60*60*12)(CountyDetailView.as_view()),
+            per_county={'pk': 'id'}),
         name='county_detail'),
     path('counties/slim_detail/<str:pk>/',
-        cache_page(60*60*12)(CountySlimDetailView.as_view()),
+        warm_up(
+            cache_page(60*60*12)(CountySlimDetailView.as_view()),
+            per_county={'pk': 'id'}),
         name='county_slim_detail'),
 
     path('user_counties/',
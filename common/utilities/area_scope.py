@@ -0,0 +1,104 @@
+"""
+Confines querysets to the administrative areas a user is assigned to.
+
+A user may be assigned to counties, constituencies and sub counties (
+``UserCounty``, ``UserConstituency`` and ``UserSubCounty`` ). Rather than
+loading those assignments, the scope filters on subqueries over them so
+that the membership is resolved by the database as part of the list query.
+"""
+from functools import lru_cache
+
+from django.contrib.auth import get_user_model
+from django.db.models import Exists, Q
+from django.utils.functional import cached_property
+
+
+AREA_LEVELS = ('county', 'constituency', 'sub_county')
+
+# models such as the facility material view keep the ids of their areas in
+# plain columns named after the area levels
+AREA_COLUMN_LOOKUPS = {level: level for level in AREA_LEVELS}
+
+
+@lru_cache(maxsize=None)
+def model_field_names(model):
+    """The names of a model's fields, computed once per model"""
+    return frozenset(field.name for field in model._meta.get_fields())
+
+
+def ward_area_lookups(ward_path):
+    """
+    Maps each area level to its lookup from a ward e.g. ``facility__ward``
+    """
+    return {
+        'county': '{}__constituency__county'.format(ward_path),
+        'constituency': '{}__constituency'.format(ward_path),
+        'sub_county': '{}__sub_county'.format(ward_path),
+    }
+
+
+class AdminAreaScope(object):
+
+    """
+    The administrative areas that a user's listings are confined to.
+
+    A scope is built once per request. Which area levels the user is
+    assigned to is found with a single query; the areas themselves are
+    never loaded. National users are not confined to their counties and
+    a sub county assignment takes precedence over a constituency one.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self._filters = {}
+
+    def assignments(self, level):
+        """The active assignments of the user to areas of a level"""
+        from common.models import UserConstituency, UserCounty, UserSubCounty
+        model = {
+            'county': UserCounty,
+            'constituency': UserConstituency,
+            'sub_county': UserSubCounty,
+        }[level]
+        return model.objects.filter(user_id=self.user.pk, active=True)
+
+    @cached_property
+    def levels(self):
+        """The area levels that confine the user"""
+        if not self.user.is_authenticated:
+            return frozenset()
+
+        flags = get_user_model().objects.filter(pk=self.user.pk).annotate(**{
+            level: Exists(self.assignments(level)) for level in AREA_LEVELS
+        }).values(*AREA_LEVELS).first() or {}
+        levels = set(level for level in AREA_LEVELS if flags.get(level))
+
+        if self.user.is_national:
+            levels.discard('county')
+        if 'sub_county' in levels:
+            levels.discard('constituency')
+        return frozenset(levels)
+
+    def q(self, lookups):
+        """
+        Returns the filter for the given area lookups.
+
+        ``lookups`` maps the area levels to the lookups of the areas on the
+        model being filtered ( see ``ward_area_lookups`` and
+        ``AREA_COLUMN_LOOKUPS`` ).
+        """
+        key = tuple(sorted(lookups.items()))
+        if key not in self._filters:
+            condition = Q()
+            for level in AREA_LEVELS:
+                if level in self.levels:
+                    condition &= Q(**{
+                        '{}__in'.format(lookups[level]):
+                        self.assignments(level).values(level)
+                    })
+            self._filters[key] = condition
+        return self._filters[key]
+
+    def filter(self, queryset, lookups):
+        condition = self.q(lookups)
+        return queryset.filter(condition) if condition else queryset
@@ -0,0 +1,192 @@
+"""
+Computes the audit trail ( revision diffs ) of a versioned model instance
+"""
+import json
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import FieldDoesNotExist
+from reversion.models import Version
+
+
+SYSTEM_USER_NAME = "System Manager"
+
+
+class RevisionDiffer(object):
+
+    """
+    Diffs the consecutive versions of an instance.
+
+    Each version's serialized data is parsed once and the related objects
+    referenced by a page of versions are resolved with a single query over
+    their revisions. Computed diffs can optionally be persisted so that
+    repeated audit views only read them back.
+    """
+
+    def __init__(self, instance, exclude=(), persist=False):
+        self.instance = instance
+        self.exclude = exclude
+        self.persist = persist
+        self.model = instance.__class__
+        self.fields = [f for f in self.model._meta.fields]
+
+    def versions(self, since=None):
+        versions = Version.objects.get_for_object(
+            self.instance).select_related('revision', 'revision__user')
+        if since:
+            versions = versions.filter(revision__date_created__gte=since)
+        return versions
+
+    def _parse(self, version):
+        """Maps the field names to their values in the version"""
+        if version.format == 'json':
+            data = json.loads(version.serialized_data)[0]
+            values = dict(data.get('fields', {}))
+            values[self.model._meta.pk.name] = data.get('pk')
+            return values
+
+        field_dict = version.field_dict
+        return {
+            field.name: field_dict.get(field.attname, '')
+            for field in self.fields
+        }
+
+    def _related_reprs(self, versions):
+        """
+        Returns {(revision_id, content_type_id, object_id): object_repr} for
+        all the objects saved in the same revisions as the given versions.
+        """
+        revision_ids = set(version.revision_id for version in versions)
+        return {
+            (revision_id, content_type_id, object_id): object_repr
+            for revision_id, content_type_id, object_id, object_repr in
+            Version.objects.filter(revision_id__in=revision_ids).values_list(
+                'revision_id', 'content_type_id', 'object_id', 'object_repr')
+        }
+
+    def _resolve(self, field, value, version, reprs):
+        if field.is_relation and value not in (None, ''):
+            content_type = ContentType.objects.get_for_model(
+                field.related_model)
+            is_self = (
+                content_type.id == version.content_type_id and
+                str(value) == version.object_id
+            )
+            if not is_self:
+                object_repr = reprs.get(
+                    (version.revision_id, content_type.id, str(value)))
+                if object_repr is not None:
+                    return object_repr
+        return value
+
+    def resolve_field(self, field_name, version):
+        """Resolves the human readable value of a field in a version"""
+        value = self._parse(version).get(field_name)
+        try:
+            field = self.model._meta.get_field(field_name)
+        except FieldDoesNotExist:
+            # the field may have been dropped from the model since then
+            return value
+        if field.is_relation:
+            return self._resolve(
+                field, value, version, self._related_reprs([version]))
+        return value
+
+    def _compare(self, old, new, parsed, reprs):
+        """``parsed`` maps the pks of the versions to their parsed values"""
+        old_values, new_values = parsed[old.pk], parsed[new.pk]
+        updates = []
+        for field in self.fields:
+            old_val = old_values.get(field.name, '')
+            new_val = new_values.get(field.name, '')
+            if old_val != new_val:
+                updates.append({
+                    "name": field.name,
+                    "old": self._resolve(field, old_val, old, reprs),
+                    "new": self._resolve(field, new_val, new, reprs)
+                })
+        return updates
+
+    def _stored_diffs(self, pairs):
+        from common.models import RevisionDiff
+        previous_by_version = {new.pk: old.pk for new, old in pairs}
+        return {
+            diff.version_id: json.loads(diff.updates)
+            for diff in RevisionDiff.objects.filter(
+                version_id__in=list(previous_by_version))
+            if diff.previous_version_id == previous_by_version[diff.version_id]
+        }
+
+    def _store_diffs(self, computed):
+        from common.models import RevisionDiff
+        RevisionDiff.objects.bulk_create(
+            [
+                RevisionDiff(
+                    version_id=new.pk, previous_version_id=old.pk,
+                    updates=json.dumps(updates, default=str))
+                for new, old, updates in computed
+            ],
+            update_conflicts=True, unique_fields=['version'],
+            update_fields=['previous_version', 'updates']
+        )
+
+    def has_more(self, since=None, offset=0, limit=None):
+        """Whether there are older versions beyond the given page"""
+        if not limit:
+            return False
+        return self.versions(since)[offset + limit:].exists()
+
+    def diffs(self, since=None, offset=0, limit=None):
+        """
+        Returns the diffs of the versions newest first.
+
+        Versions are paged with ``offset`` and ``limit``. The version
+        preceding the last version in the page is fetched separately since
+        it may be older than ``since``.
+        """
+        versions = self.versions(since)
+        page = list(
+            versions[offset:offset + limit] if limit else versions[offset:])
+        if not page:
+            return []
+
+        previous = Version.objects.get_for_object(self.instance).filter(
+            pk__lt=page[-1].pk).select_related('revision').first()
+        pairs = [
+            (new, old) for new, old in zip(page, page[1:] + [previous])
+            if old is not None
+        ]
+
+        stored = self._stored_diffs(pairs) if self.persist else {}
+        to_compute = [(new, old) for new, old in pairs if new.pk not in stored]
+        # the versions inside the page are in two pairs, they are parsed once
+        compared = {
+            version.pk: version for pair in to_compute for version in pair}
+        parsed = {
+            pk: self._parse(version) for pk, version in compared.items()}
+        reprs = self._related_reprs(
+            list(compared.values())) if to_compute else {}
+        computed = [
+            (new, old, self._compare(old, new, parsed, reprs))
+            for new, old in to_compute
+        ]
+        if self.persist and computed:
+            self._store_diffs(computed)
+        updates_by_version = dict(stored)
+        updates_by_version.update(
+            (new.pk, updates) for new, _, updates in computed)
+
+        output = []
+        for new, _ in pairs:
+            updates = [
+                update for update in updates_by_version[new.pk]
+                if update["name"] not in self.exclude
+            ]
+            if updates:
+                user = new.revision.user
+                output.append({
+                    "updates": updates,
+                    "updated_by": user.get_full_name
+                    if hasattr(user, 'get_full_name') else SYSTEM_USER_NAME,
+                    "updated_on": new.revision.date_created
+                })
+        return output
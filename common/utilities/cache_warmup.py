@@ -0,0 +1,150 @@
+"""
+Renders the cached API endpoints ahead of their first request.
+
+Views are marked for warming up in the url confs with ``warm_up``. The
+marked views are found by walking the url conf, so the list of endpoints
+can not fall out of step with the urls. Each endpoint is rendered in
+process through the test client, once for the whole country or once for
+each county, in a pool of worker threads. The responses land in the view
+caches ( ``cache_page`` ) and the compressed response cache as if they had
+been requested by a client.
+"""
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connections
+from django.urls import URLResolver, get_resolver, reverse
+
+
+Endpoint = namedtuple('Endpoint', ['name', 'per_county'])
+
+Rendered = namedtuple(
+    'Rendered', ['scope', 'path', 'status_code', 'seconds', 'size'])
+
+
+def warm_up(view, per_county=None):
+    """
+    Marks a cached view to be rendered by the ``warmup_cache`` command.
+
+    Views are rendered once for the whole country unless ``per_county`` is
+    given. It maps the url arguments of a view rendered for each county to
+    the county's attributes e.g. ``{'code': 'code'}``.
+    """
+    view.warm_up = {'per_county': per_county or {}}
+    return view
+
+
+def cacheable_endpoints(urlconf=None):
+    """The url names of the views marked with ``warm_up``"""
+    endpoints = []
+
+    def _walk(patterns, namespaces):
+        for pattern in patterns:
+            if isinstance(pattern, URLResolver):
+                _walk(pattern.url_patterns, namespaces + (
+                    [pattern.namespace] if pattern.namespace else []))
+            elif pattern.name and hasattr(pattern.callback, 'warm_up'):
+                endpoints.append(Endpoint(
+                    ':'.join(namespaces + [pattern.name]),
+                    pattern.callback.warm_up['per_county']))
+
+    _walk(get_resolver(urlconf).url_patterns, [])
+    return endpoints
+
+
+def scoped_paths(endpoints, counties, urlconf=None):
+    """Yields ``(scope, path)`` for each endpoint and scope"""
+    for endpoint in endpoints:
+        if not endpoint.per_county:
+            yield 'national', reverse(endpoint.name, urlconf=urlconf)
+            continue
+        for county in counties:
+            kwargs = {
+                kwarg: getattr(county, attribute)
+                for kwarg, attribute in endpoint.per_county.items()
+            }
+            yield county.name, reverse(
+                endpoint.name, kwargs=kwargs, urlconf=urlconf)
+
+
+class CacheWarmup(object):
+
+    """
+    Renders the cacheable endpoints as ``user``.
+
+    The view caches are keyed by the host, the path and the headers that
+    the responses vary on. The requests are thus made with the host and
+    the ``Accept`` header that clients use, once for each of the
+    ``accept_encodings``.
+    """
+
+    def __init__(self, user, host, accept='application/json, */*',
+                 accept_encodings=('gzip, deflate, br', 'gzip, deflate'),
+                 secure=False, workers=4):
+        self.user = user
+        self.host = host
+        self.accept = accept
+        self.accept_encodings = accept_encodings
+        self.secure = secure
+        self.workers = workers
+        self._local = threading.local()
+
+    @property
+    def client(self):
+        """A signed in client for each worker thread"""
+        if not hasattr(self._local, 'client'):
+            # not imported with the url confs that import ``warm_up``
+            from django.test import Client
+            client = Client(
+                raise_request_exception=False, HTTP_HOST=self.host)
+            client.force_login(self.user)
+            self._local.client = client
+        return self._local.client
+
+    def render(self, scope, path):
+        """
+        Renders the path once for each of the ``accept_encodings``. The
+        time taken is that of the first request, which renders the view.
+        """
+        seconds = None
+        for accept_encoding in self.accept_encodings:
+            start = time.perf_counter()
+            response = self.client.get(
+                path, secure=self.secure, HTTP_ACCEPT=self.accept,
+                HTTP_ACCEPT_ENCODING=accept_encoding)
+            if seconds is None:
+                seconds = time.perf_counter() - start
+            if response.status_code != 200:
+                break
+        return Rendered(
+            scope, path, response.status_code, seconds,
+            len(response.content))
+
+    def _render_in_worker(self, scope_and_path):
+        try:
+            return self.render(*scope_and_path)
+        finally:
+            # the connections of the worker threads are not closed for us
+            connections.close_all()
+
+    def run(self, paths, callback=None):
+        """
+        Renders each ``(scope, path)``. ``callback`` is called with each
+        ``Rendered`` in the order of the paths.
+        """
+        rendered = []
+
+        def _rendered(results):
+            for result in results:
+                rendered.append(result)
+                if callback is not None:
+                    callback(result)
+
+        if self.workers <= 1:
+            _rendered(self.render(*args) for args in paths)
+            return rendered
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            _rendered(executor.map(self._render_in_worker, paths))
+        return rendered
@@ -0,0 +1,96 @@
+"""
+Renders PDF reports and keeps the rendered files in PDF_REPORTS_ROOT.
+
+A report is keyed by its template, the object it is about and the object's
+``updated`` timestamp so that a cached file is served for as long as the
+object does not change. The files are kept out of MEDIA_ROOT, which is web
+served, so that they are only served through the report views and their
+permission checks.
+"""
+import hashlib
+import logging
+import os
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.http import FileResponse
+from django.utils.module_loading import import_string
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+def report_storage():
+    """The storage of the rendered reports, which is not web served"""
+    return FileSystemStorage(location=settings.PDF_REPORTS_ROOT)
+
+
+def report_path(template_name, obj, variant=''):
+    """Returns the storage path of an object's report"""
+    stamp = obj.updated.strftime('%Y%m%d%H%M%S%f')
+    file_name = '{}-{}.pdf'.format(stamp, variant) if variant else \
+        '{}.pdf'.format(stamp)
+    return os.path.join(
+        os.path.splitext(template_name)[0], str(obj.pk), file_name)
+
+
+def render_pdf(html):
+    # WeasyPrint is heavy to import, it is only loaded once a PDF is needed
+    from weasyprint import HTML
+    return HTML(string=html).write_pdf()
+
+
+def cached_render_pdf(html):
+    """
+    Renders html that is not tied to a single object e.g. a list page.
+
+    The PDF is cached against a digest of the html so that the same page is
+    rendered only once.
+    """
+    key = 'pdf_render_{}'.format(
+        hashlib.sha1(html.encode('utf-8')).hexdigest())
+    content = cache.get(key)
+    if content is None:
+        content = render_pdf(html)
+        cache.set(key, content, settings.PDF_RENDER_CACHE_SECONDS)
+    return content
+
+
+def store_report(path, content):
+    """
+    Saves a rendered report and removes the stale renders of the object.
+    """
+    storage = report_storage()
+    if storage.exists(path):
+        storage.delete(path)
+    storage.save(path, ContentFile(content))
+
+    directory, file_name = os.path.split(path)
+    variant = file_name.partition('-')[2]
+    for stale in storage.listdir(directory)[1]:
+        if stale != file_name and stale.partition('-')[2] == variant:
+            storage.delete(os.path.join(directory, stale))
+    return path
+
+
+def report_response(path, file_name):
+    return FileResponse(
+        report_storage().open(path, 'rb'), as_attachment=True,
+        filename='{}.pdf'.format(file_name),
+        content_type='application/pdf')
+
+
+def render_report_job(job):
+    """
+    Renders the report of a ``PDFJob`` using the report view it names.
+    """
+    view_class = import_string(job.report)
+    obj = view_class.queryset.all().get(pk=job.object_id)
+    path = report_path(view_class.report_tpl, obj, job.variant)
+    if not report_storage().exists(path):
+        html = view_class.render_report_html(obj, job.variant)
+        store_report(path, render_pdf(html))
+    LOGGER.info("Rendered {} for {}".format(view_class.report_tpl, obj.pk))
+    return path
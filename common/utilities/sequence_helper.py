@@ -16,3 +16,10 @@ class SequenceGenerator(object):
             cur.execute(query)
             row = cur.fetchone()
             return row[0]
+
+    def next_block(self, count):
+        """Reserves ``count`` values of the sequence in a single query"""
+        query = "SELECT nextval(%s) FROM generate_series(1, %s)"
+        with connection.cursor() as cur:
+            cur.execute(query, [self.sequence_name, count])
+            return [row[0] for row in cur.fetchall()]
@@ -2,6 +2,7 @@ from rest_framework import generics
 from rest_framework.exceptions import ValidationError
 
 from django.db.models.deletion import Collector, ProtectedError
+from django.utils.http import parse_etags
 
 
 def delete_child_instances(instance):
@@ -28,3 +29,22 @@ class CustomDestroyModelMixin(object):
 class CustomRetrieveUpdateDestroyView(
         CustomDestroyModelMixin, generics.RetrieveUpdateDestroyAPIView):
     pass
+
+
+def _weak_etag(etag):
+    return etag[2:] if etag.startswith('W/') else etag
+
+
+def etag_matches(request, etag):
+    """
+    Whether the request's If-None-Match has the ETag.
+
+    ETags are compared weakly, as ``django.utils.cache`` does, since the
+    compression middleware weakens the ETags of the responses it compresses.
+    """
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if not if_none_match:
+        return False
+    etags = parse_etags(if_none_match)
+    return '*' in etags or _weak_etag(etag) in [
+        _weak_etag(candidate) for candidate in etags]
@@ -1,4 +1,5 @@
 from rest_framework import generics, views, response, parsers
+from rest_framework.exceptions import NotFound
 from facilities.models.facility_models import FacilityAdmissionStatus
 
 from rest_framework_xml.parsers import XMLParser
@@ -17,6 +18,7 @@ from ..models import (
     SubCounty,
     DocumentUpload,
     ErrorQueue,
+    PDFJob,
     UserSubCounty,
     Notification
 )
@@ -56,6 +58,7 @@ from ..serializers import (
     SubCountySerializer,
     DocumentUploadSerializer,
     ErrorQueueSerializer,
+    PDFJobSerializer,
     UserSubCountySerializer,
     NotificationSerializer
 )
@@ -78,6 +81,7 @@ from ..filters import (
 )
 from .shared_views import AuditableDetailViewMixin
 from ..utilities import CustomRetrieveUpdateDestroyView
+from ..utilities.pdf_reports import report_response, report_storage
 
 
 class NotificationListView(generics.ListCreateAPIView):
@@ -752,3 +756,31 @@ class ErrorQueueDetailView(generics.RetrieveUpdateDestroyAPIView):
 
     serializer_class = ErrorQueueSerializer
     queryset = ErrorQueue.objects.all()
+
+
+class PDFJobDetailView(generics.RetrieveAPIView):
+    """
+    Retrieves the status of a queued PDF report
+    """
+
+    serializer_class = PDFJobSerializer
+    queryset = PDFJob.objects.all()
+
+    def get_queryset(self):
+        user = self.request.user
+        if user.is_superuser:
+            return self.queryset
+        return self.queryset.filter(created_by=user)
+
+
+class PDFJobDownloadView(PDFJobDetailView):
+    """
+    Downloads a rendered PDF report
+    """
+
+    def get(self, request, *args, **kwargs):
+        job = self.get_object()
+        if job.status != 'DONE' or \
+                not report_storage().exists(job.file_path):
+            raise NotFound("The report has not been rendered")
+        return report_response(job.file_path, job.file_name)
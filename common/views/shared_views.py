@@ -1,18 +1,24 @@
 import logging
-import reversion
-import json
 
-from django.core.exceptions import FieldDoesNotExist
-from django.db.models.fields.files import FileField, FieldFile
+from dateutil import parser
+from django.conf import settings
+from django.db import transaction
 from django.http import HttpResponse
-from weasyprint import HTML
+from django.template import loader
+from django.utils.decorators import method_decorator
+from django.views.decorators.cache import never_cache
 from django.shortcuts import redirect
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.mixins import RetrieveModelMixin
-from reversion.models import Version
 
 from facilities.filters import facility_filters
+from ..utilities.audit import RevisionDiffer
+from ..utilities.pdf_reports import (
+    render_pdf, report_path, report_response, report_storage, store_report
+)
 
 
 LOGGER = logging.getLogger(__name__)
@@ -20,90 +26,41 @@ LOGGER = logging.getLogger(__name__)
 
 class AuditableDetailViewMixin(RetrieveModelMixin):
 
-    def _resolve_field(self, field, version):
-        model_class = version.object.__class__
-        try:
-            fallback = version.field_dict.get(field, None)
-        except:
-            data = json.loads(version.serialized_data)
-            fallback= data[0].get('fields', {}).get(field)
+    audit_exclude = ['deleted', 'search', 'has_edits']
 
+    def _resolve_field(self, field, version):
+        differ = RevisionDiffer(version.content_type.model_class()())
+        return differ.resolve_field(field, version)
+
+    def generate_diffs(
+            self, instance, exclude=[], since=None, offset=0, limit=None):
+        differ = RevisionDiffer(
+            instance, exclude=exclude,
+            persist=settings.PERSIST_REVISION_DIFFS)
+        return differ.diffs(since=since, offset=offset, limit=limit)
+
+    def _get_audit_params(self, request):
+        params = request.query_params
         try:
-            model_field = model_class._meta.get_field(field)
-        except FieldDoesNotExist:
-            # since `model_class` represents the current representation of the
-            # model, what will happen if field is deleted from model ??
-            return fallback
-
-        follows = version.revision.version_set.exclude(pk=version.pk)
-
-        if model_field.is_relation:
-            followed_model_class = model_field.related_model
-            for f in follows:
-                if (f.content_type.model_class() == followed_model_class and
-                        f.field_dict['id'] == fallback):
-                    # What happens to M2M fields?
-                    return f.object_repr
-
-        if isinstance(model_field, (FileField, FieldFile, )):
-            return version.field_dict[field].name
-
-        return fallback
-
-    def _compare_objs(self, fields, old, new):
-        output = []
-
-        for fld in fields:
-            try:
-                old_val = old.field_dict.get(fld, '')
-            except:
-                data = json.loads(old.serialized_data)
-                old_val = data[0].get('fields', {}).get(fld)
-
-            try:
-                new_val = new.field_dict.get(fld, '')
-            except:
-                data = json.loads(new.serialized_data)
-                new_val = data[0].get('fields', {}).get(fld)
-
-            if old_val != new_val:
-                output.append({
-                    "name": fld,
-                    "old": self._resolve_field(fld, old),
-                    "new": self._resolve_field(fld, new)
-                })
-
-        print (output)
-
-        return output
-
-    def generate_diffs(self, instance, exclude=[]):
-        versions = Version.objects.get_for_object(instance)
-        fieldnames = [
-            f.name for f in instance._meta.fields
-            if f.name not in exclude
-        ]
-        ans = []
-        for i in range(1, len(versions), 1):
-            new = versions[i-1]
-            old = versions[i]
-            diff = self._compare_objs(fieldnames, old, new)
-            if diff:
-                if  hasattr(new.revision.user, 'get_full_name'):
-
-                    ans.append({
-                        "updates": diff,
-                        "updated_by": new.revision.user.get_full_name,
-                        "updated_on": new.revision.date_created
-                    })
-                else:
-                   ans.append({
-                       "updates": diff,
-                       "updated_by": "System Manager",
-                       "updated_on": new.revision.date_created
-                   })
-
-        return ans
+            since = parser.parse(params['since']) if params.get(
+                'since') else None
+            page = int(params.get('audit_page', 1))
+            page_size = int(params['audit_page_size']) if params.get(
+                'audit_page_size') else None
+        except (ValueError, OverflowError):
+            raise ValidationError({
+                "include_audit": [
+                    "since should be a date and audit_page and "
+                    "audit_page_size should be numbers"
+                ]
+            })
+        if page < 1 or (page_size is not None and page_size < 1):
+            raise ValidationError({
+                "include_audit": [
+                    "audit_page and audit_page_size should be greater than 0"
+                ]
+            })
+        return since, page, page_size
 
     def retrieve(self, request, *args, **kwargs):
         """
@@ -127,9 +84,10 @@ class AuditableDetailViewMixin(RetrieveModelMixin):
         we include that model instance's audit information in the returned
         representation.
 
-        We are counting on the fact that this API operates only on a single
-        *instance* AND the fact that audit data is optional ( opt-in ); hence
-        the lack of pagination of the revisions.
+        The revisions can be limited to those made after an ISO date with
+        `since` and paged ( newest first ) with `audit_page` and
+        `audit_page_size`. All the revisions are returned when no page size
+        is given.
 
         Reconstruction will be left to the client / consumer of this API.
         """
@@ -142,9 +100,19 @@ class AuditableDetailViewMixin(RetrieveModelMixin):
             facility_filters.TRUTH_NESS
         )
         if audit_requested:
+            since, page, page_size = self._get_audit_params(request)
+            offset = (page - 1) * page_size if page_size else 0
             data["revisions"] = self.generate_diffs(
-                instance, exclude=['deleted', 'search', 'has_edits'],
+                instance, exclude=self.audit_exclude, since=since,
+                offset=offset, limit=page_size
             )
+            if page_size:
+                data["revisions_page"] = {
+                    "page": page,
+                    "page_size": page_size,
+                    "has_next": RevisionDiffer(instance).has_more(
+                        since=since, offset=offset, limit=page_size)
+                }
 
         return Response(data)
 
@@ -181,9 +149,82 @@ def root_redirect_view(request):
 class DownloadPDFMixin(object):
 
     def download_file(self, html, file_name):
+        from weasyprint import HTML
         response = HttpResponse(content_type='application/pdf')
         response['Content-Disposition'] = 'attachment; filename={}.pdf'.format(
             file_name
         )
         HTML(string=html).write_pdf(response)
         return response
+
+
+@method_decorator(never_cache, name='get')
+class CachedPDFReportMixin(DownloadPDFMixin):
+
+    """
+    Serves PDF reports from PDF_REPORTS_ROOT, rendering them only when stale.
+
+    Renders are keyed by ``report_tpl``, the object and its ``updated``
+    timestamp. When a report is not rendered yet it is rendered in the
+    request unless the ``async`` GET param is given; then a ``PDFJob`` is
+    queued and its id returned so that the client can poll for the file.
+    """
+
+    report_tpl = None
+
+    @classmethod
+    def get_report_context(cls, obj, variant):
+        raise NotImplementedError(
+            "`get_report_context` should be implemented by the report view")
+
+    @classmethod
+    def render_report_html(cls, obj, variant=''):
+        template = loader.get_template(cls.report_tpl)
+        return template.render(cls.get_report_context(obj, variant))
+
+    def get_report_variant(self, obj):
+        return ''
+
+    def get_report_file_name(self, obj):
+        return obj.name
+
+    def queue_report(self, obj, variant, file_name):
+        from ..models import PDFJob
+        from ..serializers import PDFJobSerializer
+        from ..tasks import render_pdf_report
+
+        report = '{}.{}'.format(
+            self.__class__.__module__, self.__class__.__name__)
+        user = self.request.user
+        created_by = user if user.is_authenticated else None
+        # jobs can only be polled by their creators, a render that another
+        # user is waiting on is shared through the stored file instead
+        job = PDFJob.objects.filter(
+            report=report, object_id=str(obj.pk), variant=variant,
+            status='PENDING', created_by=created_by).first()
+        if job is None:
+            job = PDFJob.objects.create(
+                report=report, object_id=str(obj.pk), variant=variant,
+                file_name=file_name, created_by=created_by)
+            transaction.on_commit(
+                lambda: render_pdf_report.delay(str(job.id)))
+
+        serializer = PDFJobSerializer(
+            job, context=self.get_serializer_context())
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
+
+    def get(self, request, *args, **kwargs):
+        obj = self.get_object()
+        variant = self.get_report_variant(obj)
+        file_name = self.get_report_file_name(obj)
+        path = report_path(self.report_tpl, obj, variant)
+        if report_storage().exists(path):
+            return report_response(path, file_name)
+
+        if str(request.query_params.get('async', None)).lower() in \
+                facility_filters.TRUTH_NESS:
+            return self.queue_report(obj, variant, file_name)
+
+        html = self.render_report_html(obj, variant)
+        store_report(path, render_pdf(html))
+        return report_response(path, file_name)
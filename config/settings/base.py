@@ -11,6 +11,9 @@ env = environ.Env(
     DEBUG=(bool, True),
     FRONTEND_URL=(str, "http://localhost:8062"),
     REALTIME_INDEX=(bool, False),
+    ELASTIC_ENABLED=(bool, False),
+    LAST_LOGIN_ON_TOKEN_ISSUE=(bool, False),
+    FAST_JSON_RENDERER=(bool, False),
     HTTPS_ENABLED=(bool, False),
     SECRET_KEY=(str, 'p!ci1&ni8u98vvd#%18yp)aqh+m_8o565g*@!8@1wb$j#pj4d8'),
     EMAIL_HOST=(str, 'localhost'),
@@ -53,12 +56,13 @@ DATABASES = {
 MIDDLEWARE = (
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.cache.UpdateCacheMiddleware',
+    'common.middleware.CompressionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.cache.FetchFromCacheMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'oauth2_provider.middleware.OAuth2TokenMiddleware',
+    'users.authentication.CachedOAuth2TokenMiddleware',
     # 'django.contrib.auth.middleware.SessionAuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
@@ -182,7 +186,7 @@ REST_FRAMEWORK = {
     ),
     'DEFAULT_RENDERER_CLASSES': (
         'rest_framework.renderers.BrowsableAPIRenderer',
-        'rest_framework.renderers.JSONRenderer',
+        'common.renderers.FastJSONRenderer',
         'rest_framework_xml.renderers.XMLRenderer',
         'common.renderers.CSVRenderer',
         'common.renderers.ExcelRenderer',
@@ -192,7 +196,7 @@ REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'common.paginator.MflPaginationSerializer',
     'DEFAULT_AUTHENTICATION_CLASSES': (
         # 'oauth2_provider.ext.rest_framework.OAuth2Authentication',
-        'oauth2_provider.contrib.rest_framework.OAuth2Authentication',
+        'users.authentication.CachedOAuth2Authentication',
         'rest_framework.authentication.SessionAuthentication',
     ),
     'PAGE_SIZE': 30,
@@ -320,9 +324,34 @@ CACHES = {
 }
 CACHE_MIDDLEWARE_SECONDS = 15  # Intentionally conservative by default
 
+# cache for PDFs rendered from list and detail pages
+PDF_RENDER_CACHE_SECONDS = 60 * 60
+
 # cache for the gis views
 GIS_BORDERS_CACHE_SECONDS = (60 * 60 * 24 * 366)
 
+# in process cache of what the users in each group can do
+GROUP_CAPABILITIES_CACHE_SECONDS = 60 * 5
+
+# cache for the signed in user's profile at /api/rest-auth/user/
+SESSION_PROFILE_CACHE_SECONDS = 60 * 15
+
+# cache for the permissions of each user, see users.backends
+PERMISSION_CACHE_SECONDS = 60 * 60
+
+# cache for the validated OAuth2 access tokens, see users.authentication
+OAUTH2_TOKEN_CACHE_SECONDS = 60
+
+# render JSON with orjson, which is optional ( pip install mfl[fast] )
+FAST_JSON_RENDERER = env('FAST_JSON_RENDERER')
+
+# response compression, see common.middleware
+COMPRESSION_MIN_SIZE = 1024
+COMPRESSION_BROTLI_QUALITY = 5
+# compressed forms of payloads larger than this are cached
+COMPRESSION_PRECOMPRESS_MIN_SIZE = 256 * 1024
+COMPRESSION_CACHE_SECONDS = 60 * 60 * 24
+
 
 # django-allauth related settings
 # some of these settings take into account that the target audience
@@ -330,7 +359,7 @@ GIS_BORDERS_CACHE_SECONDS = (60 * 60 * 24 * 366)
 
 AUTHENTICATION_BACKENDS = (
     'oauth2_provider.backends.OAuth2Backend',
-    'django.contrib.auth.backends.ModelBackend',
+    'users.backends.CachedPermissionBackend',
     # 'users.backends.MflUserAuthBackend',
     'allauth.account.auth_backends.AuthenticationBackend',
 )
@@ -339,9 +368,40 @@ LOGIN_REDIRECT_URL = '/api/'
 
 SEARCH = {
     "ELASTIC_URL": "http://localhost:9200/",
+    "ELASTIC_ENABLED": env('ELASTIC_ENABLED'),
+    # ( connect, read ) timeouts of the requests to Elasticsearch
+    "ELASTIC_TIMEOUT": (1, 10),
+    "ELASTIC_POOL_SIZE": 10,
+    # how long a health check of Elasticsearch is trusted for
+    "ELASTIC_HEALTH_CHECK_SECONDS": 30,
     "INDEX_NAME": "mfl_index",
     "REALTIME_INDEX": env('REALTIME_INDEX'),
     "SEARCH_RESULT_SIZE": 50,
+    # tried in order, the first available backend serves the searches
+    "BACKENDS": [
+        "search.backends.ElasticSearchBackend",
+        "search.backends.PostgresSearchBackend",
+    ],
+    # the fields searched in Postgres, they are indexed by the models
+    "POSTGRES_SEARCH_FIELDS": {
+        "facilities.Facility": ["name", "official_name"],
+        "chul.CommunityHealthUnit": ["name"],
+    },
+    # the lookups of the indexed fields that are not model fields
+    "INDEX_FIELD_LOOKUPS": {
+        "facilities.Facility": {
+            "county": "ward__sub_county__county__name",
+            "constituency": "ward__constituency__name",
+            "ward_name": "ward__name",
+            "facility_services.service_name":
+                "facility_services__service__name",
+            "facility_services.category_name":
+                "facility_services__service__category__name",
+        },
+        "users.MflUser": {
+            "full_name": ["first_name", "last_name", "other_names"],
+        },
+    },
     "NON_INDEXABLE_MODELS": [
         "mfl_gis.FacilityCoordinates",
         "mfl_gis.WorldBorder",
@@ -532,6 +592,9 @@ SECURE_BROWSER_XSS_FILTER = True
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 MEDIA_URL = '/media/'
+# rendered PDF reports, outside MEDIA_ROOT as they are only served through
+# the permission checked report views
+PDF_REPORTS_ROOT = os.path.join(BASE_DIR, 'pdf_reports')
 
 
 # CELERY STUFF
@@ -543,6 +606,14 @@ CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
 EXCEL_EXCEPT_FIELDS_FOR_PUBLIC_USERS = EXCEL_EXCEPT_FIELDS + ['lat', 'long']
 
+# Store the computed audit trail diffs so that repeated audit views only
+# read them back
+PERSIST_REVISION_DIFFS = False
+
+# Update last_login as access tokens are issued instead of polling
+# the access tokens every minute
+LAST_LOGIN_ON_TOKEN_ISSUE = env('LAST_LOGIN_ON_TOKEN_ISSUE')
+
 # KMHFL - DHIS2 Configurations
 PUSH_TO_DHIS = not DEBUG
 DHIS_ENDPOINT = env('DHIS_ENDPOINT')
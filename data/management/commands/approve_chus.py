@@ -1,19 +1,79 @@
-
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
 from django.core.management import BaseCommand
 
-from chul.models import CommunityHealthUnit
+from chul.approvals import approve_health_units, approve_update_buffers
+from chul.models import ChuUpdateBuffer, CommunityHealthUnit
+from common.models.base import get_default_system_user_id
 
 
-def approve_chus(chu):
-    chu.is_approved = True
-    chu.save()
+class Command(BaseCommand):
+    help = "Approve the pending community health units and their updates"
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            dest='batch_size',
+            default=500,
+            help='The number of units or updates approved per transaction')
+        parser.add_argument(
+            '--updates',
+            action='store_true',
+            dest='updates',
+            default=False,
+            help='Also approve the pending updates of the units')
 
-class Command(BaseCommand):
+    def _batches(self, queryset, batch_size):
+        ids = list(queryset.values_list('id', flat=True))
+        for start in range(0, len(ids), batch_size):
+            yield ids[start:start + batch_size]
+
+    def _approve(self, approve, batch, user):
+        """
+        Approves a batch with ``approve``. An invalid unit rolls the whole
+        batch back, so the batch is then approved one unit at a time and
+        the units that fail are reported and skipped.
+        """
+        try:
+            return approve(batch, user), []
+        except ValidationError:
+            pass
+        approved, failed = [], []
+        for pk in batch:
+            try:
+                approved.extend(approve([pk], user))
+            except ValidationError as e:
+                failed.append(pk)
+                self.stderr.write("Skipped {}: {}".format(
+                    pk, '; '.join(e.messages)))
+        return approved, failed
+
+    def _approve_all(self, approve, pending, user, batch_size):
+        approved, failed = 0, 0
+        for batch in self._batches(pending, batch_size):
+            batch_approved, batch_failed = self._approve(approve, batch, user)
+            approved += len(batch_approved)
+            failed += len(batch_failed)
+        return approved, failed
 
     def handle(self, *args, **options):
-        def approve_community_units():
-            for chu in CommunityHealthUnit.objects.all():
-                approve_chus(chu)
+        user = get_user_model().objects.get(pk=get_default_system_user_id())
+        batch_size = options['batch_size']
+
+        pending = CommunityHealthUnit.objects.exclude(
+            is_approved=True).exclude(is_rejected=True)
+        approved, failed = self._approve_all(
+            approve_health_units, pending, user, batch_size)
+        self.stdout.write(
+            "Approved {} community health units, skipped {}".format(
+                approved, failed))
 
-        approve_community_units()
+        if options.get('updates'):
+            pending = ChuUpdateBuffer.objects.filter(
+                is_approved=False, is_rejected=False)
+            updated, failed = self._approve_all(
+                approve_update_buffers, pending, user, batch_size)
+            self.stdout.write(
+                "Applied the updates of {} community health units, "
+                "skipped {}".format(updated, failed))
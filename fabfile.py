@@ -130,30 +130,11 @@ def load_gis_data(*args, **kwargs):
     manage('load_kenyan_administrative_boundaries')
 
 
-def create_search_index(*args, **kwargs):
-    """
-    Creates the search index in elastic search
-    """
-    manage('setup_index')
-
-
-def remove_search_index(*args, **kwargs):
+def recreate_search_index(*args, **kwargs):
     """
-    Deletes the search index in elastic search
+    Rebuilds the search index into a new index and swaps it in when done
     """
-    manage('remove_index')
-
-
-def build_search_index(*args, **kwargs):
-    """Creates the entire search index"""
-    manage('build_index')
-    manage('index_material_records')
-
-
-def recreate_search_index(*args, **kwargs):
-    remove_search_index()
-    create_search_index()
-    build_search_index()
+    manage('rebuild_index')
 
 
 def setup_db(*args, **kwargs):
@@ -182,67 +163,14 @@ def clear_cache():
     local('redis-cli flushall')
 
 
-def warmup_cache(
-        server_location, username, password, client_id, client_secret):
-    """Warm up the cache"""
-    import requests
-    import logging
-    logging.basicConfig(level=logging.DEBUG)
-
-    def _get_url(stub):
-        return "{}{}".format(server_location, stub)
-
-    def login():
-        data = {
-            'username': username,
-            'password': password,
-            'grant_type': 'password',
-            'client_id': client_id,
-            'client_secret': client_secret
-        }
-        headers = {
-            'Accept': 'application/json'
-        }
-        resp = requests.request(
-            "POST", url=_get_url("/o/token/"), data=data,
-            headers=headers
-        )
-        if resp.status_code == 200:
-            data = resp.json()
-            return "{} {}".format(data['token_type'], data['access_token'])
-        else:
-            raise ValueError(resp.content)
-
-    def prod_api(token):
-        non_gzipped_headers = {
-            'Authorization': token,
-            'Accept': 'application/json, */*'
-        }
-        gzipped_headers = {
-            'Authorization': token,
-            'Accept': 'application/json, */*',
-            'Accept-Encoding': 'gzip'
-        }
-        urls = [
-            "/api/gis/coordinates/",
-            "/api/gis/county_boundaries/",
-            "/api/gis/ward_boundaries/",
-            "/api/gis/constituency_boundaries/",
-            "/api/common/filtering_summaries/"
-            "/api/facilities/facilities/",
-            "/api/facilities/facilities_list/",
-            "/api/facilities/facilities_list/?format=excel"
-        ]
-        for i in urls:
-            # warmup non-gzip encoded content
-            requests.request(
-                "GET", url=_get_url(i), headers=non_gzipped_headers
-            )
-
-            # warmup gzip encoded content
-            requests.request("GET", url=_get_url(i), headers=gzipped_headers)
-
-    prod_api(login())
+def warmup_cache(host=None, secure='False', workers=4):
+    """Warm up the cache, see the warmup_cache management command"""
+    args = '--workers {}'.format(workers)
+    if host:
+        args += ' --host {}'.format(host)
+    if secure in TRUTH_NESS:
+        args += ' --secure'
+    manage('warmup_cache', args)
 
 
 def start_celery_worker(*args, **kwargs):
@@ -0,0 +1,265 @@
+"""
+Applies approved facility updates.
+
+Approving a ``FacilityUpdates`` used to save the facility up to four times,
+look up every buffered service, specialist, infrastructure item and contact
+one at a time and push to DHIS2 inside the request. Here the buffered JSON
+is parsed once and each relation is diffed against the facility's rows with
+a single query. The new rows are created in bulk inside one transaction and
+the facility is saved once. The DHIS2 push and the search indexing run once
+the transaction commits.
+"""
+import datetime
+import logging
+
+import reversion
+
+from dateutil import parser
+from django.conf import settings
+from django.contrib.gis.geos import Point
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from common.models import Contact
+
+from .models import (
+    FacilityContact,
+    FacilityInfrastructure,
+    FacilityService,
+    FacilitySpecialist,
+    FacilityUnit,
+    FacilityUpgrade
+)
+from .tasks import push_facility_updates_to_dhis2
+from .utils import _create_officer
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+def _parse_basic_value(field_name, value):
+    if field_name == 'date_established' and value:
+        value = parser.parse(value)
+        return datetime.date(
+            year=value.year, month=value.month, day=value.day)
+    return value
+
+
+def _row_values(model, data):
+    """
+    The values in ``data`` that are fields of ``model``. Relations are
+    given by id, so they are set through their ``<name>_id`` attribute.
+    """
+    values = {}
+    for field in model._meta.concrete_fields:
+        if field.name in data and field.name != 'facility':
+            key = field.attname if field.is_relation else field.name
+            values[key] = data[field.name]
+    return values
+
+
+def _is_valid(instance):
+    # the related rows are not looked up, the database enforces them
+    try:
+        instance.clean_fields(exclude=[
+            field.name for field in instance._meta.fields
+            if field.is_relation])
+    except ValidationError as e:
+        LOGGER.warning("Skipping the {} update {}: {}".format(
+            instance.__class__.__name__, instance.__dict__, e))
+        return False
+    return True
+
+
+class FacilityUpdateApproval(object):
+
+    """
+    Applies the changes buffered in an approved ``FacilityUpdates``.
+
+    ``apply`` must run inside the transaction that saves the update.
+    """
+
+    # buffered key -> ( model, the field that identifies a row )
+    RELATIONS = {
+        'services': (FacilityService, 'service'),
+        'humanresources': (FacilitySpecialist, 'speciality'),
+        'infrastructure': (FacilityInfrastructure, 'infrastructure'),
+    }
+
+    def __init__(self, facility_update):
+        self.update = facility_update
+        self.facility = facility_update.facility
+        self.updates = facility_update.parsed_updates()
+        self.now = timezone.now()
+
+    @property
+    def audit(self):
+        return {
+            "created": self.update.updated,
+            "updated": self.update.updated,
+            "created_by_id": self.update.created_by_id,
+            "updated_by_id": self.update.updated_by_id,
+        }
+
+    def apply_basic_details(self):
+        for change in self.updates.get('basic', []):
+            field_name = change.get('field_name')
+            setattr(self.facility, field_name, _parse_basic_value(
+                field_name, change.get('actual_value')))
+
+    def apply_upgrade(self):
+        upgrade = FacilityUpgrade.objects.filter(
+            facility=self.facility, is_cancelled=False, is_confirmed=False
+        ).select_related('keph_level', 'facility_type').first()
+        if upgrade is None:
+            return
+
+        if upgrade.keph_level:
+            self.facility.keph_level = upgrade.keph_level
+        self.facility.facility_type = upgrade.facility_type
+        upgrade.is_confirmed = True
+        upgrade.updated = self.now
+        # a plain update, saving the upgrade would save the facility
+        FacilityUpgrade.objects.filter(pk=upgrade.pk).update(
+            is_confirmed=True, updated=self.now)
+        if reversion.is_active():
+            reversion.add_to_revision(upgrade)
+
+    def apply_relation(self, key):
+        """
+        Adds the buffered rows that the facility does not have yet, e.g.
+        services, with one query for the existing rows and a bulk insert.
+        """
+        model, key_field = self.RELATIONS[key]
+        key_attname = model._meta.get_field(key_field).attname
+        items = [item for item in self.updates.get(key, []) if item]
+        existing = set(
+            str(value) for value in model.objects.filter(
+                facility=self.facility,
+                **{'{}__in'.format(key_attname): [
+                    item.get(key_field) for item in items]}
+            ).values_list(key_attname, flat=True))
+
+        rows = []
+        for item in items:
+            row_key = str(item.get(key_field))
+            if row_key in existing:
+                continue
+            existing.add(row_key)
+            row = model(facility=self.facility, **self.audit)
+            for attr, value in _row_values(model, item).items():
+                setattr(row, attr, value)
+            if _is_valid(row):
+                rows.append(row)
+        return model.objects.bulk_create(rows)
+
+    def apply_units(self):
+        """Replaces the facility's units that are in the update"""
+        units = {}
+        for unit in self.updates.get('units', []):
+            units[str(unit.get('unit'))] = unit
+        FacilityUnit.everything.filter(
+            facility=self.facility, unit_id__in=list(units)).delete()
+
+        rows = []
+        for unit in units.values():
+            row = FacilityUnit(facility=self.facility, **self.audit)
+            for attr, value in _row_values(FacilityUnit, unit).items():
+                setattr(row, attr, value)
+            if _is_valid(row):
+                rows.append(row)
+        return FacilityUnit.objects.bulk_create(rows)
+
+    def apply_contacts(self):
+        """
+        Links the facility to the buffered contacts. Contacts that exist
+        are reused, whatever their type, the others are created.
+        """
+        buffered = {}
+        for contact in self.updates.get('contacts', []):
+            if contact.get('contact') is not None:
+                buffered.setdefault(contact['contact'], contact)
+        if not buffered:
+            return []
+
+        contacts = {}
+        for contact in Contact.objects.filter(
+                contact__in=list(buffered)):
+            contacts.setdefault(contact.contact, contact)
+        missing = [
+            Contact(
+                contact=value, contact_type_id=data.get('contact_type'),
+                **self.audit)
+            for value, data in buffered.items() if value not in contacts
+        ]
+        for contact in Contact.objects.bulk_create(missing):
+            contacts[contact.contact] = contact
+
+        linked = set(
+            FacilityContact.objects.filter(
+                facility=self.facility,
+                contact__in=list(contacts.values())
+            ).values_list('contact_id', flat=True))
+        return FacilityContact.objects.bulk_create([
+            FacilityContact(
+                facility=self.facility, contact=contact, **self.audit)
+            for contact in contacts.values() if contact.id not in linked
+        ])
+
+    def apply_officer_in_charge(self):
+        _create_officer(
+            self.updates['officer_in_charge'], self.update.created_by)
+
+    def apply_geo_codes(self):
+        from mfl_gis.models import FacilityCoordinates
+        geo_codes = self.updates.get('geo_codes')
+        coordinates = geo_codes.get('coordinates')
+        values = {
+            "method_id": geo_codes.get('method_id'),
+            "source_id": geo_codes.get('source_id'),
+            "coordinates": Point(coordinates.get('coordinates'))
+            if coordinates else None,
+            "updated_by_id": self.update.updated_by_id,
+        }
+
+        coords = FacilityCoordinates.objects.filter(
+            facility=self.facility).first()
+        if coords is None:
+            FacilityCoordinates.objects.create(
+                facility=self.facility, created=self.update.updated,
+                created_by_id=self.update.created_by_id, **values)
+            return
+        for attr, value in values.items():
+            if value:
+                setattr(coords, attr, value)
+        coords.save()
+
+    def queue_dhis_push(self):
+        if not settings.PUSH_TO_DHIS:
+            return
+        transaction.on_commit(
+            lambda update_id=str(self.update.id):
+                push_facility_updates_to_dhis2.delay(update_id))
+
+    def apply(self):
+        self.apply_basic_details()
+        self.apply_upgrade()
+        for key in self.RELATIONS:
+            if self.updates.get(key):
+                self.apply_relation(key)
+        if self.updates.get('units'):
+            self.apply_units()
+        if self.updates.get('contacts'):
+            self.apply_contacts()
+        if self.updates.get('officer_in_charge'):
+            self.apply_officer_in_charge()
+        if self.updates.get('geo_codes'):
+            self.apply_geo_codes()
+
+        self.facility.has_edits = False
+        self.facility.updated = self.now
+        self.facility.save(allow_save=True)
+        if self.updates.get('basic'):
+            self.queue_dhis_push()
+        return self.facility
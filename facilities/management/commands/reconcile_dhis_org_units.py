@@ -0,0 +1,26 @@
+import json
+
+from django.core.management import BaseCommand
+
+from facilities.models import DhisAuth, DhisOrgUnit
+
+
+class Command(BaseCommand):
+    help = "Diff the facilities reporting in DHIS2 against DHIS2"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sync',
+            action='store_true',
+            dest='sync',
+            default=False,
+            help='Sync the organisation units from DHIS2 before diffing')
+
+    def handle(self, *args, **options):
+        if options.get('sync'):
+            DhisAuth().sync_org_units()
+
+        diff = DhisOrgUnit.objects.reconcile_facilities()
+        for key, value in diff.items():
+            self.stdout.write("{}: {}".format(key, len(value)))
+        self.stdout.write(json.dumps(diff, indent=2))
@@ -0,0 +1,19 @@
+from django.core.management import BaseCommand
+
+from facilities.models import DhisAuth, DHIS_ORG_UNIT_PAGE_SIZE
+
+
+class Command(BaseCommand):
+    help = "Mirror the DHIS2 organisation unit tree into the database"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--page-size',
+            type=int,
+            dest='page_size',
+            default=DHIS_ORG_UNIT_PAGE_SIZE,
+            help='The number of organisation units to fetch per request')
+
+    def handle(self, *args, **options):
+        synced = DhisAuth().sync_org_units(page_size=options['page_size'])
+        self.stdout.write("Synced {} organisation units".format(synced))
@@ -0,0 +1,129 @@
+# Generated by Django 4.2.7 on 2026-10-19 09:00
+
+from django.db import migrations, models
+import django.utils.timezone
+import uuid
+
+
+# The KMHFL to DHIS2 organisation unit group mappings that used to be
+# hardcoded in Facility.push_new_facility
+DHIS_METADATA_MAPPINGS = {
+    "FACILITY_TYPE": {
+        "20b86171-0c16-47e1-9277-5e773d485c33": "YQK9pleIoeB",
+        "5eb392ac-d10a-40c9-b525-53dac866ef6c": "lTrpyOiOcM6",
+        "8949eeb0-40b1-43d4-a38d-5d4933dc209f": "lTrpyOiOcM6",
+        "ccc1600e-9a24-499f-889f-bd9f0bdc4b95": "YQK9pleIoeB",
+        "d8d741b1-21c5-45c8-86d0-a2094bf9bda6": "YQK9pleIoeB",
+        "85f2099b-a2f8-49f4-9798-0cb48c0875ff": "YQK9pleIoeB",
+        "869118aa-0e97-4f47-b6b7-1f295d109c8f": "YQK9pleIoeB",
+        "a8af148f-b1b6-4eed-9d86-07d4f3135229": "YQK9pleIoeB",
+        "74755372-99ba-4b70-bca8-a583f03990bc": "lTrpyOiOcM6",
+        "4714529e-21de-4d5c-89da-11e335831327": "lTrpyOiOcM6",
+        "52ccbc58-2a71-4a66-be40-3cd72e67f798": "CGDNIWGHRNr",
+        "831a23c1-9124-4ce1-a0cf-60b59ef0fba5": "YQK9pleIoeB",
+        "336bf913-b42e-476a-bf47-11d3f769922f": "YQK9pleIoeB",
+        "f222bab7-589c-4ba8-bd9a-fe6c96fcd085": "CGDNIWGHRNr",
+        "35376bf5-2e83-4f70-8c4d-a7b80f782eb1": "YQK9pleIoeB",
+        "479a9a16-219f-48f6-818d-b2c06ada2332": "rhKJPLo27x7",
+        "b9a51572-c931-4cc5-8e21-f17b22b0fd20": "CGDNIWGHRNr",
+        "1571711c-4b80-493b-8109-faab2e4f43f0": "YQK9pleIoeB",
+        "4d47a5dd-628a-4049-a240-3ab767415c49": "rhKJPLo27x7",
+        "0fa47f39-d58e-4a16-845c-82818719188d": "CGDNIWGHRNr",
+        "22c161ee-577f-41ef-bd4e-dd0a26327bbc": "YQK9pleIoeB",
+        "cd841f88-198a-4d8a-869c-3ab4a7091c11": "YQK9pleIoeB",
+        "188551b7-4f22-4fc4-b07b-f9c9aeeea872": "rhKJPLo27x7",
+        "e5923a48-6b22-42c4-a4e6-6c5a5e8e0b0e": "YQK9pleIoeB",
+        "55d65dd6-5351-4cf4-a6d9-e05ce6d343ab": "mVrepdLAqSD",
+        "87626d3d-fd19-49d9-98da-daca4afe85bf": "mVrepdLAqSD",
+        "79158397-0d87-4d0e-8694-ad680a907a79": "YQK9pleIoeB",
+        "031293d9-fd8a-4682-a91e-a4390d57b0cf": "YQK9pleIoeB",
+        "4369eec8-0416-4e16-b013-e635ce46a02f": "YQK9pleIoeB",
+    },
+    "OWNERSHIP": {
+        "d45541f8-3b3d-475b-94f4-17741d468135": "aRxa6o8GqZN",
+        "afc4bcdb-fc22-4336-8958-d2df06fe90ad": "aRxa6o8GqZN",
+        "56937bed-ea04-4306-bdf9-86668eb570c7": "aRxa6o8GqZN",
+        "122f57a8-51ef-4a26-9024-4b34386485fd": "aRxa6o8GqZN",
+        "abda166b-5c02-44c8-8058-5e4112ef9f95": "eT1vvFVhLHc",
+        "cd04053e-a5eb-425b-b4d7-24746c311fa6": "eT1vvFVhLHc",
+        "a3477ae7-ee1e-410e-83b1-64bf8b723d95": "aRxa6o8GqZN",
+        "9bbcb2b4-f1d6-449b-a2cf-e92db2d861df": "aRxa6o8GqZN",
+        "5363e7ac-2728-4099-9f5b-da14e2ee83d0": "aRxa6o8GqZN",
+        "f918d78e-e09b-4e91-8a97-f6229a27346b": "aRxa6o8GqZN",
+        "4a1c60b2-85b3-41b5-aed7-8448b863d566": "aRxa6o8GqZN",
+        "ddebc398-fe10-44c2-b45a-1a35b357ae99": "AaAF5EmS1fk",
+        "15aa5a44-0833-4e8f-83e6-916e5e5ab213": "eT1vvFVhLHc",
+        "28d7a8e1-e15c-4326-ace1-b2c1b81af586": "None",
+        "4560545a-67c7-4b2b-87be-b0babee4cb83": "AaAF5EmS1fk",
+        "2c62704b-8072-470c-a7e6-259384f364f7": "eT1vvFVhLHc",
+        "cfe25392-4f85-49ea-b180-35388f47ea9e": "eT1vvFVhLHc",
+        "93c0fe24-3f12-4be2-b5ff-027e0bd02274": "AaAF5EmS1fk",
+        "c3bab995-0c29-433c-b39c-6b86d6084f5f": "AaAF5EmS1fk",
+        "6cb92834-107c-404a-91fa-cf60b1eb5333": "aRxa6o8GqZN",
+        "2e651780-2ed4-4f8c-9061-6e5acf95d581": "AaAF5EmS1fk",
+        "30af7e3f-cd52-4ca0-b5dc-d8b1040a9808": "AaAF5EmS1fk",
+        "d64bbd8a-4013-463b-a238-c346cee66a92": "AaAF5EmS1fk",
+    },
+    "KEPH": {
+        "ed23da85-4c92-45af-80fa-9b2123769f49": "FpY8vg4gh46",
+        "7824068f-6533-4532-9775-f8ef200babd1": "d5QX71PY5t0",
+        "c0bb24c2-1a96-47ce-b327-f855121f354f": "hBZ5DRto7iF",
+        "174f7d48-3b57-4997-a743-888d97c5ec31": "wwiu1jyZOXO",
+        "ceab4366-4538-4bcf-b7a7-a7e2ce3b50d5": "tvMxZ8aCVou",
+    },
+}
+
+
+def load_dhis_metadata_mappings(apps, schema_editor):
+    DhisMetadataMapping = apps.get_model('facilities', 'DhisMetadataMapping')
+    DhisMetadataMapping.objects.bulk_create([
+        DhisMetadataMapping(
+            mapping_type=mapping_type, kmhfl_id=uuid.UUID(kmhfl_id),
+            dhis_uid=dhis_uid)
+        for mapping_type, mappings in DHIS_METADATA_MAPPINGS.items()
+        for kmhfl_id, dhis_uid in mappings.items()
+    ])
+
+
+def remove_dhis_metadata_mappings(apps, schema_editor):
+    apps.get_model('facilities', 'DhisMetadataMapping').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('facilities', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DhisOrgUnit',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('uid', models.CharField(help_text='The DHIS2 uid of the unit', max_length=11, unique=True)),
+                ('code', models.CharField(blank=True, db_index=True, help_text='The DHIS2 code e.g the MFL code for facilities', max_length=100, null=True)),
+                ('name', models.CharField(max_length=255)),
+                ('level', models.PositiveSmallIntegerField(help_text='The level of the unit in the DHIS2 hierarchy')),
+                ('parent_uid', models.CharField(blank=True, max_length=11, null=True)),
+                ('last_updated', models.DateTimeField(blank=True, help_text='When the unit was last updated in DHIS2', null=True)),
+                ('synced', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['level', 'code'], name='dhis_org_unit_level_code_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DhisMetadataMapping',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mapping_type', models.CharField(choices=[('FACILITY_TYPE', 'KMHFL facility type to DHIS2 organisation unit group'), ('OWNERSHIP', 'KMHFL owner to DHIS2 organisation unit group'), ('KEPH', 'KMHFL KEPH level to DHIS2 organisation unit group')], max_length=50)),
+                ('kmhfl_id', models.UUIDField(help_text='The id of the facility type, owner or KEPH level')),
+                ('dhis_uid', models.CharField(help_text='The uid of the DHIS2 organisation unit group', max_length=11)),
+            ],
+            options={
+                'unique_together': {('mapping_type', 'kmhfl_id')},
+            },
+        ),
+        migrations.RunPython(
+            load_dhis_metadata_mappings, remove_dhis_metadata_mappings),
+    ]
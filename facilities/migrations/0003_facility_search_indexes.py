@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-19 14:00
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('facilities', '0002_dhis_org_units'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddIndex(
+            model_name='facility',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.search.SearchVector('name', 'official_name', config='simple'), name='facility_search_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='facility',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['name'], name='facility_name_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='facility',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['official_name'], name='facility_official_name_trgm', opclasses=['gin_trgm_ops']),
+        ),
+    ]
@@ -5,7 +5,6 @@ import reversion
 import json
 import logging
 import re
-import datetime
 
 from dateutil import parser
 
@@ -14,11 +13,11 @@ from django.core import validators
 from django.db import models, transaction
 from django.core.exceptions import ValidationError
 from django.utils import encoding, timezone
-from django.contrib.gis.geos import Point
 from django.contrib.postgres.fields import ArrayField
 
 
 from users.models import JobTitle  # NOQA
+from search.backends import postgres_search_indexes
 from search.search_utils import index_instance
 from common.models import (
     AbstractBase, Ward, Contact, SequenceMixin, SubCounty, County,
@@ -26,10 +25,37 @@ from common.models import (
 )
 from common.fields import SequenceField
 from django.contrib.sessions.backends.db import SessionStore
-import threading, requests, base64
+import base64
+import random
+import string
+import threading
+
+import requests
 
 LOGGER = logging.getLogger(__name__)
 
+DHIS_ORG_UNIT_PAGE_SIZE = 1000
+DHIS_WARD_LEVEL = 4
+DHIS_FACILITY_LEVEL = 5
+
+DHIS_METADATA_MAPPING_TYPES = (
+    ('FACILITY_TYPE', 'KMHFL facility type to DHIS2 organisation unit group'),
+    ('OWNERSHIP', 'KMHFL owner to DHIS2 organisation unit group'),
+    ('KEPH', 'KMHFL KEPH level to DHIS2 organisation unit group'),
+)
+
+
+def generate_dhis_uid():
+    """
+    Generates a DHIS2 compatible uid without a round trip to DHIS2.
+
+    DHIS2 uids are 11 alphanumeric characters that start with a letter.
+    """
+    rand = random.SystemRandom()
+    alphanumeric = string.ascii_letters + string.digits
+    return rand.choice(string.ascii_letters) + "".join(
+        rand.choice(alphanumeric) for _ in range(10))
+
 
 # @encoding.python_2_unicode_compatible
 class DhisAuth(ApiAuthentication):
@@ -110,72 +136,94 @@ class DhisAuth(ApiAuthentication):
         self.refresh_oauth2_token()
 
     def generate_uuid_dhis(self):
-        r_generate_orgunit_uid = requests.get(
-            settings.DHIS_ENDPOINT + "api/system/uid.json",
-            auth=(settings.DHIS_USERNAME, settings.DHIS_PASSWORD),
-            headers={
-                # "Authorization": "Bearer " + json.loads(self.session_store[self.oauth2_token_variable_name].replace("u", "")
-                #                                         .replace("'", '"'))["access_token"],
-                "Accept": "application/json"
-            },
-        )
-        print("New OrgUnit UID Generated-", r_generate_orgunit_uid.json()['codes'][0])
-        return r_generate_orgunit_uid.json()['code'][0]
+        return generate_dhis_uid()
 
-    def get_org_unit_id(self, code):
+    def fetch_org_units(self, page_size=DHIS_ORG_UNIT_PAGE_SIZE):
+        """
+        Yields every organisation unit in DHIS2, a page at a time.
+
+        Only the fields mirrored in ``DhisOrgUnit`` are requested and the
+        pages are fetched over a single connection.
+        """
+        session = requests.Session()
+        session.auth = (settings.DHIS_USERNAME, settings.DHIS_PASSWORD)
+        session.headers.update({"Accept": "application/json"})
+        page = 1
+        while True:
+            r = session.get(
+                settings.DHIS_ENDPOINT + "api/organisationUnits.json",
+                params={
+                    "fields": "id,code,name,level,parent[id],lastUpdated",
+                    "page": page,
+                    "pageSize": page_size
+                }
+            )
+            payload = r.json()
+            for org_unit in payload["organisationUnits"]:
+                yield org_unit
+            if page >= payload.get("pager", {}).get("pageCount", page):
+                break
+            page += 1
+
+    def sync_org_units(self, page_size=DHIS_ORG_UNIT_PAGE_SIZE):
+        """Mirrors the DHIS2 organisation unit tree into ``DhisOrgUnit``"""
+        return DhisOrgUnit.objects.sync(
+            self.fetch_org_units(page_size=page_size))
+
+    def _lookup_org_units(self, params):
         r = requests.get(
             settings.DHIS_ENDPOINT + "api/organisationUnits.json",
             auth=(settings.DHIS_USERNAME, settings.DHIS_PASSWORD),
             headers={
                 "Accept": "application/json"
             },
-            params={
-                "filter": "code:eq:"+str(code),
-                "fields": "[id]",
-                "paging": "false"
-            }
+            params=params
         )
-        print("Get Org Unit ID Response", r.text, str(code))
-        if len(r.json()["organisationUnits"]) == 1:
-            # raise ValidationError(
-            #     {
-            #         "Error!": ["This facility is already available in DHIS2. Please ensure details are correct"]
-            #     }
-            # )
-            return [r.json()["organisationUnits"][0]["id"], 'retrieved']
-        else:
-            r_generate_orgunit_uid = requests.get(
-                settings.DHIS_ENDPOINT + "api/system/uid.json",
-                auth=(settings.DHIS_USERNAME, settings.DHIS_PASSWORD),
-                headers={
-                    "Accept": "application/json"
-                },
-            )
-            # print("New OrgUnit UID Generated-", r_generate_orgunit_uid.json()['codes'][0])
-            return [r_generate_orgunit_uid.json()['codes'][0], 'generated']
-            # raise ValidationError(
-            #     {
-            #         "Error!": ["Unable to resolve exact organisation unit of the facility to be updated in DHIS2. "
-            #                    "Most probably, the corresponding MFL code for the facility does not exist in DHIS2"]
-            #     }
-            # )
+        return r.json()["organisationUnits"]
+
+    def get_org_unit_id(self, code):
+        """
+        Resolves the DHIS2 uid of the organisation unit with the given code.
+
+        The mirrored organisation units are consulted first and DHIS2 is
+        queried for codes missing from the mirror e.g units added since the
+        last sync. Only units that DHIS2 does not have either get a locally
+        generated uid.
+        """
+        org_unit_id = DhisOrgUnit.objects.resolve_code(code)
+        if org_unit_id:
+            return [org_unit_id, 'retrieved']
+
+        org_units = self._lookup_org_units({
+            "filter": "code:eq:" + str(code),
+            "fields": "[id,name,level]",
+            "paging": "false"
+        })
+        if len(org_units) == 1:
+            org_unit = org_units[0]
+            DhisOrgUnit.objects.record(
+                org_unit["id"], str(code), org_unit.get("name", ""),
+                org_unit.get("level", DHIS_FACILITY_LEVEL))
+            return [org_unit["id"], 'retrieved']
+
+        return [generate_dhis_uid(), 'generated']
 
     def get_parent_id(self, ward_id):
-        print (self.session_store[self.oauth2_token_variable_name])
-        r = requests.get(
-            settings.DHIS_ENDPOINT+"api/organisationUnits.json",
-            auth=(settings.DHIS_USERNAME, settings.DHIS_PASSWORD),
-            headers={
-                "Accept": "application/json"
-            },
-            params={
-                "query": "KE_Ward_" + str(ward_id),
-                "fields": "[id,name]",
-                "filter": "level:in:[4]",
-                "paging": "false"
-            }
-        )
-        dhis2_facility = r.json()["organisationUnits"]
+        """
+        Resolves the DHIS2 uid of a ward from the mirrored organisation units
+        falling back to DHIS2 for wards that have not been synced.
+        """
+        query = "KE_Ward_" + str(ward_id)
+        parent_id = DhisOrgUnit.objects.resolve_query(query, DHIS_WARD_LEVEL)
+        if parent_id:
+            return parent_id
+
+        dhis2_facility = self._lookup_org_units({
+            "query": query,
+            "fields": "[id,name,code]",
+            "filter": "level:in:[4]",
+            "paging": "false"
+        })
 
         if len(dhis2_facility) == 0:
             raise ValidationError(
@@ -184,9 +232,13 @@ class DhisAuth(ApiAuthentication):
                 }
             )
         else:
+            DhisOrgUnit.objects.record(
+                dhis2_facility[0]["id"], dhis2_facility[0].get("code"),
+                dhis2_facility[0]["name"], DHIS_WARD_LEVEL)
             return dhis2_facility[0]["id"]
 
     def push_facility_to_dhis2(self, new_facility_payload, new_facility=True):
+        org_unit_id = new_facility_payload["id"]
         if new_facility:
             r = requests.post(
                 settings.DHIS_ENDPOINT+"api/organisationUnits",
@@ -218,6 +270,10 @@ class DhisAuth(ApiAuthentication):
                                "Or some specific information like codes are not unique"]
                 }
             )
+        DhisOrgUnit.objects.record(
+            org_unit_id, new_facility_payload["code"],
+            new_facility_payload["name"], DHIS_FACILITY_LEVEL,
+            new_facility_payload["parent"]["id"])
 
     def push_facility_metadata(self, metadata_payload, facility_uid):
         # Keph Level
@@ -291,6 +347,213 @@ class DhisAuth(ApiAuthentication):
         return "{}: {}".format("Dhis Auth - ", settings.DHIS_USERNAME)
 
 
+class DhisOrgUnitManager(models.Manager):
+
+    def resolve_code(self, code, level=None):
+        """Returns the DHIS2 uid of the unit with the code or None"""
+        org_units = self.filter(code=str(code))
+        if level:
+            org_units = org_units.filter(level=level)
+        return org_units.values_list('uid', flat=True).first()
+
+    def resolve_query(self, query, level):
+        """
+        Mimics the DHIS2 ``query`` parameter i.e matches the code or the name
+        of the units at the given level. A unit with the code is preferred
+        over those whose names contain the query.
+        """
+        code_match = models.Q(code__iexact=query)
+        return self.filter(level=level).filter(
+            code_match | models.Q(name__icontains=query)
+        ).annotate(
+            code_matched=models.Case(
+                models.When(code_match, then=models.Value(0)),
+                default=models.Value(1),
+                output_field=models.IntegerField())
+        ).order_by('code_matched', 'name', 'uid').values_list(
+            'uid', flat=True).first()
+
+    def record(self, uid, code, name, level, parent_uid=None):
+        """Keeps the mirror current with units created or found outside a sync"""
+        self.update_or_create(
+            uid=uid,
+            defaults={
+                "code": code,
+                "name": name,
+                "level": level,
+                "parent_uid": parent_uid,
+                "synced": timezone.now()
+            }
+        )
+
+    def sync(self, org_units, batch_size=DHIS_ORG_UNIT_PAGE_SIZE):
+        """
+        Upserts the given DHIS2 organisation units in batches.
+
+        ``org_units`` is an iterable of the dicts returned by the DHIS2
+        organisationUnits API. Returns the number of units synced.
+        """
+        now = timezone.now()
+        synced = 0
+        batch = []
+
+        def flush(batch):
+            self.bulk_create(
+                batch, update_conflicts=True, unique_fields=['uid'],
+                update_fields=[
+                    'code', 'name', 'level', 'parent_uid', 'last_updated',
+                    'synced'
+                ]
+            )
+
+        for org_unit in org_units:
+            batch.append(self.model(
+                uid=org_unit["id"],
+                code=org_unit.get("code"),
+                name=org_unit.get("name", ""),
+                level=org_unit.get("level", 0),
+                parent_uid=(org_unit.get("parent") or {}).get("id"),
+                last_updated=parser.parse(org_unit["lastUpdated"])
+                if org_unit.get("lastUpdated") else None,
+                synced=now
+            ))
+            if len(batch) == batch_size:
+                flush(batch)
+                synced += len(batch)
+                batch = []
+        if batch:
+            flush(batch)
+            synced += len(batch)
+
+        # units that were not seen in this sync have been removed from DHIS2
+        self.filter(synced__lt=now).delete()
+        return synced
+
+    def reconcile_facilities(self):
+        """
+        Diffs the facilities that report in DHIS2 against the mirrored
+        facility level organisation units in one pass.
+        """
+        dhis_units = {
+            code: name for code, name in self.filter(
+                level=DHIS_FACILITY_LEVEL, code__isnull=False
+            ).values_list('code', 'name')
+        }
+        mfl_facilities = Facility.objects.filter(
+            code__isnull=False, reporting_in_dhis=True,
+            approved_national_level=True
+        ).values_list('code', 'name')
+
+        missing_in_dhis = []
+        name_mismatches = []
+        mfl_codes = set()
+        for code, name in mfl_facilities:
+            code = str(code)
+            mfl_codes.add(code)
+            if code not in dhis_units:
+                missing_in_dhis.append(code)
+            elif dhis_units[code] != name:
+                name_mismatches.append({
+                    "code": code,
+                    "mfl_name": name,
+                    "dhis_name": dhis_units[code]
+                })
+
+        return {
+            "missing_in_dhis": missing_in_dhis,
+            "name_mismatches": name_mismatches,
+            "missing_in_mfl": sorted(
+                code for code in dhis_units if code not in mfl_codes)
+        }
+
+
+class DhisOrgUnit(models.Model):
+
+    """
+    A local mirror of a DHIS2 organisation unit.
+
+    The mirror is refreshed in bulk by the ``sync_dhis_org_units`` command
+    so that pushes to DHIS2 resolve uids from the database.
+    """
+    uid = models.CharField(
+        max_length=11, unique=True, help_text='The DHIS2 uid of the unit')
+    code = models.CharField(
+        max_length=100, null=True, blank=True, db_index=True,
+        help_text='The DHIS2 code e.g the MFL code for facilities')
+    name = models.CharField(max_length=255)
+    level = models.PositiveSmallIntegerField(
+        help_text='The level of the unit in the DHIS2 hierarchy')
+    parent_uid = models.CharField(max_length=11, null=True, blank=True)
+    last_updated = models.DateTimeField(
+        null=True, blank=True,
+        help_text='When the unit was last updated in DHIS2')
+    synced = models.DateTimeField(default=timezone.now)
+
+    objects = DhisOrgUnitManager()
+
+    def __str__(self):
+        return "{}: {}".format(self.uid, self.name)
+
+    class Meta(object):
+        indexes = [
+            models.Index(
+                fields=['level', 'code'], name='dhis_org_unit_level_code_idx')
+        ]
+
+
+_DHIS_METADATA_MAPPINGS = {}
+
+
+class DhisMetadataMapping(models.Model):
+
+    """
+    Maps KMHFL metadata e.g facility types, owners and KEPH levels to the
+    DHIS2 organisation unit groups they belong to.
+
+    The mappings rarely change so they are cached in process and the cache
+    is cleared whenever a mapping is saved or deleted.
+    """
+    mapping_type = models.CharField(
+        max_length=50, choices=DHIS_METADATA_MAPPING_TYPES)
+    kmhfl_id = models.UUIDField(
+        help_text='The id of the facility type, owner or KEPH level')
+    dhis_uid = models.CharField(
+        max_length=11,
+        help_text='The uid of the DHIS2 organisation unit group')
+
+    @classmethod
+    def get_mappings(cls):
+        """Returns {mapping_type: {kmhfl_id: dhis_uid}}"""
+        if not _DHIS_METADATA_MAPPINGS:
+            mappings = {
+                mapping_type: {}
+                for mapping_type, _ in DHIS_METADATA_MAPPING_TYPES
+            }
+            for mapping_type, kmhfl_id, dhis_uid in cls.objects.values_list(
+                    'mapping_type', 'kmhfl_id', 'dhis_uid'):
+                mappings[mapping_type][str(kmhfl_id)] = dhis_uid
+            _DHIS_METADATA_MAPPINGS.update(mappings)
+        return _DHIS_METADATA_MAPPINGS
+
+    @classmethod
+    def clear_cache(cls):
+        _DHIS_METADATA_MAPPINGS.clear()
+
+    def save(self, *args, **kwargs):
+        super(DhisMetadataMapping, self).save(*args, **kwargs)
+        self.clear_cache()
+
+    def delete(self, *args, **kwargs):
+        super(DhisMetadataMapping, self).delete(*args, **kwargs)
+        self.clear_cache()
+
+    def __str__(self):
+        return "{}: {} -> {}".format(
+            self.mapping_type, self.kmhfl_id, self.dhis_uid)
+
+    class Meta(object):
+        unique_together = ('mapping_type', 'kmhfl_id')
+
 
 class FacilityKephManager(models.Manager):
 
@@ -1230,69 +1493,7 @@ class Facility(SequenceMixin, AbstractBase):
 
             dhis2_parent_id = self.dhis2_api_auth.get_parent_id(self.ward.code)
             dhis2_org_unit_id = self.dhis2_api_auth.get_org_unit_id(self.code)
-            kmhfl_dhis2_facility_type_mapping = {
-                "20b86171-0c16-47e1-9277-5e773d485c33": "YQK9pleIoeB",
-                "5eb392ac-d10a-40c9-b525-53dac866ef6c": "lTrpyOiOcM6",
-                "8949eeb0-40b1-43d4-a38d-5d4933dc209f": "lTrpyOiOcM6",
-                "ccc1600e-9a24-499f-889f-bd9f0bdc4b95": "YQK9pleIoeB",
-                "d8d741b1-21c5-45c8-86d0-a2094bf9bda6": "YQK9pleIoeB",
-                "85f2099b-a2f8-49f4-9798-0cb48c0875ff": "YQK9pleIoeB",
-                "869118aa-0e97-4f47-b6b7-1f295d109c8f": "YQK9pleIoeB",
-                "a8af148f-b1b6-4eed-9d86-07d4f3135229": "YQK9pleIoeB",
-                "74755372-99ba-4b70-bca8-a583f03990bc": "lTrpyOiOcM6",
-                "4714529e-21de-4d5c-89da-11e335831327": "lTrpyOiOcM6",
-                "52ccbc58-2a71-4a66-be40-3cd72e67f798": "CGDNIWGHRNr",
-                "831a23c1-9124-4ce1-a0cf-60b59ef0fba5": "YQK9pleIoeB",
-                "336bf913-b42e-476a-bf47-11d3f769922f": "YQK9pleIoeB",
-                "f222bab7-589c-4ba8-bd9a-fe6c96fcd085": "CGDNIWGHRNr",
-                "35376bf5-2e83-4f70-8c4d-a7b80f782eb1": "YQK9pleIoeB",
-                "479a9a16-219f-48f6-818d-b2c06ada2332": "rhKJPLo27x7",
-                "b9a51572-c931-4cc5-8e21-f17b22b0fd20": "CGDNIWGHRNr",
-                "1571711c-4b80-493b-8109-faab2e4f43f0": "YQK9pleIoeB",
-                "4d47a5dd-628a-4049-a240-3ab767415c49": "rhKJPLo27x7",
-                "0fa47f39-d58e-4a16-845c-82818719188d": "CGDNIWGHRNr",
-                "22c161ee-577f-41ef-bd4e-dd0a26327bbc": "YQK9pleIoeB",
-                "cd841f88-198a-4d8a-869c-3ab4a7091c11": "YQK9pleIoeB",
-                "188551b7-4f22-4fc4-b07b-f9c9aeeea872": "rhKJPLo27x7",
-                "e5923a48-6b22-42c4-a4e6-6c5a5e8e0b0e": "YQK9pleIoeB",
-                "55d65dd6-5351-4cf4-a6d9-e05ce6d343ab": "mVrepdLAqSD",
-                "87626d3d-fd19-49d9-98da-daca4afe85bf": "mVrepdLAqSD",
-                "79158397-0d87-4d0e-8694-ad680a907a79": "YQK9pleIoeB",
-                "031293d9-fd8a-4682-a91e-a4390d57b0cf": "YQK9pleIoeB",
-                "4369eec8-0416-4e16-b013-e635ce46a02f": "YQK9pleIoeB",
-            }
-            kmhfl_dhis2_ownership_mapping = {
-                "d45541f8-3b3d-475b-94f4-17741d468135": "aRxa6o8GqZN",
-                "afc4bcdb-fc22-4336-8958-d2df06fe90ad": "aRxa6o8GqZN",
-                "56937bed-ea04-4306-bdf9-86668eb570c7": "aRxa6o8GqZN",
-                "122f57a8-51ef-4a26-9024-4b34386485fd": "aRxa6o8GqZN",
-                "abda166b-5c02-44c8-8058-5e4112ef9f95": "eT1vvFVhLHc",
-                "cd04053e-a5eb-425b-b4d7-24746c311fa6": "eT1vvFVhLHc",
-                "a3477ae7-ee1e-410e-83b1-64bf8b723d95": "aRxa6o8GqZN",
-                "9bbcb2b4-f1d6-449b-a2cf-e92db2d861df": "aRxa6o8GqZN",
-                "5363e7ac-2728-4099-9f5b-da14e2ee83d0": "aRxa6o8GqZN",
-                "f918d78e-e09b-4e91-8a97-f6229a27346b": "aRxa6o8GqZN",
-                "4a1c60b2-85b3-41b5-aed7-8448b863d566": "aRxa6o8GqZN",
-                "ddebc398-fe10-44c2-b45a-1a35b357ae99": "AaAF5EmS1fk",
-                "15aa5a44-0833-4e8f-83e6-916e5e5ab213": "eT1vvFVhLHc",
-                "28d7a8e1-e15c-4326-ace1-b2c1b81af586": "None",
-                "4560545a-67c7-4b2b-87be-b0babee4cb83": "AaAF5EmS1fk",
-                "2c62704b-8072-470c-a7e6-259384f364f7": "eT1vvFVhLHc",
-                "cfe25392-4f85-49ea-b180-35388f47ea9e": "eT1vvFVhLHc",
-                "93c0fe24-3f12-4be2-b5ff-027e0bd02274": "AaAF5EmS1fk",
-                "c3bab995-0c29-433c-b39c-6b86d6084f5f": "AaAF5EmS1fk",
-                "6cb92834-107c-404a-91fa-cf60b1eb5333": "aRxa6o8GqZN",
-                "2e651780-2ed4-4f8c-9061-6e5acf95d581": "AaAF5EmS1fk",
-                "30af7e3f-cd52-4ca0-b5dc-d8b1040a9808": "AaAF5EmS1fk",
-                "d64bbd8a-4013-463b-a238-c346cee66a92": "AaAF5EmS1fk",
-            }
-            kmhfl_dhis2_keph_mapping = {
-                "ed23da85-4c92-45af-80fa-9b2123769f49": "FpY8vg4gh46",
-                "7824068f-6533-4532-9775-f8ef200babd1": "d5QX71PY5t0",
-                "c0bb24c2-1a96-47ce-b327-f855121f354f": "hBZ5DRto7iF",
-                "174f7d48-3b57-4997-a743-888d97c5ec31": "wwiu1jyZOXO",
-                "ceab4366-4538-4bcf-b7a7-a7e2ce3b50d5": "tvMxZ8aCVou"
-            }
+            mappings = DhisMetadataMapping.get_mappings()
             if code:
                 facility_code = str(code)
             else:
@@ -1312,9 +1513,9 @@ class Facility(SequenceMixin, AbstractBase):
                                                 .get(facility_id=self.id)['coordinates'])).group(1))
             }
             metadata_payload = {
-                "facility_type": kmhfl_dhis2_facility_type_mapping[str(self.facility_type_id)],
-                "keph": kmhfl_dhis2_keph_mapping[str(self.keph_level_id)],
-                "ownership": kmhfl_dhis2_ownership_mapping[str(self.owner_id)]
+                "facility_type": mappings['FACILITY_TYPE'][str(self.facility_type_id)],
+                "keph": mappings['KEPH'][str(self.keph_level_id)],
+                "ownership": mappings['OWNERSHIP'][str(self.owner_id)]
             }
             new_facility = True
             if dhis2_org_unit_id[1] == 'retrieved':
@@ -1416,16 +1617,18 @@ class Facility(SequenceMixin, AbstractBase):
 
     @property
     def boundaries(self):
-        from mfl_gis.models import (
-            CountyBoundary, ConstituencyBoundary, WardBoundary)
-
-        return {
-            "county_boundary": str(CountyBoundary.objects.get(
-                area=self.ward.constituency.county).id),
-            "constituency_boundary": str(ConstituencyBoundary.objects.get(
-                area=self.ward.constituency).id),
-            "ward_boundary": str(WardBoundary.objects.get(area=self.ward).id)
-        }
+        # the reverse accessors use the boundaries selected by list views
+        ward = self.ward
+        boundaries = (
+            ("county_boundary", ward.constituency.county.countyboundary),
+            ("constituency_boundary", ward.constituency.constituencyboundary),
+            ("ward_boundary", ward.wardboundary),
+        )
+        for _, boundary in boundaries:
+            if boundary.deleted:
+                raise boundary.DoesNotExist(
+                    '{} has been deleted'.format(boundary))
+        return {key: str(boundary.id) for key, boundary in boundaries}
 
     @property
     def latest_update(self):
@@ -1775,16 +1978,21 @@ class Facility(SequenceMixin, AbstractBase):
         updates on the material views.
         This function ensures that once a facility is saved, the
         search index is updated with the  respective record in the
-        material view is updated
+        material view is updated.
+        The record is indexed once the transaction that saves the facility
+        commits.
         """
 
-        mat_view_facility_record = FacilityExportExcelMaterialView.objects.get(
-            id=self.id)
-        index_instance(
-            "facilities",
-            "FacilityExportExcelMaterialView",
-            str(mat_view_facility_record.id)
-        )
+        def index_material_view_record(facility_id=self.id):
+            mat_view_facility_record = \
+                FacilityExportExcelMaterialView.objects.get(id=facility_id)
+            index_instance(
+                "facilities",
+                "FacilityExportExcelMaterialView",
+                str(mat_view_facility_record.id)
+            )
+
+        transaction.on_commit(index_material_view_record)
 
     def save(self, *args, **kwargs):  # NOQA
         """
@@ -1838,17 +2046,6 @@ class Facility(SequenceMixin, AbstractBase):
             self.index_facility_material_view()
             return
 
-        old_details_serialized = FacilityDetailSerializer(
-            old_details).data
-        del old_details_serialized['updated']
-        del old_details_serialized['created']
-        del old_details_serialized['updated_by']
-        new_details_serialized = FacilityDetailSerializer(self).data
-        # del new_details_serialized['updated']
-        del new_details_serialized['created']
-        del new_details_serialized['updated_by']
-
-        origi_model = self.__class__.objects.get(id=self.id)
         allow_save = kwargs.pop('allow_save', None)
 
         if allow_save:
@@ -1856,7 +2053,17 @@ class Facility(SequenceMixin, AbstractBase):
             self.index_facility_material_view()
             # self.update_facility_regulation_status()
         else:
-            updates = self._dump_updates(origi_model)
+            old_details_serialized = FacilityDetailSerializer(
+                old_details).data
+            del old_details_serialized['updated']
+            del old_details_serialized['created']
+            del old_details_serialized['updated_by']
+            new_details_serialized = FacilityDetailSerializer(self).data
+            # del new_details_serialized['updated']
+            del new_details_serialized['created']
+            del new_details_serialized['updated_by']
+
+            updates = self._dump_updates(old_details)
             try:
                 updates.pop('updated_by')
             except:
@@ -1920,6 +2127,8 @@ class Facility(SequenceMixin, AbstractBase):
 
     class Meta(AbstractBase.Meta):
         verbose_name_plural = 'facilities'
+        indexes = postgres_search_indexes(
+            'facility', ['name', 'official_name'])
         permissions = (
             ("view_classified_facilities", "Can see classified facilities"),
             ("view_closed_facilities", "Can see closed facilities"),
@@ -1958,53 +2167,48 @@ class FacilityUpdates(AbstractBase):
         help_text='Approval of the facility at the national level')
     dhis2_api_auth = DhisAuth()
 
-    def facility_updated_json(self):
-        updates = {}
-        if self.facility_updates:
-            updates['basic'] = json.loads(self.facility_updates)
-        if self.services:
-            updates['services'] = json.loads(self.services)
-        if self.humanresources:
-            updates['humanresources'] = json.loads(self.humanresources)
-        if self.infrastructure:
-            updates['infrastructure'] = json.loads(self.infrastructure)
-        if self.contacts:
-            updates['contacts'] = json.loads(self.contacts)
-        if self.units:
-            updates['units'] = json.loads(self.units)
-        if self.officer_in_charge:
-            updates['officer_in_charge'] = json.loads(self.officer_in_charge)
-        if self.geo_codes:
-            updates['geo_codes'] = json.loads(self.geo_codes)
+    # the buffered JSON fields and their keys in the parsed updates
+    BUFFERED_FIELDS = (
+        ('facility_updates', 'basic'),
+        ('services', 'services'),
+        ('humanresources', 'humanresources'),
+        ('infrastructure', 'infrastructure'),
+        ('contacts', 'contacts'),
+        ('units', 'units'),
+        ('officer_in_charge', 'officer_in_charge'),
+        ('geo_codes', 'geo_codes'),
+    )
 
-        try:
-            upgrade = FacilityUpgrade.objects.get(
-                facility=self.facility, is_cancelled=False, is_confirmed=False)
+    def parsed_updates(self):
+        """
+        The buffered updates, each JSON field is parsed once for as long as
+        it does not change.
+        """
+        cache = self.__dict__.setdefault('_parsed_updates', {})
+        updates = {}
+        for field, key in self.BUFFERED_FIELDS:
+            raw = getattr(self, field)
+            if not raw:
+                continue
+            if field not in cache or cache[field][0] != raw:
+                cache[field] = (raw, json.loads(raw))
+            updates[key] = cache[field][1]
+        return updates
 
+    def facility_updated_json(self):
+        updates = dict(self.parsed_updates())
+        upgrade = FacilityUpgrade.objects.filter(
+            facility=self.facility, is_cancelled=False, is_confirmed=False
+        ).select_related('keph_level', 'facility_type', 'reason').first()
+        if upgrade is not None:
             updates['upgrades'] = {
                 "keph": upgrade.keph_level.name,
                 "facility_type": upgrade.facility_type.name,
                 "reason": upgrade.reason.reason
             }
-        except FacilityUpgrade.DoesNotExist:
-            pass
 
         return updates
 
-    def approve_upgrades(self):
-        try:
-            upgrade = FacilityUpgrade.objects.get(
-                facility=self.facility, is_cancelled=False, is_confirmed=False)
-
-            upgrade.is_confirmed = True
-            upgrade.save()
-            self.facility.keph_level = upgrade.keph_level if \
-                upgrade.keph_level else self.facility.keph_level
-            self.facility.facility_type = upgrade.facility_type
-            self.facility.save(allow_save=True)
-        except FacilityUpgrade.DoesNotExist:
-            pass
-
     def reject_upgrades(self):
         try:
             upgrade = FacilityUpgrade.objects.get(
@@ -2016,6 +2220,9 @@ class FacilityUpdates(AbstractBase):
             pass
 
     def update_facility_has_edits(self):
+        if self.approved and not self.cancelled:
+            # the approval saves the facility, see facilities.approvals
+            return
         if not self.approved and not self.cancelled:
             self.facility.has_edits = True
         else:
@@ -2030,131 +2237,6 @@ class FacilityUpdates(AbstractBase):
         #         setattr(self.facility, field_name, old_value)
         self.facility.save(allow_save=True)
 
-    def update_facility(self):
-        if self.facility_updates:
-            data = json.loads(self.facility_updates)
-            for field_changed in data:
-                field_name = field_changed.get("field_name")
-                if field_name == 'date_established':
-                    value = parser.parse(field_changed.get("actual_value"))
-                    new_date = datetime.date(year=value.year, month=value.month, day=value.day)
-                    value = new_date
-                elif field_name == 'sub_county_id':
-                    value = SubCounty.objects.get(id=field_changed.get('actual_value')).id
-                else:
-                    value = field_changed.get("actual_value")
-
-                setattr(self.facility, field_name, value)
-            self.facility.save(allow_save=True)
-            # if self.facility.code and self.facility.is_complete and self.facility.approved_national_level:
-            #     self.facility.push_new_facility(self.facility.code)
-            self.push_facility_updates()
-
-
-    def update_facility_services(self):
-        from facilities.utils import create_facility_services
-        services_to_add = json.loads(self.services)
-        validated_data = {}
-        validated_data['created'] = self.updated
-        validated_data['updated'] = self.updated
-        validated_data['created_by'] = self.created_by.id
-        validated_data['updated_by'] = self.updated_by.id
-
-        for service in services_to_add:
-
-            try:
-                FacilityService.objects.get(
-                    service_id=service.get('service'), facility=self.facility)
-            except FacilityService.DoesNotExist:
-                create_facility_services(
-                    self.facility, service, validated_data)
-
-    def update_facility_humanresources(self):
-        from facilities.utils import create_facility_humanresources
-        humanresources_to_add = json.loads(self.humanresources)
-        validated_data = {}
-        validated_data['created'] = self.updated
-        validated_data['updated'] = self.updated
-        validated_data['created_by'] = self.created_by.id
-        validated_data['updated_by'] = self.updated_by.id
-        for hr in humanresources_to_add:
-            try:
-                FacilitySpecialist.objects.get(
-                    speciality_id=hr.get('speciality'), facility=self.facility)
-            except FacilitySpecialist.DoesNotExist:
-                create_facility_humanresources(
-                    self.facility, hr, validated_data)
-
-    def update_facility_infrastructure(self):
-        from facilities.utils import create_facility_infrastructure
-        infrastructure_to_add = json.loads(self.infrastructure)
-        validated_data = {}
-        validated_data['created'] = self.updated
-        validated_data['updated'] = self.updated
-        validated_data['created_by'] = self.created_by.id
-        validated_data['updated_by'] = self.updated_by.id
-        for infra in infrastructure_to_add:
-            try:
-                FacilityInfrastructure.objects.get(
-                    infrastructure_id=infra.get('infrastructure'), facility=self.facility)
-            except FacilityInfrastructure.DoesNotExist:
-                create_facility_infrastructure(
-                    self.facility, infra, validated_data)
-
-    def update_facility_contacts(self):
-        from facilities.utils import create_facility_contacts
-        contacts_to_add = json.loads(self.contacts)
-        validated_data = {}
-        validated_data['created'] = self.updated
-        validated_data['updated'] = self.updated
-        validated_data['created_by'] = self.created_by.id
-        validated_data['updated_by'] = self.updated_by.id
-
-        for contact in contacts_to_add:
-            create_facility_contacts(self.facility, contact, validated_data)
-
-    def update_facility_units(self):
-        from facilities.utils import create_facility_units
-        units_to_add = json.loads(self.units)
-        validated_data = {}
-        validated_data['created'] = self.updated
-        validated_data['updated'] = self.updated
-        validated_data['created_by'] = self.created_by.id
-        validated_data['updated_by'] = self.updated_by.id
-        for unit in units_to_add:
-            create_facility_units(self.facility, unit, validated_data)
-
-    def update_officer_in_charge(self):
-        from facilities.utils import _create_officer
-        officer_data = json.loads(self.officer_in_charge)
-        user = self.created_by
-        _create_officer(officer_data, user)
-
-    def update_geo_codes(self):
-        from mfl_gis.models import FacilityCoordinates
-        if self.geo_codes and json.loads(self.geo_codes):
-            data = {
-                "facility_id": str(self.facility.id),
-                "method_id": json.loads(self.geo_codes).get('method_id', None),
-                "source_id": json.loads(self.geo_codes).get('source_id', None),
-                "coordinates": json.loads(
-                    self.geo_codes).get('coordinates', None),
-                "created_by_id": self.created_by.id,
-                "updated_by_id": self.updated_by.id,
-                "created": self.updated
-            }
-
-            data['coordinates'] = Point(
-                data['coordinates'].get('coordinates'))
-            try:
-                self.facility.facility_coordinates_through.id
-                coords = self.facility.facility_coordinates_through
-                for key, value in data.iteritems():
-                    setattr(coords, key, value) if value else None
-                coords.save()
-            except:
-                FacilityCoordinates.objects.create(**data)
-
     def validate_either_of_approve_or_cancel(self):
         error = "You can only approve or cancel and not both"
         if self.approved and self.cancelled:
@@ -2209,19 +2291,15 @@ class FacilityUpdates(AbstractBase):
         super(FacilityUpdates, self).clean()
 
     def save(self, *args, **kwargs):
+        from facilities.approvals import FacilityUpdateApproval
         if self.approved and not self.cancelled:
-            self.update_facility()
-            self.update_facility_units() if self.units else None
-            self.update_facility_contacts() if self.contacts else None
-            self.update_facility_services() if self.services else None
-            self.update_facility_humanresources() if self.humanresources else None
-            self.update_facility_infrastructure() if self.infrastructure else None
-            self.update_officer_in_charge() if self.officer_in_charge else None
-            self.update_geo_codes() if self.update_geo_codes else None
-            self.approve_upgrades()
-            self.facility.has_edits = False
-            self.facility.updated = timezone.now()
-            self.facility.save(allow_save=True)
+            already_approved = self.pk and self.__class__.objects.filter(
+                pk=self.pk, approved=True).exists()
+            if not already_approved:
+                with transaction.atomic():
+                    FacilityUpdateApproval(self).apply()
+                    super(FacilityUpdates, self).save(*args, **kwargs)
+                return
         if self.cancelled:
             self.reject_upgrades()
 
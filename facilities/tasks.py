@@ -0,0 +1,48 @@
+import logging
+
+from celery import shared_task
+from celery.schedules import crontab
+from celery.task import periodic_task
+
+from .models import DhisAuth, DhisOrgUnit, FacilityUpdates
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+@periodic_task(
+    run_every=(crontab(hour=1, minute=0)),
+    name="reconcile_dhis_org_units",
+    ignore_result=True)
+def reconcile_dhis_org_units():
+    """
+    Refresh the DHIS2 organisation units mirror and diff the MFL against it.
+
+    Runs nightly so that pushes to DHIS2 resolve uids from the database.
+    """
+    synced = DhisAuth().sync_org_units()
+    diff = DhisOrgUnit.objects.reconcile_facilities()
+    LOGGER.info(
+        "Synced {} DHIS2 organisation units. {} facilities missing in DHIS2, "
+        "{} name mismatches and {} units missing in the MFL".format(
+            synced, len(diff['missing_in_dhis']),
+            len(diff['name_mismatches']), len(diff['missing_in_mfl'])))
+    return diff
+
+
+@shared_task(name='push_facility_updates_to_dhis2')
+def push_facility_updates_to_dhis2(facility_update_id):
+    """
+    Push the details of a facility to DHIS2 after its update is approved.
+
+    Queued once the approval commits so that the DHIS2 round trips happen
+    outside the approval transaction.
+    """
+    facility_update = FacilityUpdates.objects.select_related(
+        'facility__ward').get(id=facility_update_id)
+    try:
+        facility_update.push_facility_updates()
+    except Exception:
+        LOGGER.exception(
+            "Unable to push the update {} to DHIS2".format(facility_update_id))
+        raise
@@ -0,0 +1,166 @@
+from mock import patch, MagicMock
+
+from django.test import TestCase
+from model_mommy import mommy
+
+from ..models import (
+    DhisAuth,
+    DhisOrgUnit,
+    DhisMetadataMapping,
+    Facility,
+    generate_dhis_uid
+)
+
+
+def _org_unit(uid, code, name, level, parent=None):
+    return {
+        "id": uid,
+        "code": code,
+        "name": name,
+        "level": level,
+        "parent": {"id": parent} if parent else None,
+        "lastUpdated": "2016-01-01T10:00:00.000"
+    }
+
+
+def _page(org_units, page, page_count):
+    response = MagicMock()
+    response.json.return_value = {
+        "pager": {"page": page, "pageCount": page_count},
+        "organisationUnits": org_units
+    }
+    return response
+
+
+class TestDhisOrgUnitSync(TestCase):
+
+    @patch('facilities.models.facility_models.requests.Session')
+    def test_sync_fetches_all_pages(self, session_mock):
+        session_mock.return_value.get.side_effect = [
+            _page([_org_unit("WardUid0001", "KE_Ward_1", "Ward 1", 4)], 1, 2),
+            _page([
+                _org_unit("FacUid00001", "10001", "Facility 1", 5,
+                          "WardUid0001")
+            ], 2, 2),
+        ]
+        synced = DhisAuth().sync_org_units(page_size=1)
+
+        self.assertEqual(2, synced)
+        self.assertEqual(2, session_mock.return_value.get.call_count)
+        facility_unit = DhisOrgUnit.objects.get(uid="FacUid00001")
+        self.assertEqual("WardUid0001", facility_unit.parent_uid)
+        self.assertEqual(5, facility_unit.level)
+
+    def test_sync_updates_and_removes_units(self):
+        DhisOrgUnit.objects.sync([
+            _org_unit("FacUid00001", "10001", "Facility 1", 5),
+            _org_unit("FacUid00002", "10002", "Facility 2", 5)
+        ])
+        DhisOrgUnit.objects.sync([
+            _org_unit("FacUid00001", "10001", "Renamed Facility", 5)
+        ])
+        self.assertEqual(1, DhisOrgUnit.objects.count())
+        self.assertEqual(
+            "Renamed Facility", DhisOrgUnit.objects.get().name)
+
+
+class TestDhisOrgUnitResolution(TestCase):
+
+    def setUp(self):
+        DhisOrgUnit.objects.sync([
+            _org_unit("WardUid0001", "KE_Ward_1", "Ward 1", 4),
+            _org_unit("FacUid00001", "10001", "Facility 1", 5, "WardUid0001")
+        ])
+
+    @patch('facilities.models.facility_models.requests.get')
+    def test_resolve_without_round_trips(self, get_mock):
+        dhis_auth = DhisAuth()
+        self.assertEqual(
+            ["FacUid00001", "retrieved"], dhis_auth.get_org_unit_id(10001))
+        self.assertEqual("WardUid0001", dhis_auth.get_parent_id(1))
+        self.assertFalse(get_mock.called)
+
+    @patch('facilities.models.facility_models.requests.get')
+    def test_code_missing_from_the_mirror_is_looked_up(self, get_mock):
+        get_mock.return_value.json.return_value = {
+            "organisationUnits": [
+                {"id": "FacUid00002", "name": "Facility 2", "level": 5}
+            ]
+        }
+        dhis_auth = DhisAuth()
+        self.assertEqual(
+            ["FacUid00002", "retrieved"], dhis_auth.get_org_unit_id(10002))
+        self.assertEqual(1, get_mock.call_count)
+        self.assertEqual(
+            "FacUid00002", DhisOrgUnit.objects.resolve_code("10002"))
+
+        # found in the mirror from now on
+        dhis_auth.get_org_unit_id(10002)
+        self.assertEqual(1, get_mock.call_count)
+
+    @patch('facilities.models.facility_models.requests.get')
+    def test_unknown_code_gets_local_uid(self, get_mock):
+        get_mock.return_value.json.return_value = {"organisationUnits": []}
+        uid, status = DhisAuth().get_org_unit_id(99999)
+        self.assertEqual("generated", status)
+        self.assertEqual(11, len(uid))
+        self.assertEqual(1, get_mock.call_count)
+
+    def test_resolve_query_prefers_the_code(self):
+        DhisOrgUnit.objects.record("WardUid0002", "KE_Ward_2", "Ward 10", 4)
+        DhisOrgUnit.objects.record("WardUid0003", "Ward 1", "Ward 100", 4)
+        self.assertEqual(
+            "WardUid0003", DhisOrgUnit.objects.resolve_query("Ward 1", 4))
+        self.assertEqual(
+            "WardUid0001", DhisOrgUnit.objects.resolve_query("Ward", 4))
+
+    def test_generate_dhis_uid(self):
+        uid = generate_dhis_uid()
+        self.assertEqual(11, len(uid))
+        self.assertTrue(uid[0].isalpha())
+        self.assertTrue(uid.isalnum())
+
+    def test_reconcile_facilities(self):
+        mommy.make(
+            Facility, code=10001, name="Facility 1", reporting_in_dhis=True,
+            approved_national_level=True)
+        mommy.make(
+            Facility, code=10002, name="Facility 2", reporting_in_dhis=True,
+            approved_national_level=True)
+        DhisOrgUnit.objects.record(
+            "FacUid00003", "10003", "Facility 3", 5)
+
+        diff = DhisOrgUnit.objects.reconcile_facilities()
+        self.assertEqual(["10002"], diff["missing_in_dhis"])
+        self.assertEqual([], diff["name_mismatches"])
+        self.assertEqual(["10003"], diff["missing_in_mfl"])
+
+
+class TestDhisMetadataMapping(TestCase):
+
+    def tearDown(self):
+        # the mappings are cached in process, not in the test's transaction
+        DhisMetadataMapping.clear_cache()
+        super(TestDhisMetadataMapping, self).tearDown()
+
+    def test_mappings_are_seeded_and_cached(self):
+        DhisMetadataMapping.clear_cache()
+        mappings = DhisMetadataMapping.get_mappings()
+        self.assertEqual(
+            "FpY8vg4gh46",
+            mappings['KEPH']["ed23da85-4c92-45af-80fa-9b2123769f49"])
+
+        with self.assertNumQueries(0):
+            DhisMetadataMapping.get_mappings()
+
+    def test_cache_cleared_on_save(self):
+        DhisMetadataMapping.get_mappings()
+        mapping = DhisMetadataMapping.objects.get(
+            mapping_type='KEPH',
+            kmhfl_id="ed23da85-4c92-45af-80fa-9b2123769f49")
+        mapping.dhis_uid = "NewUid00001"
+        mapping.save()
+        self.assertEqual(
+            "NewUid00001",
+            DhisMetadataMapping.get_mappings()['KEPH'][
+                "ed23da85-4c92-45af-80fa-9b2123769f49"])
@@ -1,5 +1,11 @@
+import json
+
+from mock import patch
+
 from django.core.urlresolvers import reverse
+from django.db import connection
 from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.core.cache import cache
 from rest_framework.test import APITestCase
 
@@ -753,3 +759,100 @@ class TestFacilityUpgradeConfirmationAndRejection(LoginMixin, APITestCase):
         self.assertNotEquals(upgrade.keph_level, facility_refetched.keph_level)
         self.assertNotEquals(
             upgrade.facility_type, facility_refetched.facility_type)
+
+
+class TestFacilityUpdateApproval(LoginMixin, APITestCase):
+
+    def setUp(self):
+        super(TestFacilityUpdateApproval, self).setUp()
+        self.facility = mommy.make(Facility)
+        mommy.make(FacilityApproval, facility=self.facility)
+        self.contact_type = mommy.make(ContactType)
+
+    def _pending_update(self, count):
+        services = [
+            {"service": str(mommy.make(Service).id)} for _ in range(count)]
+        contacts = [
+            {
+                "contact_type": str(self.contact_type.id),
+                "contact": "07{}".format(i)
+            }
+            for i in range(count)
+        ]
+        units = [
+            {"unit": str(mommy.make(FacilityDepartment).id)}
+            for _ in range(count)
+        ]
+        return mommy.make(
+            FacilityUpdates, facility=self.facility,
+            facility_updates=json.dumps([{
+                "field_name": "name", "actual_value": "Kilifi Annex"}]),
+            services=json.dumps(services), contacts=json.dumps(contacts),
+            units=json.dumps(units))
+
+    def _approve(self, update):
+        update.approved = True
+        with CaptureQueriesContext(connection) as queries:
+            update.save()
+        return len(queries.captured_queries)
+
+    def test_approval_applies_the_updates(self):
+        update = self._pending_update(3)
+        self._approve(update)
+
+        facility = Facility.objects.get(id=self.facility.id)
+        self.assertEquals('Kilifi Annex', facility.name)
+        self.assertFalse(facility.has_edits)
+        self.assertEquals(
+            3, FacilityService.objects.filter(facility=facility).count())
+        self.assertEquals(
+            3, FacilityContact.objects.filter(facility=facility).count())
+        self.assertEquals(
+            3, FacilityUnit.objects.filter(facility=facility).count())
+
+    def test_approval_takes_a_bounded_number_of_queries(self):
+        few = self._approve(self._pending_update(1))
+        self.facility = mommy.make(Facility)
+        mommy.make(FacilityApproval, facility=self.facility)
+        many = self._approve(self._pending_update(10))
+        self.assertEquals(few, many)
+
+    def test_existing_rows_are_not_duplicated(self):
+        update = self._pending_update(2)
+        services = json.loads(update.services)
+        mommy.make(
+            FacilityService, facility=self.facility,
+            service_id=services[0]['service'])
+        Contact.objects.create(
+            contact="070", contact_type=self.contact_type)
+        self._approve(update)
+
+        self.assertEquals(
+            2, FacilityService.objects.filter(facility=self.facility).count())
+        self.assertEquals(1, Contact.objects.filter(contact="070").count())
+
+    def test_facility_is_saved_once(self):
+        update = self._pending_update(2)
+        with patch.object(
+                Facility, 'index_facility_material_view') as index:
+            self._approve(update)
+        self.assertEquals(1, index.call_count)
+
+    def test_side_effects_run_on_commit(self):
+        update = self._pending_update(1)
+        with self.settings(PUSH_TO_DHIS=True), patch(
+                'facilities.approvals.push_facility_updates_to_dhis2'
+        ) as push, patch('facilities.models.facility_models.index_instance'):
+            with self.captureOnCommitCallbacks(execute=True):
+                self._approve(update)
+                push.delay.assert_not_called()
+        push.delay.assert_called_once_with(str(update.id))
+
+    def test_saving_an_approved_update_does_not_apply_it_again(self):
+        update = self._pending_update(1)
+        self._approve(update)
+        FacilityService.objects.filter(facility=self.facility).delete()
+
+        update.save()
+        self.assertEquals(
+            0, FacilityService.objects.filter(facility=self.facility).count())
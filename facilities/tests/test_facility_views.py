@@ -1,13 +1,19 @@
 import json
+import os
+import shutil
+import tempfile
 from datetime import timedelta
 
 from django.core.urlresolvers import reverse
 from django.contrib.auth import get_user_model
+from django.test import override_settings
 from django.utils import timezone
+from mock import patch
 
 from rest_framework.test import APITestCase
 from model_mommy import mommy
 
+from common.tasks import refresh_material_views
 from common.tests.test_views import (
     LoginMixin,
     default
@@ -847,6 +853,91 @@ class TestInspectionAndCoverReportsView(LoginMixin, APITestCase):
         self.assertTemplateUsed(response, 'facility_details.html')
 
 
+class TestCachedFacilityReports(LoginMixin, APITestCase):
+
+    def setUp(self):
+        super(TestCachedFacilityReports, self).setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.reports_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(
+            MEDIA_ROOT=self.media_root, PDF_REPORTS_ROOT=self.reports_root)
+        self.settings_override.enable()
+        self.facility = mommy.make(Facility, ward=mommy.make(Ward))
+        self.url = reverse(
+            'api:facilities:facility_cover_report',
+            kwargs={'pk': self.facility.id})
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+        shutil.rmtree(self.reports_root, ignore_errors=True)
+        super(TestCachedFacilityReports, self).tearDown()
+
+    @patch('common.views.shared_views.render_pdf', return_value=b'%PDF-1.4')
+    def test_report_rendered_once_until_facility_changes(self, render_mock):
+        for _ in range(2):
+            response = self.client.get(self.url)
+            self.assertEqual(200, response.status_code)
+            self.assertEqual(b'%PDF-1.4', b''.join(response.streaming_content))
+        self.assertEqual(1, render_mock.call_count)
+        # the reports are not web served from MEDIA_ROOT
+        self.assertEqual([], os.listdir(self.media_root))
+        self.assertNotEqual([], os.listdir(self.reports_root))
+
+        Facility.objects.filter(id=self.facility.id).update(
+            updated=timezone.now() + timedelta(minutes=1))
+        self.assertEqual(200, self.client.get(self.url).status_code)
+        self.assertEqual(2, render_mock.call_count)
+
+    @patch('common.tasks.render_pdf_report.delay')
+    def test_async_report_returns_job(self, delay_mock):
+        from common.models import PDFJob
+        from common.tasks import render_pdf_report
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.get(self.url + '?async=true')
+        self.assertEqual(202, response.status_code)
+        self.assertEqual('PENDING', response.data['status'])
+        self.assertIsNone(response.data['download_url'])
+        delay_mock.assert_called_once_with(str(response.data['id']))
+
+        with patch(
+                'common.utilities.pdf_reports.render_pdf',
+                return_value=b'%PDF-1.4'):
+            self.assertEqual('DONE', render_pdf_report(response.data['id']))
+        job = PDFJob.objects.get(id=response.data['id'])
+        self.assertTrue(job.file_path.endswith('-coordinates.pdf'))
+
+        job_url = reverse(
+            'api:common:pdf_job_detail', kwargs={'pk': str(job.id)})
+        job_response = self.client.get(job_url)
+        self.assertEqual('DONE', job_response.data['status'])
+        download = self.client.get(job_response.data['download_url'])
+        self.assertEqual(200, download.status_code)
+
+        # the rendered report is now served without queueing a job
+        self.assertEqual(200, self.client.get(self.url + '?async=true')
+                         .status_code)
+        self.assertEqual(1, PDFJob.objects.count())
+
+    @patch('common.tasks.render_pdf_report.delay')
+    def test_pending_jobs_are_not_shared_between_users(self, delay_mock):
+        first = self.client.get(self.url + '?async=true').data['id']
+        self.assertEqual(
+            first, self.client.get(self.url + '?async=true').data['id'])
+
+        other_user = mommy.make(get_user_model(), is_active=True)
+        self.client.force_authenticate(other_user)
+        second = self.client.get(self.url + '?async=true').data['id']
+        self.assertNotEqual(first, second)
+
+        # each user can poll the job they were given
+        job_url = reverse('api:common:pdf_job_detail', kwargs={'pk': second})
+        self.assertEqual(200, self.client.get(job_url).status_code)
+        job_url = reverse('api:common:pdf_job_detail', kwargs={'pk': first})
+        self.assertEqual(404, self.client.get(job_url).status_code)
+
+
 class TestDashBoardView(LoginMixin, APITestCase):
 
     def setUp(self):
@@ -1608,6 +1699,52 @@ class TestFacilityConsituencyUserFilter(TestGroupAndPermissions, APITestCase):
             id=response.data['results'][0].get("id")))
 
 
+class TestFacilityMaterialViewAreaUsers(TestGroupAndPermissions,
+                                        APITestCase):
+
+    def setUp(self):
+        super(TestFacilityMaterialViewAreaUsers, self).setUp()
+        self.county = mommy.make(County)
+        self.constituency = mommy.make(Constituency, county=self.county)
+        self.sub_county = mommy.make(SubCounty, county=self.county)
+        ward = mommy.make(
+            Ward, constituency=self.constituency, sub_county=self.sub_county)
+        self.facility = mommy.make(Facility, ward=ward)
+        mommy.make(Facility)
+        refresh_material_views()
+        self.url = reverse("api:facilities:material")
+
+    def _codes(self, user):
+        user.groups.add(self.admin_group)
+        self.client.force_authenticate(user)
+        response = self.client.get(self.url)
+        self.assertEquals(200, response.status_code)
+        return [result['code'] for result in response.data['results']]
+
+    def test_county_user(self):
+        user = mommy.make(get_user_model())
+        mommy.make(UserCounty, user=user, county=self.county)
+        self.assertEquals([self.facility.code], self._codes(user))
+
+    def test_constituency_user(self):
+        user = mommy.make(get_user_model())
+        mommy.make(UserConstituency, user=user, constituency=self.constituency)
+        self.assertEquals([self.facility.code], self._codes(user))
+
+    def test_sub_county_user(self):
+        user = mommy.make(get_user_model())
+        mommy.make(UserSubCounty, user=user, sub_county=self.sub_county)
+        self.assertEquals([self.facility.code], self._codes(user))
+
+    def test_search_by_code(self):
+        Facility.objects.filter(id=self.facility.id).update(code=17780)
+        refresh_material_views()
+        user = mommy.make(get_user_model())
+        mommy.make(UserCounty, user=user, county=self.county)
+        self.url += '?search=17780'
+        self.assertEquals([17780], self._codes(user))
+
+
 class TestFilterRejectedFacilities(LoginMixin, APITestCase):
     def test_filter_rejected_facilities(self):
         facility = mommy.make(Facility)
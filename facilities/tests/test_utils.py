@@ -0,0 +1,154 @@
+import logging
+import time
+import uuid
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from model_mommy import mommy
+
+from common.models import ContactType
+
+from ..models import (
+    FacilityDepartment,
+    Infrastructure,
+    Option,
+    Service,
+    Speciality
+)
+from ..utils import (
+    PayloadRows,
+    _validate_contacts,
+    _validate_humanresources,
+    _validate_infrastructure,
+    _validate_services,
+    _validate_units
+)
+from ..views import FacilityDetailView
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+class TestPayloadValidation(TestCase):
+
+    def test_services(self):
+        service = mommy.make(Service)
+        missing = str(uuid.uuid4())
+        self.assertEquals([], _validate_services([{"service": service.id}]))
+        self.assertEquals(
+            ["service with id {} not found".format(missing)],
+            _validate_services(
+                [{"service": str(service.id)}, {"service": missing}]))
+        self.assertEquals(
+            ["Service has a badly formed uuid"],
+            _validate_services([{"service": "1"}, {"service": "2"}]))
+
+    def test_infrastructure(self):
+        infra = mommy.make(Infrastructure)
+        missing = str(uuid.uuid4())
+        self.assertEquals(
+            ["infrastructure with id {} not found".format(missing)],
+            _validate_infrastructure([
+                {"infrastructure": str(infra.id)},
+                {"infrastructure": missing}]))
+        self.assertEquals(
+            ["Infrastructure has a badly formed uuid"],
+            _validate_infrastructure([{"infrastructure": None}]))
+
+    def test_humanresources(self):
+        speciality = mommy.make(Speciality)
+        missing = str(uuid.uuid4())
+        self.assertEquals(
+            ["speciality with id {} not found".format(missing)],
+            _validate_humanresources([
+                {"speciality": str(speciality.id)},
+                {"speciality": missing}]))
+        self.assertEquals(["hr"], _validate_humanresources([{}]))
+
+    def test_units(self):
+        department = mommy.make(FacilityDepartment)
+        self.assertEquals([], _validate_units([{"unit": str(department.id)}]))
+        self.assertEquals(
+            ["The facility department provided does not exist"],
+            _validate_units([{"unit": str(uuid.uuid4())}]))
+        self.assertEquals(
+            ["Please provide a proper facility department"],
+            _validate_units([{"unit": "ICU"}]))
+
+    def test_contacts(self):
+        contact_type = mommy.make(ContactType)
+        missing = {"contact_type": str(uuid.uuid4()), "contact": "0700"}
+        self.assertEquals([], _validate_contacts([
+            {"contact_type": str(contact_type.id), "contact": "0700"}]))
+        self.assertEquals(
+            ["Contact type with the id {} was not found".format(missing)],
+            _validate_contacts([missing]))
+        self.assertEquals(
+            ["Contact has a badly formed uuid",
+             "Contact type with the id {} was not found".format(
+                 {"contact_type": "1"}),
+             "The contact field is missing"],
+            _validate_contacts([{"contact_type": "1"}]))
+
+    def test_validation_benchmark(self):
+        """
+        Benchmarks validating and naming a large payload.
+
+        The rows of each type are fetched with one query, however many
+        items the payload has, and naming them reuses the fetched rows.
+        """
+        size = 200
+        option = mommy.make(Option, display_text='Yes')
+        services = [
+            {"service": str(obj.id), "option": str(option.id)}
+            for obj in mommy.make(Service, _quantity=size)]
+        infrastructure = [
+            {"infrastructure": str(obj.id), "count": 1}
+            for obj in mommy.make(Infrastructure, _quantity=size)]
+        humanresources = [
+            {"speciality": str(obj.id), "count": 2}
+            for obj in mommy.make(Speciality, _quantity=size)]
+        units = [
+            {"unit": str(obj.id)}
+            for obj in mommy.make(FacilityDepartment, _quantity=size)]
+        contacts = [
+            {"contact_type": str(obj.id), "contact": "07{}".format(i)}
+            for i, obj in enumerate(
+                mommy.make(ContactType, _quantity=size))]
+
+        view = FacilityDetailView()
+        view.validation_errors = {}
+        start = time.perf_counter()
+        with CaptureQueriesContext(connection) as queries:
+            view._validate_payload(
+                services, humanresources, infrastructure, contacts, units,
+                {})
+            view.populate_service_name(services)
+            view.populate_humanresources_name(humanresources)
+            view.populate_infrastructure_name(infrastructure)
+            view.populate_contact_type_names(contacts)
+            view.populate_department_names(units)
+        elapsed = time.perf_counter() - start
+        LOGGER.info("Validated and named {} items in {:.2f}ms".format(
+            size * 5, elapsed * 1000))
+
+        self.assertEquals({}, view.validation_errors)
+        # one query per model, one for the options and the officer checks
+        self.assertEquals(8, len(queries))
+        self.assertEquals('Yes', services[-1]['display_name'])
+        self.assertTrue(all(unit['department_name'] for unit in units))
+
+    def test_rows_are_fetched_once(self):
+        services = mommy.make(Service, _quantity=3)
+        rows = PayloadRows()
+        with CaptureQueriesContext(connection) as queries:
+            rows.fetch(Service, [service.id for service in services])
+            self.assertEquals(
+                services[0].name, rows.name(Service, services[0].id))
+            self.assertFalse(rows.exists(Service, 'not-a-uuid'))
+        self.assertEquals(1, len(queries))
+
+        with self.assertRaises(Service.DoesNotExist):
+            rows.name(Service, uuid.uuid4())
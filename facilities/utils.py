@@ -38,75 +38,113 @@ def _is_valid_uuid(value):
         return False
 
 
-def _validate_services(services):
+class PayloadRows(object):
+
+    """
+    The rows that a facility payload refers to by id.
+
+    Each model's rows are fetched with a single query for all the ids that
+    are asked for at once, so that validating a payload and resolving the
+    names of what it refers to does not cost a query per item.
+    """
+
+    def __init__(self):
+        # model -> { id: name }
+        self.rows = {}
+        self.fetched = {}
+
+    def fetch(self, model, ids, name_field='name'):
+        """Fetches the rows of ``model`` with the given ids"""
+        fetched = self.fetched.setdefault(model, set())
+        rows = self.rows.setdefault(model, {})
+        ids = set(
+            str(value) for value in ids if _is_valid_uuid(str(value))
+        ) - fetched
+        if ids:
+            rows.update(
+                (str(pk), name) for pk, name in model.objects.filter(
+                    id__in=ids).values_list('id', name_field))
+            fetched.update(ids)
+        return rows
+
+    def exists(self, model, value):
+        return str(value) in self.fetch(model, [value])
+
+    def name(self, model, value, name_field='name'):
+        rows = self.fetch(model, [value], name_field)
+        try:
+            return rows[str(value)]
+        except KeyError:
+            raise model.DoesNotExist(
+                "{} with id {} not found".format(model.__name__, value))
+
+
+def _validate_related(items, key, model, rows, bad_uuid_error, not_found):
+    """
+    Checks that the ``key`` of each item is the id of a ``model`` row.
+    Validation stops at the first badly formed id.
+    """
+    rows = rows or PayloadRows()
     errors = []
-    for service in services:
-        if not _is_valid_uuid(service.get('service', None)):
-            errors.append("Service has a badly formed uuid")
+    ids = []
+    for item in items:
+        if not _is_valid_uuid(item.get(key, None)):
+            break
+        ids.append(item[key])
+    rows.fetch(model, ids)
+
+    for item in items:
+        if not _is_valid_uuid(item.get(key, None)):
+            errors.append(bad_uuid_error)
             return errors
-        try:
-            Service.objects.get(id=service['service'])
-        except (ValueError, TypeError, KeyError, Service.DoesNotExist):
-            errors.append("service with id {} not found".format(
-                service.get('service')))
+        if not rows.exists(model, item[key]):
+            errors.append(not_found(item))
 
     return errors
 
-def _validate_infrastructure(infrastructure):
-    errors = []
-    for infra in infrastructure:
-        if not _is_valid_uuid(infra.get('infrastructure', None)):
-            errors.append("Infrastructure has a badly formed uuid")
-            return errors
-        try:
-            Infrastructure.objects.get(id=infra['infrastructure'])
-        except (ValueError, TypeError, KeyError, Infrastructure.DoesNotExist):
-            errors.append("infrastructure with id {} not found".format(
-                infra.get('infrastructure')))
 
-    return errors
+def _validate_services(services, rows=None):
+    return _validate_related(
+        services, 'service', Service, rows,
+        "Service has a badly formed uuid",
+        lambda service: "service with id {} not found".format(
+            service.get('service')))
 
-def _validate_humanresources(humanresources):
-    errors = []
-    for hr in humanresources:
-        if not _is_valid_uuid(hr.get('speciality', None)):
-            errors.append( "hr" ) #"Specialty has a badly formed uuid")
-            return errors
-        try:
-            Speciality.objects.get(id=hr['speciality'])
-        except (ValueError, TypeError, KeyError, Speciality.DoesNotExist):
-            errors.append("speciality with id {} not found".format(
-                hr.get('speciality')))
 
-    return errors
+def _validate_infrastructure(infrastructure, rows=None):
+    return _validate_related(
+        infrastructure, 'infrastructure', Infrastructure, rows,
+        "Infrastructure has a badly formed uuid",
+        lambda infra: "infrastructure with id {} not found".format(
+            infra.get('infrastructure')))
 
 
-def _validate_units(units):
-    errors = []
-    for unit in units:
-        if not _is_valid_uuid(unit.get('unit', None)):
-            errors.append("Please provide a proper facility department")
-            return errors
-        try:
-            FacilityDepartment.objects.get(id=unit.get('unit'))
-        except FacilityDepartment.DoesNotExist:
-            errors.append("The facility department provided does not exist")
+def _validate_humanresources(humanresources, rows=None):
+    return _validate_related(
+        humanresources, 'speciality', Speciality, rows,
+        "hr",  # "Specialty has a badly formed uuid"
+        lambda hr: "speciality with id {} not found".format(
+            hr.get('speciality')))
 
-    return errors
 
+def _validate_units(units, rows=None):
+    return _validate_related(
+        units, 'unit', FacilityDepartment, rows,
+        "Please provide a proper facility department",
+        lambda unit: "The facility department provided does not exist")
 
-def _validate_contacts(contacts):
+
+def _validate_contacts(contacts, rows=None):
+    rows = rows or PayloadRows()
     errors = []
+    rows.fetch(
+        ContactType, [contact.get('contact_type') for contact in contacts])
     for contact in contacts:
         if not _is_valid_uuid(contact.get('contact_type', None)):
             errors.append("Contact has a badly formed uuid")
-        try:
-            ContactType.objects.get(id=contact.get('contact_type'))
-        except ContactType.DoesNotExist:
+        if not rows.exists(ContactType, contact.get('contact_type')):
             errors.append("Contact type with the id {} was not found".format(
                 contact))
-        except (KeyError, ValueError, TypeError):
-            errors.append("Key contact type is missing")
         if contact.get('contact') is None:
             errors.append("The contact field is missing")
 
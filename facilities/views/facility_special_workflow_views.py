@@ -1,11 +1,7 @@
-from django.template import loader, Context
-
-from django.utils import timezone
-from django.views.decorators.cache import never_cache
 
 from rest_framework import generics
 
-from common.views import AuditableDetailViewMixin, DownloadPDFMixin
+from common.views import AuditableDetailViewMixin, CachedPDFReportMixin
 from common.utilities import CustomRetrieveUpdateDestroyView
 from chul.models import CommunityHealthUnit
 
@@ -162,34 +158,42 @@ class RegulationStatusDetailView(
     serializer_class = RegulationStatusSerializer
 
 
-class FacilityPDFDownloadView(DownloadPDFMixin, generics.RetrieveAPIView):
-    queryset = Facility.objects.all()
+class FacilityPDFDownloadView(
+        CachedPDFReportMixin, generics.RetrieveAPIView):
+    queryset = Facility.objects.select_related(
+        'facility_type', 'owner__owner_type', 'regulatory_body',
+        'ward__constituency__county', 'ward__sub_county',
+        'facility_coordinates_through')
     serializer_class = FacilitySerializer
 
-    @never_cache
-    def get(self, request, *args, **kwargs):
-        facility = self.get_object()
-        template = loader.get_template(self.report_tpl)
-        report_date = timezone.now().isoformat()
-        services = FacilityService.objects.filter(facility=facility)
-        contacts = FacilityContact.objects.filter(facility=facility)
-        officers = FacilityOfficer.objects.filter(facility=facility)
-        chus = CommunityHealthUnit.objects.filter(facility=facility)
-        regulating_bodies = FacilityRegulationStatus.objects.filter(
-            facility=facility)
-        regulating_body = regulating_bodies[0] if regulating_bodies else None
+    def get_report_variant(self, facility):
+        if self.request.user.has_perm(
+                'facilities.view_facility_coordinates'):
+            return 'coordinates'
+        return ''
+
+    def get_report_file_name(self, facility):
+        return '{} ({})'.format(facility.name.lower(), self.filename_padding)
+
+    @classmethod
+    def get_report_context(cls, facility, variant):
+        regulating_body = FacilityRegulationStatus.objects.filter(
+            facility=facility).select_related('regulating_body').first()
 
         ctx_data = {
-            "report_date": report_date,
             "facility": facility,
-            "services": services,
-            "contacts": contacts,
-            "officers": officers,
-            "chus": chus,
+            "services": list(FacilityService.objects.filter(
+                facility=facility).select_related('service', 'option')),
+            "contacts": list(FacilityContact.objects.filter(
+                facility=facility).select_related('contact__contact_type')),
+            "officers": list(FacilityOfficer.objects.filter(
+                facility=facility).select_related('officer')),
+            "chus": list(CommunityHealthUnit.objects.filter(
+                facility=facility).select_related('status')),
             "regulating_body": regulating_body
         }
 
-        if request.user.has_perm('facilities.view_facility_coordinates'):
+        if variant == 'coordinates':
             try:
                 facility_coordinates = facility.facility_coordinates_through
             except:
@@ -205,12 +209,7 @@ class FacilityPDFDownloadView(DownloadPDFMixin, generics.RetrieveAPIView):
             )
             ctx_data["facility_coordinates"] = facility_coordinates
 
-        file_name = '{} ({})'.format(
-            facility.name.lower(), self.filename_padding
-        )
-        return self.download_file(
-            template.render(ctx_data), file_name
-        )
+        return ctx_data
 
 
 class FacilityCoverTemplate(FacilityPDFDownloadView):
@@ -1,17 +1,22 @@
 import json
 
 from django.utils import timezone
+from django.utils.functional import cached_property
 from rest_framework import generics, status
 from rest_framework.views import Response, APIView
 from rest_framework.parsers import MultiPartParser
 
 from common.views import AuditableDetailViewMixin
 from common.utilities import CustomRetrieveUpdateDestroyView
-
-from common.models import (
-    ContactType, UserConstituency, UserCounty, UserSubCounty
+from common.utilities.area_scope import (
+    AREA_COLUMN_LOOKUPS,
+    AdminAreaScope,
+    model_field_names,
+    ward_area_lookups
 )
 
+from common.models import ContactType
+
 from ..models import (
     Facility,
     FacilityUnit,
@@ -90,7 +95,8 @@ from ..utils import (
     _validate_infrastructure,
     _validate_units,
     _validate_contacts,
-    _officer_data_is_valid
+    _officer_data_is_valid,
+    PayloadRows
 )
 
 
@@ -106,90 +112,41 @@ class QuerysetFilterMixin(object):
     only on views for resources that are directly linked to counties
     e.g. facilities ).
     """
-    def filter_for_county_users(self):
-        if not self.request.user.is_national and \
-                self.request.user.county \
-                and 'ward' in [
-                field.name for field in
-                self.queryset.model._meta.get_fields()]:
-            try:
-                self.queryset = self.queryset.filter(
-                    ward__constituency__county__in=[
-                        uc.county.id for uc in UserCounty.objects.filter(
-                            user=self.request.user, active=True)])
-            except:
-                self.queryset = self.queryset.filter(
-                    county__in=[
-                        uc.county.id for uc in UserCounty.objects.filter(
-                            user=self.request.user, active=True)])
-
-    def filter_for_sub_county_users(self):
-        if (self.request.user.sub_county and 'ward' in [
-                field.name for field in
-                self.queryset.model._meta.get_fields()] and not
-                self.request.user.constituency):
-            try:
-                self.queryset = self.queryset.filter(
-                    ward__sub_county__in=[
-                        us.sub_county
-                        for us in UserSubCounty.objects.filter(
-                            user=self.request.user, active=True)])
-            except:
-                self.queryset = self.queryset.filter(
-                    sub_county__in=[
-                        us.sub_county.id
-                        for us in UserSubCounty.objects.filter(
-                            user=self.request.user, active=True)])
-
-    def filter_for_consituency_users(self):
-        if (self.request.user.constituency and hasattr(
-                self.queryset.model, 'ward') and not
-                self.request.user.sub_county):
-            try:
-                self.queryset = self.queryset.filter(
-                    ward__constituency__in=[
-                        uc.constituency
-                        for uc in UserConstituency.objects.filter(
-                            user=self.request.user, active=True)])
-            except:
-                self.queryset = self.queryset.filter(
-                    constituency__in=[
-                        uc.constituency.id
-                        for uc in UserConstituency.objects.filter(
-                            user=self.request.user, active=True)])
-
-    def filter_for_sub_county_and_constituency_users(self):
-        if (self.request.user.sub_county and 'ward' in [
-                field.name for field in
-                self.queryset.model._meta.get_fields()] and
-                self.request.user.constituency):
-            try:
-                self.queryset = self.queryset.filter(
-                    ward__sub_county__in=[
-                        us.sub_county
-                        for us in UserSubCounty.objects.filter(
-                            user=self.request.user, active=True)])
-            except:
-                self.queryset = self.queryset.filter(
-                    sub_county__in=[
-                        us.sub_county.id
-                        for us in UserSubCounty.objects.filter(
-                            user=self.request.user, active=True)])
+    area_lookups = ward_area_lookups('ward')
+
+    @cached_property
+    def area_scope(self):
+        return AdminAreaScope(self.request.user)
+
+    def get_area_lookups(self):
+        """
+        The ward is traversed to the areas unless it is a plain column, as
+        in the facility material view which has columns for the areas.
+        """
+        if self.queryset.model._meta.get_field('ward').is_relation:
+            return self.area_lookups
+        return AREA_COLUMN_LOOKUPS
+
+    def filter_for_area_users(self):
+        """
+        Confines county, constituency and sub county users to their areas.
+        """
+        if 'ward' in model_field_names(self.queryset.model):
+            self.queryset = self.area_scope.filter(
+                self.queryset, self.get_area_lookups())
 
     def filter_classified_facilities(self):
         if self.request.user.has_perm(
                 "facilities.view_classified_facilities") \
-            is False and 'is_classified' in [
-                field.name for field in
-                self.queryset.model._meta.get_fields()]:
+            is False and \
+                'is_classified' in model_field_names(self.queryset.model):
             self.queryset = self.queryset.filter(is_classified=False)
 
     def filter_approved_facilities(self):
         if self.request.user.has_perm(
             "facilities.view_unapproved_facilities") \
-            is False and 'approved' in [
-                field.name for field in
-                self.queryset.model._meta.get_fields()]:
+            is False and \
+                'approved' in model_field_names(self.queryset.model):
 
             # filter both facilities and facilities materialized view
             try:
@@ -199,16 +156,14 @@ class QuerysetFilterMixin(object):
 
     def filter_rejected_facilities(self):
         if self.request.user.has_perm("facilities.view_rejected_facilities") \
-            is False and ('rejected' in [
-                field.name for field in
-                self.queryset.model._meta.get_fields()]):
+            is False and \
+                'rejected' in model_field_names(self.queryset.model):
             self.queryset = self.queryset.filter(rejected=False)
 
     def filter_closed_facilities(self):
         if self.request.user.has_perm(
             "facilities.view_closed_facilities") is False and \
-            'closed' in [field.name for field in
-                         self.queryset.model._meta.get_fields()]:
+            'closed' in model_field_names(self.queryset.model):
             self.queryset = self.queryset.filter(closed=False)
 
     def filter_for_regulators(self):
@@ -219,17 +174,15 @@ class QuerysetFilterMixin(object):
 
     def filter_for_infrastructure(self):
         if self.request.user.has_perm("facilities.view_infrastructure") \
-            is False and ('infrastructure' in [
-                field.name for field in
-                self.queryset.model._meta.get_fields()]):
+            is False and \
+                'infrastructure' in model_field_names(self.queryset.model):
             self.queryset = self.queryset.filter(infrastructure=self.request.infrastructure)
 
 
     def filter_for_services(self):
         if self.request.user.has_perm("facilities.view_facilityservice") \
-            is False and ('service' in [
-                field.name for field in
-                self.queryset.model._meta.get_fields()]):
+            is False and \
+                'service' in model_field_names(self.queryset.model):
             self.queryset = self.queryset.filter(service=self.request.service)
 
 
@@ -238,10 +191,7 @@ class QuerysetFilterMixin(object):
         if hasattr(custom_queryset, 'count'):
             self.queryset = custom_queryset
 
-        self.filter_for_county_users()
-        self.filter_for_consituency_users()  # TODO fix typo
-        self.filter_for_sub_county_users()
-        self.filter_for_sub_county_and_constituency_users()
+        self.filter_for_area_users()
         self.filter_for_regulators()
         self.filter_classified_facilities()
         self.filter_rejected_facilities()
@@ -558,105 +508,100 @@ class FacilityDetailView(
         else:
             update.units = json.dumps(units)
 
-    def populate_infrastructure_name(self, infrastructures):
+    @property
+    def payload_rows(self):
         """
-        Resolves and updates the infrastructure names and option display_name
+        The rows the payload refers to, shared by the validation and the
+        name resolution so that each is fetched once
+        """
+        if getattr(self, '_payload_rows', None) is None:
+            self._payload_rows = PayloadRows()
+        return self._payload_rows
+
+    def _populate_names(self, items, key, model):
         """
+        Resolves the ``model`` names and the option display_names of items
+        e.g. services, fetching each model's rows in one query
+        """
+        self.payload_rows.fetch(model, [item.get(key) for item in items])
+        self.payload_rows.fetch(
+            Option, [item.get('option') for item in items], 'display_text')
         resolved_ids = []
-        for infrastructure in infrastructures:
-            infrastructure_id = infrastructure.get('infrastructure')
+        for item in items:
+            item_id = item.get(key)
 
-            if infrastructure_id in resolved_ids:
+            if item_id in resolved_ids:
                 continue
 
             else:
-                resolved_ids.append(infrastructure_id)
+                resolved_ids.append(item_id)
 
-                obj = Infrastructure.objects.get(id=infrastructure_id)
-                infrastructure['name'] = obj.name
-                option = infrastructure.get('option', None)
+                item['name'] = self.payload_rows.name(model, item_id)
+                option = item.get('option', None)
                 if option:
-                    infrastructure['display_name'] = Option.objects.get(
-                        id=option).display_text
-        return infrastructures
+                    item['display_name'] = self.payload_rows.name(
+                        Option, option, 'display_text')
+        return items
+
+    def populate_infrastructure_name(self, infrastructures):
+        """
+        Resolves and updates the infrastructure names and option display_name
+        """
+        return self._populate_names(
+            infrastructures, 'infrastructure', Infrastructure)
 
     def populate_service_name(self, services):
         """
         Resolves and updates the service names and option display_name
         """
-        resolved_ids = []
-        for service in services:
-            service_id = service.get('service')
-
-            if service_id in resolved_ids:
-                continue
-
-            else:
-                resolved_ids.append(service_id)
-
-                obj = Service.objects.get(id=service_id)
-                service['name'] = obj.name
-                option = service.get('option', None)
-                if option:
-                    service['display_name'] = Option.objects.get(
-                        id=option).display_text
-        return services
+        return self._populate_names(services, 'service', Service)
 
     def populate_humanresources_name(self, humanresources):
         """
         Resolves and updates the humanresources names and option display_name
         """
-        resolved_ids = []
-        for hr in humanresources:
-            humanresources_id = hr.get('speciality')
-
-            if humanresources_id in resolved_ids:
-                continue
-
-            else:
-                resolved_ids.append(humanresources_id)
-
-                obj = Speciality.objects.get(id=humanresources_id)
-                hr['name'] = obj.name
-                option = hr.get('option', None)
-                if option:
-                    hr['display_name'] = Option.objects.get(
-                        id=option).display_text
-        return humanresources
+        return self._populate_names(humanresources, 'speciality', Speciality)
 
     def populate_contact_type_names(self, contacts):
         """
         Resolves and populates the contact type names
         """
+        self.payload_rows.fetch(
+            ContactType, [contact.get('contact_type') for contact in contacts])
         for contact in contacts:
-            contact['contact_type_name'] = ContactType.objects.get(
-                id=contact.get('contact_type')).name
+            contact['contact_type_name'] = self.payload_rows.name(
+                ContactType, contact.get('contact_type'))
         return contacts
 
     def populate_department_names(self, units):
         """
         Resolves and populates the regulatory body names
         """
+        self.payload_rows.fetch(
+            FacilityDepartment, [unit['unit'] for unit in units])
         for unit in units:
-            unit['department_name'] = FacilityDepartment.objects.get(
-                id=unit['unit']).name
+            unit['department_name'] = self.payload_rows.name(
+                FacilityDepartment, unit['unit'])
         return units
 
     def populate_officer_incharge_contacts(self, officer_in_charge):
         """
         Resolves the contact_type_name for the officer_in_charge contacts
         """
-        for contact in officer_in_charge['contacts']:
-            contact['contact_type_name'] = ContactType.objects.get(
-                id=contact.get('type')).name
+        contacts = officer_in_charge['contacts']
+        self.payload_rows.fetch(
+            ContactType, [contact.get('type') for contact in contacts])
+        for contact in contacts:
+            contact['contact_type_name'] = self.payload_rows.name(
+                ContactType, contact.get('type'))
         return officer_in_charge
 
     def populate_officer_incharge_job_title(self, officer_in_charge):
         """
         Resolves the job title name for the officer in-charge
         """
-        officer_in_charge['job_title_name'] = JobTitle.objects.get(
-            id=officer_in_charge['title']).name
+        officer_in_charge['job_title_name'] = self.payload_rows.name(
+            JobTitle, officer_in_charge['title'])
         return officer_in_charge
 
     def should_buffer_officer_incharge(self, officer_in_charge, instance):
@@ -696,23 +641,24 @@ class FacilityDetailView(
         """
         Validates the updated attributes before  buffering them
         """
-        service_errors = _validate_services(services)
+        self._payload_rows = rows = PayloadRows()
+        service_errors = _validate_services(services, rows)
         if service_errors:
             self.validation_errors.update({"services": service_errors})
 
-        hr_errors = _validate_humanresources(humanresources)
+        hr_errors = _validate_humanresources(humanresources, rows)
         if hr_errors:
             self.validation_errors.update({"humanresources": hr_errors})
         
-        infra_errors = _validate_infrastructure(infrastructure)
+        infra_errors = _validate_infrastructure(infrastructure, rows)
         if infra_errors:
             self.validation_errors.update({"infrastructure": infra_errors})
 
-        contact_errors = _validate_contacts(contacts)
+        contact_errors = _validate_contacts(contacts, rows)
         if contact_errors:
             self.validation_errors.update({"contacts": contact_errors})
 
-        unit_errors = _validate_units(units)
+        unit_errors = _validate_units(units, rows)
         if unit_errors:
             self.validation_errors.update({"units": unit_errors})
         officer_errors = _officer_data_is_valid(officer_in_charge)
@@ -0,0 +1,108 @@
+"""
+Compact, columnar encodings of facility coordinates.
+
+Instead of a JSON object per facility, a feed holds parallel arrays: the
+ids and the latitudes and longitudes of the facilities. The rows are read
+straight from ``values_list`` so that no model instance is built.
+
+Encodings ( the ``feed`` GET param ):
+
+    compact -- latitudes and longitudes as integers i.e. the degrees
+               multiplied by 10 ** precision and rounded
+    delta   -- as compact, but each coordinate after the first is the
+               difference from the one before it
+    binary  -- an ``application/octet-stream`` body with the count as a
+               little-endian uint32, the 16 byte ids and then the
+               latitudes and longitudes as little-endian float32 arrays
+"""
+import struct
+import uuid
+
+from django.db.models import FloatField, Func
+from django.http import HttpResponse
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+FEED_ENCODINGS = ('compact', 'delta', 'binary')
+
+# 5 decimal places is about a meter at the equator
+COORDINATES_PRECISION = 5
+
+
+class Latitude(Func):
+    function = 'ST_Y'
+    output_field = FloatField()
+
+
+class Longitude(Func):
+    function = 'ST_X'
+    output_field = FloatField()
+
+
+def get_feed_encoding(request):
+    """Returns the requested feed encoding or None for the default output"""
+    encoding = request.query_params.get('feed', None)
+    if encoding and encoding not in FEED_ENCODINGS:
+        raise ValidationError({
+            "feed": ["Expected one of {}".format(", ".join(FEED_ENCODINGS))]
+        })
+    return encoding
+
+
+def quantize(values, precision=COORDINATES_PRECISION):
+    scale = 10 ** precision
+    return [int(round(value * scale)) for value in values]
+
+
+def delta_encode(values):
+    previous = 0
+    encoded = []
+    for value in values:
+        encoded.append(value - previous)
+        previous = value
+    return encoded
+
+
+def _binary_feed(ids, latitudes, longitudes):
+    count = len(ids)
+    body = b''.join([
+        struct.pack('<I', count),
+        b''.join(uuid.UUID(str(pk)).bytes for pk in ids),
+        struct.pack('<{}f'.format(count), *latitudes),
+        struct.pack('<{}f'.format(count), *longitudes),
+    ])
+    return HttpResponse(body, content_type='application/octet-stream')
+
+
+def coordinates_feed(rows, encoding, columns=()):
+    """
+    Builds a feed response from (id, latitude, longitude, *columns) rows.
+
+    Any extra ``columns`` are added as arrays of their own to the JSON
+    encodings; the binary encoding only carries the ids and coordinates.
+    """
+    rows = list(rows)
+    ids = [row[0] for row in rows]
+    latitudes = [row[1] for row in rows]
+    longitudes = [row[2] for row in rows]
+
+    if encoding == 'binary':
+        return _binary_feed(ids, latitudes, longitudes)
+
+    latitudes = quantize(latitudes)
+    longitudes = quantize(longitudes)
+    if encoding == 'delta':
+        latitudes = delta_encode(latitudes)
+        longitudes = delta_encode(longitudes)
+
+    data = {
+        "encoding": encoding,
+        "precision": COORDINATES_PRECISION,
+        "count": len(rows),
+        "ids": ids,
+        "lat": latitudes,
+        "lng": longitudes,
+    }
+    for index, column in enumerate(columns, start=3):
+        data[column] = [row[index] for row in rows]
+    return Response(data)
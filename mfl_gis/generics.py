@@ -1,10 +1,81 @@
-from rest_framework_extensions.etag.decorators import etag
+import hashlib
+
+from django.db.models import CharField, Count, Max, Q, Value
+from django.http import HttpResponseNotModified
+from django.utils.cache import add_never_cache_headers
+from django.utils.http import quote_etag
 from rest_framework.generics import ListCreateAPIView
 
+from common.utilities import etag_matches
+
+
+def data_version(*models):
+    """
+    Describes the state of the given models' tables in a single query.
+
+    The latest ``updated``, the row count and the deleted row count of
+    each table change whenever a row is added, edited or removed.
+    """
+    querysets = [
+        model.everything.order_by().annotate(
+            table=Value(model._meta.label, output_field=CharField())
+        ).values('table').annotate(
+            last_updated=Max('updated'), count=Count('pk'),
+            deleted_count=Count('pk', filter=Q(deleted=True))
+        ).values_list('table', 'last_updated', 'count', 'deleted_count')
+        for model in models
+    ]
+    rows = querysets[0].union(*querysets[1:], all=True) \
+        if len(querysets) > 1 else querysets[0]
+    return sorted(
+        ':'.join(str(column) for column in row) for row in rows
+    )
+
+
+def make_etag(*parts):
+    digest = hashlib.md5(
+        '|'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+    return quote_etag(digest)
+
+
+def not_modified(etag_value):
+    response = HttpResponseNotModified()
+    response['ETag'] = etag_value
+    # keep the empty response out of the page caches
+    add_never_cache_headers(response)
+    return response
+
 
-class GISListCreateAPIView(ListCreateAPIView):
+class DataVersionETagMixin(object):
+
+    """
+    Answers conditional GETs from the state of the tables behind a view.
+
+    The ETag is derived from the request path and the ``data_version`` of
+    ``etag_models`` ( the queryset model by default ). It is checked before
+    the view does any work, so an unchanged resource costs one query.
+    """
+
+    etag_models = None
+
+    def get_etag_models(self):
+        return self.etag_models or (self.get_queryset().model, )
+
+    def get_etag(self, request):
+        return make_etag(
+            request.get_full_path(), *data_version(*self.get_etag_models()))
 
-    @etag()
     def get(self, request, *args, **kwargs):
-        """"""
-        return self.list(request, *args, **kwargs)
+        etag_value = self.get_etag(request)
+        if etag_matches(request, etag_value):
+            return not_modified(etag_value)
+
+        response = super(DataVersionETagMixin, self).get(
+            request, *args, **kwargs)
+        if response.status_code == 200:
+            response['ETag'] = etag_value
+        return response
+
+
+class GISListCreateAPIView(DataVersionETagMixin, ListCreateAPIView):
+    pass
@@ -4,7 +4,7 @@ from shapely.ops import unary_union
 import json
 import reversion
 
-from django.db import models as db_models
+from django.db import connection, models as db_models
 from django.contrib.gis.db import models as gis_models
 from django.contrib.gis.db.models import Union
 from django.contrib.gis.geos import MultiPolygon
@@ -33,7 +33,7 @@ class CoordinatesValidatorMixin(object):
                     .format(self.coordinates)
                 )
         except WorldBorder.DoesNotExist:
-            raise ValidationError('Setup error: Kenyan boundaries not loaded')
+            raise ValidationError(KENYA_BOUNDARIES_MISSING)
 
     def _validate_within_boundaries(self, boundary_model, area, raise_not_found=True):  # noqa
         try:
@@ -78,6 +78,137 @@ class CustomGeoManager(gis_models.Manager):
             CustomGeoManager, self).get_queryset().filter(deleted=False)
 
 
+KENYA_BOUNDARIES_MISSING = 'Setup error: Kenyan boundaries not loaded'
+
+COORDINATES_CONTAINMENT_SQL = """
+WITH points (facility_id, point) AS (
+    SELECT facility_id, ST_SetSRID(ST_MakePoint(longitude, latitude), 4326)
+    FROM unnest(%s::uuid[], %s::float8[], %s::float8[])
+        AS p (facility_id, longitude, latitude)
+)
+SELECT
+    points.facility_id,
+    ST_Contains(country.mpoly, points.point),
+    ST_Contains(county_boundary.mpoly, points.point),
+    ST_Contains(constituency_boundary.mpoly, points.point),
+    ST_Contains(ward_boundary.mpoly, points.point),
+    county.name,
+    constituency.name
+FROM points
+LEFT JOIN {facility} facility ON facility.id = points.facility_id
+LEFT JOIN {ward} ward ON ward.id = facility.ward_id
+LEFT JOIN {constituency} constituency ON constituency.id = ward.constituency_id
+LEFT JOIN {county} county ON county.id = constituency.county_id
+LEFT JOIN {world_border} country
+    ON country.code = 'KEN' AND NOT country.deleted
+LEFT JOIN {county_boundary} county_boundary
+    ON county_boundary.area_id = county.id AND NOT county_boundary.deleted
+LEFT JOIN {constituency_boundary} constituency_boundary
+    ON constituency_boundary.area_id = constituency.id
+    AND NOT constituency_boundary.deleted
+LEFT JOIN {ward_boundary} ward_boundary
+    ON ward_boundary.area_id = ward.id AND NOT ward_boundary.deleted
+"""
+
+
+def _containment_errors(containment):
+    """
+    Validates the result of a containment query for a single facility.
+
+    A point should be within at least two of its county, constituency and
+    ward; the country check is only logged since the Kenyan boundaries that
+    we have are of low fidelity at the edges.
+    """
+    if containment['country'] is None:
+        return [KENYA_BOUNDARIES_MISSING]
+    if not containment['country']:
+        LOGGER.error(
+            '{0} is not within the Kenyan boundaries that we have'
+            .format(containment['point']))
+
+    errors = [
+        'No boundary information for {0}'.format(
+            containment[area + '_name'])
+        for area in ('county', 'constituency')
+        if containment[area] is None
+    ]
+    if errors:
+        return errors
+
+    areas_passed = len([
+        area for area in ('county', 'constituency', 'ward')
+        if containment[area]
+    ])
+    if areas_passed < 2:
+        return ["The coordinates did not validate"]
+    return []
+
+
+class FacilityCoordinatesManager(CustomGeoManager):
+
+    def containment(self, points):
+        """
+        Checks which administrative boundaries contain each point.
+
+        ``points`` is an iterable of (facility_id, longitude, latitude). All
+        points are checked with ``ST_Contains`` in a single statement that
+        joins each facility to its county, constituency and ward boundaries.
+        Returns {facility_id: {country, county, constituency, ward, ...}}
+        where an area is ``None`` when its boundary is not loaded.
+        """
+        points = [
+            (str(facility_id), float(longitude), float(latitude))
+            for facility_id, longitude, latitude in points
+        ]
+        if not points:
+            return {}
+
+        sql = COORDINATES_CONTAINMENT_SQL.format(
+            facility=Facility._meta.db_table,
+            ward=Ward._meta.db_table,
+            constituency=Constituency._meta.db_table,
+            county=County._meta.db_table,
+            world_border=WorldBorder._meta.db_table,
+            county_boundary=CountyBoundary._meta.db_table,
+            constituency_boundary=ConstituencyBoundary._meta.db_table,
+            ward_boundary=WardBoundary._meta.db_table)
+        facility_ids, longitudes, latitudes = zip(*points)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                sql, [list(facility_ids), list(longitudes), list(latitudes)])
+            rows = cursor.fetchall()
+
+        points_by_facility = {
+            facility_id: (longitude, latitude)
+            for facility_id, longitude, latitude in points
+        }
+        return {
+            str(row[0]): {
+                "point": points_by_facility[str(row[0])],
+                "country": row[1],
+                "county": row[2],
+                "constituency": row[3],
+                "ward": row[4],
+                "county_name": row[5],
+                "constituency_name": row[6]
+            }
+            for row in rows
+        }
+
+    def validate_coordinates(self, points):
+        """
+        Validates many coordinates at once e.g. when importing them.
+
+        Returns {facility_id: [errors]} for the points that did not validate.
+        """
+        validation_errors = {}
+        for facility_id, containment in self.containment(points).items():
+            errors = _containment_errors(containment)
+            if errors:
+                validation_errors[facility_id] = errors
+        return validation_errors
+
+
 class GISAbstractBase(AbstractBase, gis_models.Model):
     """
     We've intentionally duplicated the `AbstractBase` in the `common` app
@@ -173,6 +304,8 @@ class FacilityCoordinates(CoordinatesValidatorMixin, GISAbstractBase):
                   " taken with GPS device")
     collection_date = gis_models.DateTimeField(default=timezone.now)
 
+    objects = FacilityCoordinatesManager()
+
     @property
     def simplify_coordinates(self):
         return {
@@ -198,27 +331,15 @@ class FacilityCoordinates(CoordinatesValidatorMixin, GISAbstractBase):
 
     def clean(self):
         self.validate_coordinates_decimal_places_at_least_six()
-        self.validate_long_and_lat_within_kenya()
-
-        areas_passed = 0
-        if self.validate_long_and_lat_within_county(
-                self.facility.ward.constituency.county):
-            areas_passed += 1
 
-        if self.validate_long_and_lat_within_constituency(
-                self.facility.ward.constituency):
-            areas_passed += 1
-
-        if self.validate_long_and_lat_within_ward(
-                self.facility.ward):
-            areas_passed += 1
-
-        if areas_passed < 2:
-            raise ValidationError({
-                "coordinates": [
-                    "The coordinates did not validate"
-                ]
-            })
+        containment = FacilityCoordinates.objects.containment([(
+            self.facility_id, self.coordinates.x, self.coordinates.y
+        )])[str(self.facility_id)]
+        errors = _containment_errors(containment)
+        if KENYA_BOUNDARIES_MISSING in errors:
+            raise ValidationError(KENYA_BOUNDARIES_MISSING)
+        if errors:
+            raise ValidationError({"coordinates": errors})
 
         super(FacilityCoordinates, self).clean()
 
@@ -144,6 +144,36 @@ class TestFacilityCoordinatesModel(BaseTestCase):
             c.exception.detail["coordinates"][0]
         )
 
+    def test_containment_in_a_single_query(self):
+        facility = mommy.make_recipe('mfl_gis.tests.facility_recipe')
+        with self.assertNumQueries(1):
+            containment = FacilityCoordinates.objects.containment([
+                (facility.id, 36.78378206656476, -1.2840274151085824)
+            ])[str(facility.id)]
+
+        self.assertTrue(containment["country"])
+        self.assertTrue(containment["county"])
+        self.assertTrue(containment["constituency"])
+        self.assertTrue(containment["ward"])
+
+    def test_validate_coordinates_in_bulk(self):
+        valid_facility = mommy.make_recipe('mfl_gis.tests.facility_recipe')
+        invalid_facility = mommy.make_recipe('mfl_gis.tests.facility_recipe')
+
+        errors = FacilityCoordinates.objects.validate_coordinates([
+            (valid_facility.id, 36.78378206656476, -1.2840274151085824),
+            # Thomson Falls is in Kenya but not in Nairobi
+            (invalid_facility.id, 36.370416, 0.044444),
+            (self.test_fac.id, 36.78378206656476, -1.2840274151085824)
+        ])
+
+        self.assertNotIn(str(valid_facility.id), errors)
+        self.assertEqual(
+            ["The coordinates did not validate"],
+            errors[str(invalid_facility.id)])
+        self.assertIn(
+            str(self.test_county), errors[str(self.test_fac.id)][0])
+
     def test_validate_longitude_and_latitude_no_ward_boundaries(self):
         self.test_coords.validate_long_and_lat_within_ward(self.test_ward)
         # Because some wards have no boundaries, we choose to let this pass
@@ -1,3 +1,12 @@
+import struct
+import uuid
+from datetime import timedelta
+
+from django.contrib.gis.geos import Point
+from django.db import connection
+from django.test.utils import override_settings
+from django.utils import timezone
+from mock import patch
 from rest_framework.test import APITestCase
 from common.tests.test_views import LoginMixin
 from common.models import Ward, County, Constituency
@@ -52,6 +61,36 @@ class TestCountyBoundaryViews(LoginMixin, APITestCase):
         self.assertEqual(200, boundary_list_response.status_code)
         self.assertEqual(2, len(boundary_list_response.data['results']))
 
+    def test_conditional_listing(self):
+        boundary = mommy.make(CountyBoundary)
+        etag = self.client.get(self.list_url)['ETag']
+
+        with patch(
+                'mfl_gis.views.CountyBoundaryListView.list') as list_mock:
+            response = self.client.get(
+                self.list_url, HTTP_IF_NONE_MATCH=etag)
+            self.assertFalse(list_mock.called)
+        self.assertEqual(304, response.status_code)
+
+        boundary.delete()
+        response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(0, len(response.data['results']))
+
+    @override_settings(COMPRESSION_MIN_SIZE=0)
+    def test_conditional_listing_of_compressed_responses(self):
+        mommy.make(CountyBoundary)
+        response = self.client.get(
+            self.list_url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual('gzip', response['Content-Encoding'])
+        etag = response['ETag']
+        self.assertTrue(etag.startswith('W/'))
+
+        response = self.client.get(
+            self.list_url, HTTP_ACCEPT_ENCODING='gzip',
+            HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(304, response.status_code)
+
 
 class TestConstituencyBoundaryViews(LoginMixin, APITestCase):
 
@@ -121,6 +160,77 @@ class TestFacilityCoordinatesListing(LoginMixin, APITestCase):
         self.assertEquals(0, len(response.data))
 
 
+class TestFacilityCoordinatesFeed(LoginMixin, APITestCase):
+
+    def setUp(self):
+        super(TestFacilityCoordinatesFeed, self).setUp()
+        self.url = reverse("api:mfl_gis:facility_coordinates_list")
+        self.coords = mommy.make_recipe(
+            'mfl_gis.tests.facility_coordinates_recipe')
+
+    def test_compact_feed(self):
+        response = self.client.get(self.url + "?feed=compact")
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(1, response.data["count"])
+        self.assertEqual([self.coords.facility_id], response.data["ids"])
+        self.assertEqual([-128403], response.data["lat"])
+        self.assertEqual([3678378], response.data["lng"])
+
+    def test_delta_feed(self):
+        mommy.make_recipe(
+            'mfl_gis.tests.facility_coordinates_recipe',
+            coordinates=Point(36.78379206656476, -1.2840374151085824))
+        response = self.client.get(self.url + "?feed=delta")
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(2, response.data["count"])
+        self.assertIn(abs(response.data["lat"][1]), (0, 1))
+
+    def test_binary_feed(self):
+        response = self.client.get(self.url + "?feed=binary")
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(
+            'application/octet-stream', response['Content-Type'])
+        body = response.content
+        self.assertEqual(1, struct.unpack('<I', body[:4])[0])
+        self.assertEqual(
+            self.coords.facility_id, uuid.UUID(bytes=body[4:20]))
+        lat, lng = struct.unpack('<2f', body[20:28])
+        self.assertAlmostEqual(-1.284027, lat, places=5)
+        self.assertAlmostEqual(36.783782, lng, places=5)
+
+    def test_invalid_feed(self):
+        response = self.client.get(self.url + "?feed=xml")
+        self.assertEqual(400, response.status_code)
+
+    def test_conditional_get(self):
+        response = self.client.get(self.url + "?feed=compact")
+        etag = response['ETag']
+
+        response = self.client.get(
+            self.url + "?feed=compact", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(304, response.status_code)
+        self.assertEqual(etag, response['ETag'])
+
+        FacilityCoordinates.objects.filter(id=self.coords.id).update(
+            updated=timezone.now() + timedelta(minutes=1))
+        response = self.client.get(
+            self.url + "?feed=compact", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(200, response.status_code)
+        self.assertNotEqual(etag, response['ETag'])
+
+    def test_facilities_moving_ward_change_the_etag(self):
+        url = "{}?feed=compact&ward={}".format(
+            self.url, self.coords.facility.ward_id)
+        etag = self.client.get(url)['ETag']
+
+        Facility.objects.filter(id=self.coords.facility_id).update(
+            ward=mommy.make(Ward),
+            updated=timezone.now() + timedelta(minutes=1))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(0, response.data["count"])
+
+
 class TestPostingFacilityCoordinates(LoginMixin, APITestCase):
 
     def setUp(self):
@@ -452,6 +562,26 @@ class TestDrillDownFacility(LoginMixin, APITestCase):
         resp = self.client.get(self.url)
         self.assertEqual(resp.status_code, 200)
 
+    def test_compact_feed(self):
+        coords = mommy.make_recipe(
+            'mfl_gis.tests.facility_coordinates_recipe',
+            facility__approved=True)
+        with connection.cursor() as cursor:
+            cursor.execute("REFRESH MATERIALIZED VIEW mfl_gis_drilldown")
+        resp = self.client.get(self.url + "?feed=compact")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(1, resp.data["count"])
+        self.assertEqual([coords.id], resp.data["ids"])
+        # the same orientation as the facility coordinates feed
+        self.assertEqual([-128403], resp.data["lat"])
+        self.assertEqual([3678378], resp.data["lng"])
+        for column in ("name", "county", "ward"):
+            self.assertEqual(1, len(resp.data[column]))
+
+        resp = self.client.get(
+            self.url + "?feed=compact", HTTP_IF_NONE_MATCH=resp['ETag'])
+        self.assertEqual(resp.status_code, 304)
+
 
 class TestDrillDownCountry(LoginMixin, APITestCase):
 
@@ -466,6 +596,17 @@ class TestDrillDownCountry(LoginMixin, APITestCase):
         self.assertEqual(resp.data['meta']['name'], 'KENYA')
         self.assertIsInstance(resp.data['geojson'], dict)
 
+    def test_conditional_get(self):
+        mommy.make_recipe('mfl_gis.tests.county_boundary_recipe')
+        etag = self.client.get(self.url)['ETag']
+        resp = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 304)
+
+        # a new facility changes the facility counts of the boundaries
+        mommy.make_recipe('mfl_gis.tests.facility_coordinates_recipe')
+        resp = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+
 
 class TestDrillDownCounty(LoginMixin, APITestCase):
 
@@ -511,6 +652,13 @@ class TestDrillDownWard(LoginMixin, APITestCase):
         super(TestDrillDownWard, self).setUp()
         self.url = "api:mfl_gis:drilldown_ward"
 
+    def test_conditional_get(self):
+        wb = mommy.make_recipe("mfl_gis.tests.ward_boundary_recipe")
+        url = reverse(self.url, kwargs={"code": wb.area.code})
+        etag = self.client.get(url)['ETag']
+        resp = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 304)
+
     def test_get_listing(self):
         wb = mommy.make_recipe("mfl_gis.tests.ward_boundary_recipe")
         resp = self.client.get(
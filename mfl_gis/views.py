@@ -11,6 +11,7 @@ from rest_framework import settings as rest_settings
 from rest_framework.permissions import DjangoModelPermissions
 
 from facilities.models import Facility
+from common.models import County, Constituency, Ward
 from common.views import AuditableDetailViewMixin
 from common.utilities import CustomRetrieveUpdateDestroyView
 
@@ -55,7 +56,26 @@ from .serializers import (
     DrillWardBoundarySerializer
 )
 from .pagination import GISPageNumberPagination
-from .generics import GISListCreateAPIView
+from .generics import (
+    DataVersionETagMixin,
+    GISListCreateAPIView,
+    data_version,
+    etag_matches,
+    make_etag,
+    not_modified
+)
+from .feeds import (
+    Latitude,
+    Longitude,
+    coordinates_feed,
+    get_feed_encoding
+)
+
+# The boundary representations include facility counts and area names
+BOUNDARY_ETAG_MODELS = (
+    WorldBorder, CountyBoundary, ConstituencyBoundary, WardBoundary,
+    FacilityCoordinates, County, Constituency, Ward,
+)
 
 
 class GeoCodeSourceListView(generics.ListCreateAPIView):
@@ -147,7 +167,7 @@ class FacilityCoordinatesListView(GISListCreateAPIView):
         'facility', 'latitude', 'longitude', 'source', 'method',)
     pagination_class = GISPageNumberPagination
 
-    def get(self, *args, **kwargs):
+    def get(self, request, *args, **kwargs):
         queryset = self.queryset
         ward = self.request.query_params.get('ward', None)
         county = self.request.query_params.get('county', None)
@@ -161,8 +181,26 @@ class FacilityCoordinatesListView(GISListCreateAPIView):
             queryset = queryset.filter(
                 facility__ward__constituency=constituency)
 
-        result = [fc.json_features for fc in queryset.all()]
-        return views.Response(data=result)
+        encoding = get_feed_encoding(request)
+        # the area filters go through the facilities and their wards
+        etag = make_etag(
+            request.get_full_path(), *data_version(
+                FacilityCoordinates, Facility, Ward, Constituency))
+        if etag_matches(request, etag):
+            return not_modified(etag)
+
+        rows = queryset.annotate(
+            lat=Latitude('coordinates'), lng=Longitude('coordinates')
+        ).values_list('facility_id', 'lat', 'lng')
+        if encoding:
+            response = coordinates_feed(rows, encoding)
+        else:
+            response = views.Response(data=[
+                {"geometry": {"coordinates": [round(lng, 2), round(lat, 2)]}}
+                for _, lat, lng in rows
+            ])
+        response['ETag'] = etag
+        return response
 
 
 class FacilityCoordinatesDetailView(
@@ -200,6 +238,7 @@ class FacilityCoordinatesCreationAndListing(
     # Do not change the permission_classes without good reason
     permission_classes = (DjangoModelPermissions,)
     queryset = FacilityCoordinates.objects.all()
+    etag_models = (FacilityCoordinates, Facility)
     serializer_class = FacilityCoordinateSimpleSerializer
     filter_class = FacilityCoordinatesFilter
     ordering_fields = (
@@ -262,6 +301,7 @@ class WorldBorderListView(GISListCreateAPIView):
     deleted -- Boolean is the record deleted
     """
     queryset = WorldBorder.objects.all()
+    etag_models = BOUNDARY_ETAG_MODELS
     serializer_class = WorldBorderSerializer
     filter_class = WorldBorderFilter
     ordering_fields = ('name', 'code',)
@@ -294,6 +334,7 @@ class CountyBoundaryListView(GISListCreateAPIView):
     deleted -- Boolean is the record deleted
     """
     queryset = CountyBoundary.objects.all()
+    etag_models = BOUNDARY_ETAG_MODELS
     serializer_class = CountyBoundarySerializer
     filter_class = CountyBoundaryFilter
     ordering_fields = ('name', 'code',)
@@ -336,6 +377,7 @@ class ConstituencyBoundaryListView(GISListCreateAPIView):
     deleted -- Boolean is the record deleted
     """
     queryset = ConstituencyBoundary.objects.all()
+    etag_models = BOUNDARY_ETAG_MODELS
     serializer_class = ConstituencyBoundarySerializer
     filter_class = ConstituencyBoundaryFilter
     ordering_fields = ('name', 'code',)
@@ -378,6 +420,7 @@ class WardBoundaryListView(GISListCreateAPIView):
     deleted -- Boolean is the record deleted
     """
     queryset = WardBoundary.objects.all()
+    etag_models = BOUNDARY_ETAG_MODELS
     serializer_class = WardBoundarySerializer
     filter_class = WardBoundaryFilter
     ordering_fields = ('name', 'code',)
@@ -465,15 +508,33 @@ class DrillFacilityCoords(views.APIView):
     """
 
     def get(self, request, *args, **kwargs):
-        qset = DrilldownView.objects.values_list(
-            'name', 'lat', 'lng', 'county', 'constituency', 'ward',
-        )
-        return views.Response(qset)
+        encoding = get_feed_encoding(request)
+        etag = make_etag(
+            request.get_full_path(),
+            *data_version(FacilityCoordinates, Facility))
+        if etag_matches(request, etag):
+            return not_modified(etag)
+
+        if encoding:
+            columns = ('name', 'county', 'constituency', 'ward')
+            # the drilldown view keeps the longitude ( st_x ) in "lat" and
+            # the latitude ( st_y ) in "lng"
+            response = coordinates_feed(
+                DrilldownView.objects.values_list(
+                    'id', 'lng', 'lat', *columns),
+                encoding, columns=columns)
+        else:
+            response = views.Response(DrilldownView.objects.values_list(
+                'name', 'lat', 'lng', 'county', 'constituency', 'ward',
+            ))
+        response['ETag'] = etag
+        return response
 
 
-class DrillBorderBase(generics.ListAPIView):
+class DrillBorderBase(DataVersionETagMixin, generics.ListAPIView):
     lookup_field = 'code'
     pagination_class = GISPageNumberPagination
+    etag_models = BOUNDARY_ETAG_MODELS
 
     def _get_code(self):
         return self.kwargs.get(self.lookup_field)
@@ -541,7 +602,8 @@ class DrillConstituencyBorders(DrillCountyBorders):
         )
 
 
-class DrillWardBorders(WardBoundaryDetailView):
+class DrillWardBorders(DataVersionETagMixin, WardBoundaryDetailView):
     lookup_field = 'area__code'
+    etag_models = BOUNDARY_ETAG_MODELS
     lookup_url_kwarg = 'code'
     serializer_class = DrillWardBoundarySerializer
\ No newline at end of file
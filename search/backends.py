@@ -0,0 +1,209 @@
+"""
+Pluggable search backends used by the search filters.
+
+A backend takes a queryset and a search term and returns the matching rows,
+best matches first. ``get_search_backend`` returns the first available of
+the backends listed in ``settings.SEARCH['BACKENDS']``; the Postgres backend
+is always available, so search works without Elasticsearch.
+"""
+import logging
+import re
+
+from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import (
+    SearchQuery, SearchRank, SearchVector, TrigramSimilarity)
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.db.models.functions import Greatest
+from django.utils.module_loading import import_string
+from requests.exceptions import RequestException
+
+from .search_utils import ElasticAPI
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+# names are proper nouns, so the text is not stemmed
+SEARCH_CONFIG = 'simple'
+
+TEXT_FIELD_TYPES = ['CharField', 'EmailField']
+
+DEFAULT_BACKENDS = [
+    'search.backends.ElasticSearchBackend',
+    'search.backends.PostgresSearchBackend',
+]
+
+
+def search_vector(*fields):
+    return SearchVector(*fields, config=SEARCH_CONFIG)
+
+
+def postgres_search_indexes(prefix, fields):
+    """
+    The indexes that back the Postgres search of a model's ``fields``.
+
+    A GIN index over the fields' tsvector serves the full text matches and
+    a pg_trgm GIN index per field serves the fuzzy matches. The fields
+    must be given in the same order as in ``POSTGRES_SEARCH_FIELDS``.
+    """
+    return [
+        GinIndex(search_vector(*fields), name='{}_search_idx'.format(prefix))
+    ] + [
+        GinIndex(
+            fields=[field], opclasses=['gin_trgm_ops'],
+            name='{}_{}_trgm'.format(prefix, field))
+        for field in fields
+    ]
+
+
+class SearchBackend(object):
+
+    """The interface of the search backends"""
+
+    def is_available(self):
+        raise NotImplementedError
+
+    def search(self, queryset, query, search_type='full_text'):
+        """
+        Returns the rows of ``queryset`` that match ``query`` ranked by how
+        well they match. ``search_type`` is either ``full_text`` or
+        ``auto_complete``.
+        """
+        raise NotImplementedError
+
+
+class ElasticSearchBackend(SearchBackend):
+
+    def __init__(self):
+        self.api = ElasticAPI()
+
+    def is_available(self):
+        return self.api._is_on
+
+    def search(self, queryset, query, search_type='full_text'):
+        index_name = settings.SEARCH.get('INDEX_NAME')
+        try:
+            if search_type == 'full_text':
+                result = self.api.search_document(
+                    index_name, queryset.model, query)
+            else:
+                result = self.api.search_auto_complete_document(
+                    index_name, queryset.model, query)
+        except RequestException:
+            LOGGER.exception("Searching Elasticsearch failed")
+            return PostgresSearchBackend().search(
+                queryset, query, search_type)
+
+        hits = []
+        try:
+            hits = result.json().get('hits').get('hits') if result.json() \
+                else hits
+        except AttributeError:
+            hits = hits
+
+        pk_list = [str(hit.get('_id')) for hit in hits]
+        ordering = Case(
+            *[When(pk=pk, then=Value(i)) for i, pk in enumerate(pk_list)],
+            output_field=IntegerField())
+        return queryset.filter(pk__in=pk_list).order_by(ordering) \
+            if pk_list else queryset.none()
+
+
+class PostgresSearchBackend(SearchBackend):
+
+    """
+    Full text and trigram search in Postgres.
+
+    Terms are matched against the tsvector of the model's search fields and
+    against each field with pg_trgm similarity, so that misspelt terms
+    still match. Results are ordered by ``SearchRank`` and then by the
+    ``TrigramSimilarity`` of the closest field. Numeric terms match codes.
+    """
+
+    def is_available(self):
+        return True
+
+    def get_search_fields(self, model):
+        configured = settings.SEARCH.get('POSTGRES_SEARCH_FIELDS', {})
+        label = model._meta.label
+        if label in configured:
+            return configured[label]
+
+        text_fields = [
+            field.name for field in model._meta.concrete_fields
+            if field.get_internal_type() in TEXT_FIELD_TYPES and
+            field.name != 'search'
+        ]
+        if 'name' in text_fields:
+            return ['name']
+        return text_fields
+
+    def get_code_field(self, model):
+        """
+        The field that numeric terms are matched against i.e a
+        ``SequenceField`` or else a field named ``code`` such as the
+        integer codes of the materialized views.
+        """
+        fields = model._meta.concrete_fields
+        for field in fields:
+            if field.get_internal_type() == 'SequenceField':
+                return field.name
+        for field in fields:
+            if field.name == 'code':
+                return field.name
+
+    def get_search_query(self, query, search_type):
+        if search_type == 'auto_complete':
+            # match the terms as prefixes e.g. "nair hosp" -> nair:* & hosp:*
+            terms = re.findall(r'\w+', query, flags=re.UNICODE)
+            if not terms:
+                return None
+            return SearchQuery(
+                ' & '.join('{}:*'.format(term) for term in terms),
+                config=SEARCH_CONFIG, search_type='raw')
+        return SearchQuery(
+            query, config=SEARCH_CONFIG, search_type='websearch')
+
+    def search(self, queryset, query, search_type='full_text'):
+        query = str(query).strip()
+        model = queryset.model
+
+        code_field = self.get_code_field(model)
+        if code_field and query.isdigit():
+            return queryset.filter(**{code_field: query})
+
+        fields = self.get_search_fields(model)
+        if not fields or not query:
+            return queryset.none()
+
+        vector = search_vector(*fields)
+        search_query = self.get_search_query(query, search_type)
+        similarities = [TrigramSimilarity(field, query) for field in fields]
+
+        condition = Q()
+        for field in fields:
+            condition |= Q(**{'{}__trigram_similar'.format(field): query})
+        annotations = {
+            'search_similarity': Greatest(*similarities)
+            if len(similarities) > 1 else similarities[0]
+        }
+        if search_query is not None:
+            annotations['search_vector'] = vector
+            annotations['search_rank'] = SearchRank(vector, search_query)
+            condition |= Q(search_vector=search_query)
+            ordering = ('-search_rank', '-search_similarity')
+        else:
+            ordering = ('-search_similarity', )
+
+        return queryset.annotate(**annotations).filter(condition).order_by(
+            *ordering)
+
+
+def get_search_backend():
+    """Returns the first available of the configured search backends"""
+    for path in settings.SEARCH.get('BACKENDS', DEFAULT_BACKENDS):
+        backend = import_string(path)()
+        if backend.is_available():
+            return backend
+    return PostgresSearchBackend()
@@ -0,0 +1,195 @@
+"""
+Builds the documents that are indexed in Elasticsearch.
+
+Only the fields named in ``FULL_TEXT_SEARCH_FIELDS`` and
+``AUTOCOMPLETE_MODEL_FIELDS`` are ever searched, so a model's document holds
+just those fields, its id and its code. They are fetched with ``values()``;
+fields that span a to-many relation are collected with ``ArrayAgg``. A spec
+builds the documents of a whole queryset in the same number of queries as
+a single document.
+
+The configured field names follow the serializers e.g. ``ward_name`` or
+``facility_services.service_name``. Names that are not model lookups are
+mapped to lookups in ``SEARCH['INDEX_FIELD_LOOKUPS']``; a list of lookups
+is joined with spaces.
+"""
+import json
+import logging
+
+from django.conf import settings
+from django.contrib.postgres.aggregates import ArrayAgg
+from django.core.exceptions import FieldDoesNotExist
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+
+LOGGER = logging.getLogger(__name__)
+
+TEXT_FIELD_TYPES = ['CharField', 'EmailField', 'TextField']
+
+
+def get_indexed_fields(model):
+    """The document fields of ``model`` named in the search settings"""
+    search_settings = settings.SEARCH
+    model_name = model.__name__.lower()
+    fields = []
+
+    full_text = search_settings.get('FULL_TEXT_SEARCH_FIELDS') or {}
+    for model_conf in full_text.get('models', []):
+        if model_conf.get('name', '').lower() == model_name:
+            fields.extend(model_conf.get('fields', []))
+
+    for app_conf in search_settings.get('AUTOCOMPLETE_MODEL_FIELDS') or []:
+        if app_conf.get('app') != model._meta.app_label:
+            continue
+        for model_conf in app_conf.get('models', []):
+            if model_conf.get('name', '').lower() == model_name:
+                fields.extend(model_conf.get('fields', []))
+
+    if not fields:
+        # the model is searched through all its text
+        fields = [
+            field.name for field in model._meta.concrete_fields
+            if field.get_internal_type() in TEXT_FIELD_TYPES and
+            field.name != 'search'
+        ]
+
+    # keep the order, drop the duplicates
+    return list(dict.fromkeys(fields))
+
+
+class IndexDocumentSpec(object):
+
+    """The fields of a model's search index document and how to fetch them"""
+
+    def __init__(self, model):
+        self.model = model
+        self.fields = get_indexed_fields(model)
+        configured = settings.SEARCH.get('INDEX_FIELD_LOOKUPS') or {}
+        self.field_lookups = configured.get(model._meta.label, {})
+
+        self.values = ['id']
+        code = self._code_field()
+        if code:
+            self.values.append(code)
+        self.aggregates = {}
+        # document field -> the values and aggregates it is built from
+        self.sources = {}
+        for field in self.fields:
+            lookups = self.field_lookups.get(
+                field, field.replace('.', '__'))
+            if not isinstance(lookups, (list, tuple)):
+                lookups = [lookups]
+
+            sources = []
+            for lookup in lookups:
+                source = self._add_lookup(lookup)
+                if source is None:
+                    LOGGER.debug(
+                        "{} is not indexed for {}, it is not a model "
+                        "field".format(field, model.__name__))
+                    break
+                sources.append(source)
+            else:
+                self.sources[field] = sources
+
+    def _code_field(self):
+        for field in self.model._meta.concrete_fields:
+            if field.get_internal_type() == 'SequenceField':
+                return field.name
+
+    def _resolve(self, lookup):
+        """
+        Returns the lookup of a text value and the first to-many relation
+        that it spans as a ( lookup, model ) pair, if any. A lookup that
+        ends on a relation resolves to the name of the related row.
+        """
+        model = self.model
+        parts = lookup.split('__')
+        many = None
+        for index, part in enumerate(parts):
+            try:
+                field = model._meta.get_field(part)
+            except FieldDoesNotExist:
+                return None, None
+            if not field.is_relation:
+                if index != len(parts) - 1:
+                    return None, None
+                return lookup, many
+            model = field.related_model
+            if many is None and (field.one_to_many or field.many_to_many):
+                many = ('__'.join(parts[:index + 1]), model)
+
+        try:
+            model._meta.get_field('name')
+        except FieldDoesNotExist:
+            return None, None
+        return lookup + '__name', many
+
+    def _add_lookup(self, lookup):
+        lookup, many = self._resolve(lookup)
+        if lookup is None:
+            return None
+        if many is None:
+            if lookup not in self.values:
+                self.values.append(lookup)
+            return lookup
+
+        alias = 'index_{}'.format(lookup.replace('__', '_'))
+        if alias not in self.aggregates:
+            relation, related_model = many
+            condition = Q(**{'{}__isnull'.format(lookup): False})
+            if hasattr(related_model, 'deleted'):
+                # the related managers leave out the deleted rows
+                condition &= Q(**{'{}__deleted'.format(relation): False})
+            self.aggregates[alias] = ArrayAgg(
+                lookup, distinct=True, filter=condition)
+        return alias
+
+    def _field_value(self, row, sources):
+        values = [row.get(source) for source in sources]
+        if any(source in self.aggregates for source in sources):
+            return [item for value in values for item in value or []]
+        if len(values) == 1:
+            return values[0]
+        return ' '.join(str(value) for value in values if value)
+
+    def build(self, row):
+        """Builds the document of a row fetched by ``rows``"""
+        document = {
+            key: row[key] for key in self.values if '__' not in key
+        }
+        for field, sources in self.sources.items():
+            value = self._field_value(row, sources)
+            # dotted fields are nested e.g. facility_services.service_name
+            target = document
+            parts = field.split('.')
+            for part in parts[:-1]:
+                target = target.setdefault(part, {})
+            target[parts[-1]] = value
+        return document
+
+    def rows(self, queryset):
+        """The indexed values of the rows of ``queryset``"""
+        if self.aggregates:
+            queryset = queryset.annotate(**self.aggregates)
+        return queryset.order_by().values(
+            *(self.values + list(self.aggregates)))
+
+    def documents(self, queryset, chunk_size=500):
+        """
+        Yields the index documents of the rows of ``queryset`` in the shape
+        expected by ``ElasticAPI.index_document``.
+        """
+        instance_type = self.model.__name__.lower()
+        for row in self.rows(queryset).iterator(chunk_size=chunk_size):
+            yield {
+                "data": json.dumps(self.build(row), cls=DjangoJSONEncoder),
+                "instance_type": instance_type,
+                "instance_id": str(row['id'])
+            }
+
+    def document(self, obj):
+        """The index document of a single model instance"""
+        queryset = self.model._base_manager.filter(pk=obj.pk)
+        return next(self.documents(queryset), None)
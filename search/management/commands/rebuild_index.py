@@ -0,0 +1,30 @@
+from django.core.management import BaseCommand
+
+from search.reindex import IndexRebuild
+
+
+class Command(BaseCommand):
+    help = (
+        "Builds a new search index and points the search alias at it once "
+        "it is complete. Search keeps working during the rebuild.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            dest='chunk_size',
+            default=500,
+            help='The number of documents sent per bulk request')
+        parser.add_argument(
+            '--keep-old',
+            action='store_true',
+            dest='keep_old',
+            default=False,
+            help='Keep the indices that the alias pointed to')
+
+    def handle(self, *args, **options):
+        rebuild = IndexRebuild(
+            chunk_size=options['chunk_size'], keep_old=options['keep_old'])
+        count = rebuild.run()
+        self.stdout.write("Indexed {} documents into {}".format(
+            count, rebuild.build.index_name))
@@ -0,0 +1,218 @@
+"""
+Rebuilds the search index without taking search down.
+
+The searches use ``INDEX_NAME`` as an alias of a versioned index e.g.
+``mfl_index_v20261019120000``. A rebuild creates a new versioned index and
+streams the documents into it in bulk while the alias keeps pointing at the
+old index. Documents indexed during the rebuild are written to both
+indices and indexed again from the database before the alias is moved to
+the new index in a single request.
+"""
+import logging
+
+from django.apps import apps
+from django.conf import settings
+from django.utils import timezone
+from requests.exceptions import RequestException
+
+from common.models import SearchIndexBuild, SearchIndexWrite
+
+from .documents import IndexDocumentSpec
+from .search_utils import ElasticAPI, confirm_model_is_indexable
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+class IndexRebuildError(Exception):
+    pass
+
+
+def versioned_index_name(alias, now=None):
+    now = now or timezone.now()
+    return '{}_v{}'.format(alias, now.strftime('%Y%m%d%H%M%S'))
+
+
+def indexable_models():
+    for app_config in apps.get_app_configs():
+        if app_config.name not in settings.LOCAL_APPS:
+            continue
+        for model in app_config.get_models():
+            if model in (SearchIndexBuild, SearchIndexWrite):
+                continue
+            if not any(field.name == 'id' for field in
+                       model._meta.concrete_fields):
+                continue
+            if confirm_model_is_indexable(model):
+                yield model
+
+
+class IndexRebuild(object):
+
+    """
+    Builds a new versioned index behind ``alias`` and swaps it in.
+
+    ``keep_old`` leaves the indices that the alias pointed to in place,
+    e.g. to swap them back in; by default they are deleted.
+    """
+
+    def __init__(
+            self, alias=None, api=None, chunk_size=500, keep_old=False,
+            models=None):
+        self.alias = alias or settings.SEARCH.get('INDEX_NAME')
+        self.api = api or ElasticAPI()
+        self.chunk_size = chunk_size
+        self.keep_old = keep_old
+        self.models = models
+        self.build = None
+
+    def _check(self, result, action):
+        if result.status_code >= 300:
+            raise IndexRebuildError(
+                "Unable to {}: {}".format(action, result.text))
+        return result
+
+    def create_index(self):
+        index_name = versioned_index_name(self.alias)
+        if SearchIndexBuild.objects.filter(index_name=index_name).exists():
+            raise IndexRebuildError(
+                "The index {} is already being built".format(index_name))
+        self._check(
+            self.api.setup_index(index_name=index_name),
+            "create the index {}".format(index_name))
+        self.build = SearchIndexBuild.objects.create(
+            alias=self.alias, index_name=index_name)
+        return index_name
+
+    def _send(self, operations):
+        if not operations:
+            return 0
+        result = self._check(
+            self.api.bulk(operations), "index the documents in bulk")
+        if result.json().get('errors'):
+            raise IndexRebuildError(
+                "Some documents were not indexed: {}".format(result.text))
+        return sum(1 for action, _ in operations if 'index' in action)
+
+    def _index_operations(self, documents):
+        for document in documents:
+            action = {
+                "index": {
+                    "_index": self.build.index_name,
+                    "_type": document['instance_type'],
+                    "_id": document['instance_id'],
+                }
+            }
+            yield action, document['data']
+
+    def stream(self, model, queryset=None):
+        """Indexes the rows of ``model`` in bulk, a chunk per request"""
+        spec = IndexDocumentSpec(model)
+        queryset = model._default_manager.all() if queryset is None \
+            else queryset
+        count = 0
+        operations = []
+        documents = spec.documents(queryset, chunk_size=self.chunk_size)
+        for operation in self._index_operations(documents):
+            operations.append(operation)
+            if len(operations) == self.chunk_size:
+                count += self._send(operations)
+                operations = []
+        return count + self._send(operations)
+
+    def replay_writes(self):
+        """
+        Indexes again the documents written while the index was built.
+        Rows that no longer exist are removed from the new index.
+        """
+        replayed = 0
+        writes = self.build.writes.all()
+        while writes.exists():
+            batch = list(writes[:self.chunk_size])
+            by_model = {}
+            for write in batch:
+                by_model.setdefault(
+                    (write.app_label, write.model_name), set()).add(
+                    write.object_pk)
+
+            for (app_label, model_name), pks in by_model.items():
+                model = apps.get_model(app_label, model_name)
+                queryset = model._default_manager.filter(pk__in=pks)
+                replayed += self.stream(model, queryset)
+                missing = pks - set(
+                    str(pk) for pk in queryset.values_list('pk', flat=True))
+                self._send([
+                    ({
+                        "delete": {
+                            "_index": self.build.index_name,
+                            "_type": model.__name__.lower(),
+                            "_id": pk,
+                        }
+                    }, None)
+                    for pk in missing
+                ])
+            SearchIndexWrite.objects.filter(
+                id__in=[write.id for write in batch]).delete()
+        return replayed
+
+    def swap(self):
+        """
+        Points the alias at the new index in a single request. An index that
+        was created in place under the name of the alias, before the indices
+        were versioned, is deleted first; search is down for that moment.
+        """
+        old_indices = self.api.get_aliased_indices(self.alias)
+        if not old_indices and \
+                self.api.get_index(self.alias).status_code == 200:
+            LOGGER.warning(
+                "Replacing the unversioned index {}".format(self.alias))
+            self._check(
+                self.api.delete_index(self.alias),
+                "delete the index {}".format(self.alias))
+
+        actions = [
+            {"remove": {"index": index, "alias": self.alias}}
+            for index in old_indices
+        ] + [{"add": {"index": self.build.index_name, "alias": self.alias}}]
+        self._check(
+            self.api.update_aliases(actions),
+            "point {} to {}".format(self.alias, self.build.index_name))
+        return old_indices
+
+    def _finish(self, status, except_message=None):
+        self.build.status = status
+        self.build.except_message = except_message
+        self.build.updated = timezone.now()
+        self.build.save()
+
+    def run(self):
+        """Rebuilds the index and returns the number of indexed documents"""
+        index_name = self.create_index()
+        LOGGER.info("Building the search index {}".format(index_name))
+        try:
+            count = 0
+            models = self.models or indexable_models()
+            for model in models:
+                indexed = self.stream(model)
+                LOGGER.info("Indexed {} {}".format(
+                    indexed, model._meta.verbose_name_plural))
+                count += indexed
+            self.replay_writes()
+            old_indices = self.swap()
+        except Exception as e:
+            self._finish('FAILED', str(e))
+            try:
+                self.api.delete_index(index_name)
+            except RequestException:
+                LOGGER.exception(
+                    "Unable to delete the index {}".format(index_name))
+            raise
+
+        self._finish('DONE')
+        # documents written while the alias was moved are in both indices
+        self.build.writes.all().delete()
+        if not self.keep_old:
+            for index in old_indices:
+                self.api.delete_index(index)
+        LOGGER.info("{} now serves {}".format(index_name, self.alias))
+        return count
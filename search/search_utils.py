@@ -3,14 +3,19 @@ import json
 import uuid
 import requests
 import logging
+import threading
+import time
+
+from requests.adapters import HTTPAdapter
 
 from django.conf import settings
 from django.dispatch import receiver
 from django.db.models.signals import post_save
 from django.apps import apps
-from common.models import ErrorQueue
+from common.models import ErrorQueue, SearchIndexBuild, SearchIndexWrite
 from celery import shared_task
 
+from .documents import IndexDocumentSpec
 from .index_settings import INDEX_SETTINGS
 
 ELASTIC_URL = settings.SEARCH.get('ELASTIC_URL')
@@ -18,6 +23,9 @@ AUTO_COMPLETE_MODELS = settings.SEARCH.get('AUTOCOMPLETE_MODEL_FIELDS')
 INDEX_NAME = settings.SEARCH.get('INDEX_NAME')
 SEARCH_RESULT_SIZE = settings.SEARCH.get('SEARCH_RESULT_SIZE')
 SEARCH_FIELDS = settings.SEARCH.get('FULL_TEXT_SEARCH_FIELDS')
+# ( connect, read ) timeouts in seconds of the requests to Elasticsearch
+ELASTIC_TIMEOUT = settings.SEARCH.get('ELASTIC_TIMEOUT', (1, 10))
+ELASTIC_POOL_SIZE = settings.SEARCH.get('ELASTIC_POOL_SIZE', 10)
 LOGGER = logging.getLogger(__name__)
 
 
@@ -26,47 +34,152 @@ def default(obj):
         return str(obj)
 
 
+class CircuitBreaker(object):
+
+    """
+    Remembers whether Elasticsearch is reachable.
+
+    The last known health is trusted for ``ELASTIC_HEALTH_CHECK_SECONDS``
+    so that searches do not probe Elasticsearch first. A failed request
+    opens the breaker: Elasticsearch is then treated as off, without being
+    contacted, until the health check is due again.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.healthy = None
+            self.checked_at = 0
+
+    @property
+    def ttl(self):
+        return settings.SEARCH.get('ELASTIC_HEALTH_CHECK_SECONDS', 30)
+
+    def status(self):
+        """The known health or None if it should be checked again"""
+        with self.lock:
+            if time.monotonic() - self.checked_at < self.ttl:
+                return self.healthy
+            return None
+
+    def record(self, healthy):
+        with self.lock:
+            if self.healthy is not False and not healthy:
+                LOGGER.warning("Elasticsearch is unreachable")
+            self.healthy = healthy
+            self.checked_at = time.monotonic()
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """The pooled HTTP session shared by the Elasticsearch requests"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=ELASTIC_POOL_SIZE,
+                pool_maxsize=ELASTIC_POOL_SIZE)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _session = session
+        return _session
+
+
 class ElasticAPI(object):
 
+    breaker = CircuitBreaker()
+
+    def __init__(self, url=None):
+        self.url = url or ELASTIC_URL
+
+    def _request(self, method, url, data=None, **kwargs):
+        kwargs.setdefault('timeout', ELASTIC_TIMEOUT)
+        try:
+            return get_session().request(method, url, data=data, **kwargs)
+        except (requests.exceptions.ConnectionError,
+                requests.exceptions.Timeout):
+            self.breaker.record(False)
+            raise
+
     @property
     def _is_on(self):
-        return False
-        url = ELASTIC_URL
-        try:
-            requests.get(url)
-            return True
-        except requests.exceptions.ConnectionError:
+        if not settings.SEARCH.get('ELASTIC_ENABLED', False):
             return False
 
+        healthy = self.breaker.status()
+        if healthy is None:
+            try:
+                self._request('get', self.url)
+                healthy = True
+            except requests.exceptions.RequestException:
+                healthy = False
+            self.breaker.record(healthy)
+        return healthy
+
     def setup_index(self, index_name=INDEX_NAME):
-        url = ELASTIC_URL + index_name
+        url = self.url + index_name
         mfl_settings = json.dumps(INDEX_SETTINGS)
-        result = requests.put(url, data=mfl_settings)
+        result = self._request('put', url, data=mfl_settings)
         return result
 
     def get_index(self, index_name=INDEX_NAME):
-        url = ELASTIC_URL + index_name
-        result = requests.get(url)
+        url = self.url + index_name
+        result = self._request('get', url)
         return result
 
     def delete_index(self, index_name=INDEX_NAME):
-        url = ELASTIC_URL + index_name
-        result = requests.delete(url)
+        url = self.url + index_name
+        result = self._request('delete', url)
         return result
 
+    def get_aliased_indices(self, alias=INDEX_NAME):
+        """The names of the indices that ``alias`` points to"""
+        result = self._request('get', '{}_alias/{}'.format(self.url, alias))
+        if result.status_code == 404:
+            return []
+        result.raise_for_status()
+        return sorted(result.json())
+
+    def update_aliases(self, actions):
+        """Applies the alias ``actions`` in a single atomic request"""
+        data = json.dumps({"actions": actions})
+        return self._request('post', self.url + '_aliases', data=data)
+
+    def bulk(self, operations):
+        """
+        Sends ( action, document ) pairs in a single ``_bulk`` request.
+        ``document`` is None for actions that have no body e.g. deletes.
+        """
+        lines = []
+        for action, document in operations:
+            lines.append(json.dumps(action))
+            if document is not None:
+                lines.append(document)
+        data = '\n'.join(lines) + '\n'
+        return self._request(
+            'post', self.url + '_bulk', data=data.encode('utf-8'),
+            headers={'Content-Type': 'application/x-ndjson'})
+
     def index_document(self, index_name, instance_data):
         instance_type = instance_data.get('instance_type')
         instance_id = instance_data.get('instance_id')
         data = instance_data.get('data')
         url = "{}{}{}{}{}{}".format(
-            ELASTIC_URL, index_name, "/", instance_type, "/", instance_id)
-        result = requests.put(url, data)
+            self.url, index_name, "/", instance_type, "/", instance_id)
+        result = self._request('put', url, data=data)
         return result
 
     def remove_document(self, index_name, document_type, document_id):
         url = "{}{}{}{}{}{}".format(
-            ELASTIC_URL, index_name, "/", document_type, "/", document_id)
-        result = requests.delete(url)
+            self.url, index_name, "/", document_type, "/", document_id)
+        result = self._request('delete', url)
         return result
 
     def get_search_fields(self, model_name):
@@ -77,7 +190,7 @@ class ElasticAPI(object):
     def search_document(self, index_name, instance_type, query):
         document_type = instance_type.__name__.lower()
         url = "{}{}/{}/_search".format(
-            ELASTIC_URL, index_name, document_type)
+            self.url, index_name, document_type)
         search_fields = self.get_search_fields(document_type)
         fields = search_fields if self.get_search_fields(document_type) else \
             ["_all"]
@@ -110,9 +223,9 @@ class ElasticAPI(object):
 
         data = json.dumps(data)
         if query_dsl:
-            result = requests.post(url, query_dsl)
+            result = self._request('post', url, data=query_dsl)
         else:
-            result = requests.post(url, data)
+            result = self._request('post', url, data=data)
 
         return result
 
@@ -126,7 +239,7 @@ class ElasticAPI(object):
                     break
 
         url = "{}{}/{}/_search".format(
-            ELASTIC_URL, index_name, document_type)
+            self.url, index_name, document_type)
         data = {
             "from": 0,
             "size": SEARCH_RESULT_SIZE,
@@ -139,7 +252,7 @@ class ElasticAPI(object):
             }
         }
         data = json.dumps(data)
-        result = requests.post(url, data)
+        result = self._request('post', url, data=data)
 
         return result
 
@@ -163,35 +276,14 @@ def confirm_model_is_indexable(model):
 
 def serialize_model(obj):
     """
-    Locates a models serializer and uses it to serialize a model instance
-    This allows us to search a document through all its important components.
-    If a attribute of model is important enough to make it to the model
-    serializer,
-    it means that the models should also be searched though that attribute
-    as well. This will take care for all the child models of a model if
-    they have been inlined in the serializer.
-
-    For this to work, a model's serializer name has to follow this convention
-    '<model_name>Serializer' Failing to do so the function will cause the
-    function throw a TypeError exception.
-    Only apps in local apps will be indexed.
-    """
-    app_label = obj._meta.app_label
-    serializer_path = "{}{}{}{}".format(
-        app_label, ".serializers.", obj.__class__.__name__, 'Serializer')
-    serializer_cls = pydoc.locate(serializer_path)
-    if not serializer_cls:
-        LOGGER.info("Unable to locate a serializer for model {}".format(
-            obj.__class__))
-    else:
-        serialized_data = serializer_cls(obj).data
+    Builds the search index document of a model instance.
 
-        serialized_data = json.dumps(serialized_data, default=default)
-        return {
-            "data": serialized_data,
-            "instance_type": obj.__class__.__name__.lower(),
-            "instance_id": str(obj.id)
-        }
+    The document holds only the fields that are searched, as configured in
+    ``FULL_TEXT_SEARCH_FIELDS`` and ``AUTOCOMPLETE_MODEL_FIELDS``, see
+    ``search.documents``. Use ``IndexDocumentSpec.documents`` to build the
+    documents of many instances at once.
+    """
+    return IndexDocumentSpec(obj.__class__).document(obj)
 
 
 @shared_task(name='Update_the_search_index')
@@ -216,6 +308,7 @@ def index_instance(app_label, model_name, instance_id, index_name=INDEX_NAME):
             elastic_api.index_document(index_name, data)
             LOGGER.info("Indexed {0}".format(data))
             indexed = True
+            index_in_building_indices(obj, data, index_name, elastic_api)
         else:
             LOGGER.info(
                 "something unexpected occurred when indexing {} - {}"
@@ -228,11 +321,28 @@ def index_instance(app_label, model_name, instance_id, index_name=INDEX_NAME):
     return indexed
 
 
+def index_in_building_indices(obj, data, alias, elastic_api):
+    """
+    Writes a document to the indices that are being built for ``alias``.
+
+    The writes are recorded so that the rebuild indexes the documents
+    again before it moves the alias, see ``search.reindex``.
+    """
+    builds = SearchIndexBuild.objects.filter(alias=alias, status='BUILDING')
+    for build in builds:
+        SearchIndexWrite.objects.get_or_create(
+            build=build,
+            app_label=obj._meta.app_label,
+            model_name=obj.__class__.__name__,
+            object_pk=str(obj.pk))
+        elastic_api.index_document(build.index_name, data)
+
+
 def index_on_save(sender, instance, **kwargs):
     """
     Listen for save signals and index the instances being created.
     """
-    if sender == ErrorQueue:
+    if sender in (ErrorQueue, SearchIndexBuild, SearchIndexWrite):
         return
     app_label = instance._meta.app_label
     index_in_realtime = settings.SEARCH.get("REALTIME_INDEX")
@@ -0,0 +1,241 @@
+"""
+A local stand-in for Elasticsearch used to test the search client.
+
+It answers over HTTP/1.1 keep-alive connections and records the requests and
+connections it receives so that tests can check how the client talks to it.
+It keeps the indices, their documents and aliases in memory.
+"""
+import json
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubElasticHandler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super(StubElasticHandler, self).setup()
+        self.server.stub.record_connection()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _respond(self):
+        stub = self.server.stub
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        stub.record_request(self.command, self.path, body)
+
+        if stub.delay:
+            time.sleep(stub.delay)
+        with stub.lock:
+            status, payload = stub.respond(self.command, self.path, body)
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    do_GET = do_POST = do_PUT = do_DELETE = do_HEAD = _respond
+
+
+class StubElasticServer(object):
+
+    """
+    Runs the stub on a free local port in a background thread.
+
+    ``hits`` are the document ids returned by every ``_search`` in order.
+    ``delay`` slows every response down. ``bulk_aliases`` holds the aliases
+    as they were at each ``_bulk`` request.
+    """
+
+    def __init__(self, hits=(), delay=0):
+        self.hits = list(hits)
+        self.delay = delay
+        self.requests = []
+        self.connections = 0
+        # index -> { ( type, id ): document }
+        self.indices = {}
+        # alias -> set of indices
+        self.aliases = {}
+        self.bulk_aliases = []
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(
+            ('127.0.0.1', 0), StubElasticHandler)
+        self.server.daemon_threads = True
+        self.server.stub = self
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:{}/'.format(self.server.server_address[1])
+
+    def record_connection(self):
+        with self.lock:
+            self.connections += 1
+
+    def record_request(self, method, path, body):
+        with self.lock:
+            self.requests.append((method, path, body))
+
+    def requests_to(self, method, path):
+        return [
+            request for request in self.requests
+            if request[0] == method and request[1] == path
+        ]
+
+    def resolve(self, name):
+        """The indices that an index or alias name refers to"""
+        if name in self.indices:
+            return [name]
+        return sorted(self.aliases.get(name, []))
+
+    def update_aliases(self, actions):
+        aliases = {
+            alias: set(indices) for alias, indices in self.aliases.items()}
+        for action in actions:
+            for kind, conf in action.items():
+                if conf['index'] not in self.indices:
+                    return 404, {"error": "IndexMissingException"}
+                indices = aliases.setdefault(conf['alias'], set())
+                if kind == 'add':
+                    indices.add(conf['index'])
+                else:
+                    indices.discard(conf['index'])
+        self.aliases = {
+            alias: indices for alias, indices in aliases.items() if indices}
+        return 200, {"acknowledged": True}
+
+    def bulk(self, body):
+        self.bulk_aliases.append({
+            alias: set(indices) for alias, indices in self.aliases.items()})
+        lines = body.decode('utf-8').splitlines()
+        items = []
+        errors = False
+        while lines:
+            action = json.loads(lines.pop(0))
+            kind, meta = list(action.items())[0]
+            document = json.loads(lines.pop(0)) if kind == 'index' else None
+            indices = self.resolve(meta['_index'])
+            if not indices:
+                errors = True
+                items.append({kind: {"status": 404}})
+                continue
+            key = (meta['_type'], str(meta['_id']))
+            if kind == 'index':
+                self.indices[indices[0]][key] = document
+            else:
+                self.indices[indices[0]].pop(key, None)
+            items.append({kind: {"status": 200}})
+        return 200, {"errors": errors, "items": items}
+
+    def search(self, parts, body):
+        hits = [
+            {"_id": str(hit), "_score": len(self.hits) - i}
+            for i, hit in enumerate(self.hits)
+        ]
+        return 200, {"hits": {"total": len(hits), "hits": hits}}
+
+    def info(self, parts, body):
+        return 200, {"status": 200, "tagline": "You Know, for Search"}
+
+    def acknowledge(self, parts, body):
+        return 200, {"acknowledged": True}
+
+    def get_alias(self, parts, body):
+        indices = self.aliases.get(parts[1])
+        if not indices:
+            return 404, {}
+        return 200, {index: {"aliases": {parts[1]: {}}} for index in indices}
+
+    def create_index(self, parts, body):
+        name = parts[0]
+        if name in self.indices or name in self.aliases:
+            return 400, {"error": "IndexAlreadyExistsException"}
+        self.indices[name] = {}
+        return 200, {"acknowledged": True}
+
+    def delete_index(self, parts, body):
+        name = parts[0]
+        if name not in self.indices:
+            return 404, {"error": "IndexMissingException"}
+        del self.indices[name]
+        for indices in self.aliases.values():
+            indices.discard(name)
+        return 200, {"acknowledged": True}
+
+    def get_index(self, parts, body):
+        indices = self.resolve(parts[0])
+        if not indices:
+            return 404, {"error": "IndexMissingException"}
+        return 200, {index: {} for index in indices}
+
+    def put_document(self, parts, body):
+        indices = self.resolve(parts[0])
+        if not indices:
+            # documents written to a missing index create it
+            self.indices[parts[0]] = {}
+            indices = [parts[0]]
+        if len(indices) > 1:
+            return 400, {"error": "ElasticsearchIllegalArgumentException"}
+        self.indices[indices[0]][(parts[1], parts[2])] = json.loads(body)
+        return 200, {"created": True}
+
+    def delete_document(self, parts, body):
+        for index in self.resolve(parts[0]):
+            self.indices[index].pop((parts[1], parts[2]), None)
+        return 200, {"found": True}
+
+    # ( method, route ) -> handler, '*' answers any method
+    ROUTES = {
+        ('*', '_search'): search,
+        ('*', ''): info,
+        ('*', '_bulk'): lambda self, parts, body: self.bulk(body),
+        ('*', '_aliases'): lambda self, parts, body: self.update_aliases(
+            json.loads(body)['actions']),
+        ('*', '_alias'): get_alias,
+        ('PUT', 'index'): create_index,
+        ('DELETE', 'index'): delete_index,
+        ('*', 'index'): get_index,
+        ('PUT', 'document'): put_document,
+        ('DELETE', 'document'): delete_document,
+    }
+
+    @staticmethod
+    def route(parts):
+        """Names the kind of resource that the path parts refer to"""
+        if parts and parts[-1] == '_search':
+            return '_search'
+        if not parts or parts[0].startswith('_'):
+            return parts[0] if parts else ''
+        if len(parts) == 1:
+            return 'index'
+        return 'document' if len(parts) > 2 else parts[1]
+
+    def respond(self, method, path, body):
+        parts = [part for part in path.split('?')[0].split('/') if part]
+        route = self.route(parts)
+        handler = self.ROUTES.get(
+            (method, route), self.ROUTES.get(('*', route), None))
+        if handler is None:
+            return self.acknowledge(parts, body)
+        return handler(self, parts, body)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
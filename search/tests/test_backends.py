@@ -0,0 +1,103 @@
+from mock import PropertyMock, patch
+
+from django.test import TestCase
+
+from model_mommy import mommy
+
+from chul.models import CommunityHealthUnit
+from common.models import ContactType, County
+from facilities.models import Facility, FacilityExportExcelMaterialView
+
+from ..backends import (
+    ElasticSearchBackend, PostgresSearchBackend, get_search_backend)
+from ..filters import AutoCompleteSearchFilter, SearchFilter
+from ..search_utils import ElasticAPI
+
+
+class TestPostgresSearchBackend(TestCase):
+
+    def setUp(self):
+        self.backend = PostgresSearchBackend()
+        self.nairobi = mommy.make(
+            Facility, name='Nairobi West Hospital', official_name=None)
+        self.kisumu = mommy.make(
+            Facility, name='Kisumu County Hospital', official_name=None)
+        self.clinic = mommy.make(
+            Facility, name='Nairobi Women Clinic', official_name=None)
+        super(TestPostgresSearchBackend, self).setUp()
+
+    def _search(self, query, search_type='full_text'):
+        return list(
+            self.backend.search(Facility.objects.all(), query, search_type))
+
+    def test_full_text_search(self):
+        results = self._search('nairobi hospital')
+        self.assertEquals(self.nairobi, results[0])
+
+    def test_misspelt_terms_match(self):
+        self.assertIn(self.kisumu, self._search('Kisumo County Hospitl'))
+
+    def test_auto_complete_matches_prefixes(self):
+        results = self._search('nair', 'auto_complete')
+        self.assertEquals(
+            set([self.nairobi, self.clinic]), set(results))
+
+    def test_search_by_code(self):
+        facility = mommy.make(Facility, name='Coded', code=17780)
+        self.assertEquals([facility], self._search('17780'))
+
+    def test_code_fields(self):
+        self.assertEquals('code', self.backend.get_code_field(Facility))
+        self.assertEquals(
+            'code',
+            self.backend.get_code_field(FacilityExportExcelMaterialView))
+        self.assertIsNone(self.backend.get_code_field(ContactType))
+
+    def test_query_is_not_evaluated(self):
+        self.assertEquals([], self._search("x') | Q(name__icontains='"))
+
+    def test_blank_query(self):
+        self.assertEquals([], self._search('  '))
+
+    def test_search_fields(self):
+        self.assertEquals(
+            ['name', 'official_name'],
+            self.backend.get_search_fields(Facility))
+        self.assertEquals(
+            ['name'], self.backend.get_search_fields(CommunityHealthUnit))
+        self.assertEquals(['name'], self.backend.get_search_fields(County))
+
+    def test_other_models(self):
+        county = mommy.make(County, name='Nairobi')
+        mommy.make(County, name='Mombasa')
+        self.assertEquals(
+            [county],
+            list(self.backend.search(County.objects.all(), 'nairobi')))
+
+
+class TestSearchFilterBackends(TestCase):
+
+    def test_postgres_backend_is_used_without_elasticsearch(self):
+        with patch.object(
+                ElasticAPI, '_is_on', new_callable=PropertyMock) as is_on:
+            is_on.return_value = False
+            self.assertIsInstance(
+                get_search_backend(), PostgresSearchBackend)
+
+            facility = mommy.make(Facility, name='Fig tree medical clinic')
+            mommy.make(Facility, name='Olympus dispensary')
+            qs = Facility.objects.all()
+            self.assertEquals(
+                [facility], list(SearchFilter(name='search').filter(
+                    qs, 'fig tree')))
+            self.assertEquals(
+                [facility], list(AutoCompleteSearchFilter(
+                    name='search').filter(qs, 'fig tr')))
+            self.assertEquals(
+                qs, SearchFilter(name='search').filter(qs, ''))
+
+    def test_elasticsearch_backend_is_preferred(self):
+        with patch.object(
+                ElasticAPI, '_is_on', new_callable=PropertyMock) as is_on:
+            is_on.return_value = True
+            self.assertIsInstance(get_search_backend(), ElasticSearchBackend)
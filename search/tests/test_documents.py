@@ -0,0 +1,105 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from model_mommy import mommy
+
+from common.models import County, SubCounty, Ward
+from facilities.models import (
+    Facility, FacilityService, Service, ServiceCategory)
+
+from ..documents import IndexDocumentSpec, get_indexed_fields
+
+
+class TestIndexDocumentSpec(TestCase):
+
+    def setUp(self):
+        county = mommy.make(County, name='Nairobi')
+        sub_county = mommy.make(SubCounty, name='Westlands', county=county)
+        self.ward = mommy.make(Ward, name='Parklands', sub_county=sub_county)
+        category = mommy.make(ServiceCategory, name='Maternity')
+        self.delivery = mommy.make(
+            Service, name='Delivery', category=category)
+        self.anc = mommy.make(Service, name='ANC', category=category)
+        super(TestIndexDocumentSpec, self).setUp()
+
+    def _facility(self, name, services=()):
+        facility = mommy.make(Facility, name=name, ward=self.ward)
+        for service in services:
+            mommy.make(FacilityService, facility=facility, service=service)
+        return facility
+
+    def _documents(self, queryset):
+        spec = IndexDocumentSpec(queryset.model)
+        return {
+            document['instance_id']: json.loads(document['data'])
+            for document in spec.documents(queryset)
+        }
+
+    def test_indexed_fields_follow_the_search_settings(self):
+        fields = get_indexed_fields(Facility)
+        self.assertEquals('name', fields[0])
+        self.assertIn('facility_services.service_name', fields)
+        self.assertEquals(len(set(fields)), len(fields))
+        self.assertEquals(
+            ['full_name', 'email'], get_indexed_fields(get_user_model()))
+
+    def test_facility_document(self):
+        facility = self._facility(
+            'Parklands Health Centre', [self.delivery, self.anc])
+        document = self._documents(Facility.objects.all())[str(facility.id)]
+
+        self.assertEquals('Parklands Health Centre', document['name'])
+        self.assertEquals('Nairobi', document['county'])
+        self.assertEquals('Parklands', document['ward_name'])
+        self.assertEquals(
+            ['ANC', 'Delivery'],
+            sorted(document['facility_services']['service_name']))
+        self.assertEquals(
+            ['Maternity'], document['facility_services']['category_name'])
+        # only the searched fields are indexed
+        self.assertNotIn('facility_contacts', document)
+        self.assertNotIn('officer_in_charge', document)
+
+    def test_deleted_services_are_not_indexed(self):
+        facility = self._facility('Parklands Health Centre', [self.delivery])
+        facility_service = FacilityService.objects.get(facility=facility)
+        facility_service.deleted = True
+        facility_service.save()
+
+        document = self._documents(Facility.objects.all())[str(facility.id)]
+        self.assertEquals([], document['facility_services']['service_name'])
+
+    def test_joined_lookups(self):
+        user = mommy.make(
+            get_user_model(), first_name='Jane', last_name='Wanjiru',
+            other_names='', email='jane@mfltest.slade360.co.ke')
+        document = self._documents(
+            get_user_model().objects.filter(id=user.id))[str(user.id)]
+        self.assertEquals('Jane Wanjiru', document['full_name'])
+        self.assertEquals('jane@mfltest.slade360.co.ke', document['email'])
+
+    def test_documents_are_built_in_one_query(self):
+        self._facility('Facility 1', [self.delivery])
+        with CaptureQueriesContext(connection) as few:
+            self._documents(Facility.objects.all())
+
+        for i in range(10):
+            self._facility(
+                'Facility {}'.format(i + 2), [self.delivery, self.anc])
+        with CaptureQueriesContext(connection) as many:
+            documents = self._documents(Facility.objects.all())
+
+        self.assertEquals(11, len(documents))
+        self.assertEquals(1, len(few.captured_queries))
+        self.assertEquals(len(few.captured_queries), len(
+            many.captured_queries))
+
+    def test_single_document(self):
+        facility = self._facility('Parklands Health Centre')
+        document = IndexDocumentSpec(Facility).document(facility)
+        self.assertEquals(str(facility.id), document['instance_id'])
+        self.assertEquals('facility', document['instance_type'])
@@ -0,0 +1,156 @@
+from io import StringIO
+
+from mock import patch
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.test.utils import override_settings
+
+from model_mommy import mommy
+
+from common.models import SearchIndexBuild, SearchIndexWrite
+from facilities.models import Facility
+
+from ..reindex import IndexRebuild, IndexRebuildError
+from ..search_utils import ElasticAPI, index_instance
+from .elastic_stub import StubElasticServer
+
+
+REINDEX_SETTINGS = {
+    "ELASTIC_ENABLED": True,
+    "INDEX_NAME": "mfl_test",
+    "SEARCH_RESULT_SIZE": 50,
+    "NON_INDEXABLE_MODELS": [],
+    "FULL_TEXT_SEARCH_FIELDS": {
+        "models": [{"name": "facility", "fields": ["name"]}]
+    },
+    "AUTOCOMPLETE_MODEL_FIELDS": [],
+}
+
+
+@override_settings(SEARCH=REINDEX_SETTINGS)
+class TestIndexRebuild(TestCase):
+
+    def setUp(self):
+        ElasticAPI.breaker.reset()
+        self.stub = StubElasticServer().start()
+        self.stub.indices['mfl_test_v1'] = {}
+        self.stub.aliases['mfl_test'] = set(['mfl_test_v1'])
+        self.facilities = [
+            mommy.make(Facility, name='Facility {}'.format(i))
+            for i in range(3)
+        ]
+        super(TestIndexRebuild, self).setUp()
+
+    def tearDown(self):
+        self.stub.stop()
+        ElasticAPI.breaker.reset()
+        super(TestIndexRebuild, self).tearDown()
+
+    def _rebuild(self, **kwargs):
+        kwargs.setdefault('chunk_size', 2)
+        return IndexRebuild(
+            alias='mfl_test', api=ElasticAPI(url=self.stub.url),
+            models=[Facility], **kwargs)
+
+    def _documents(self, index):
+        return {
+            doc_id: document['name']
+            for (doc_type, doc_id), document in
+            self.stub.indices[index].items()
+        }
+
+    def test_rebuild_swaps_the_alias(self):
+        rebuild = self._rebuild()
+        self.assertEquals(3, rebuild.run())
+
+        index_name = rebuild.build.index_name
+        self.assertTrue(index_name.startswith('mfl_test_v'))
+        self.assertEquals(set([index_name]), self.stub.aliases['mfl_test'])
+        self.assertNotIn('mfl_test_v1', self.stub.indices)
+        self.assertEquals(
+            {str(facility.id): facility.name
+             for facility in self.facilities},
+            self._documents(index_name))
+        self.assertEquals(
+            'DONE', SearchIndexBuild.objects.get(index_name=index_name).status)
+
+    def test_old_index_serves_during_the_rebuild(self):
+        self._rebuild().run()
+
+        # the documents are sent in chunks
+        self.assertEquals(2, len(self.stub.bulk_aliases))
+        for aliases in self.stub.bulk_aliases:
+            self.assertEquals(set(['mfl_test_v1']), aliases['mfl_test'])
+        alias_updates = self.stub.requests_to('POST', '/_aliases')
+        self.assertEquals(1, len(alias_updates))
+
+    def test_keep_old_indices(self):
+        self._rebuild(keep_old=True).run()
+        self.assertIn('mfl_test_v1', self.stub.indices)
+
+    def test_unversioned_index_is_replaced(self):
+        self.stub.aliases = {}
+        self.stub.indices = {'mfl_test': {}}
+        rebuild = self._rebuild()
+        rebuild.run()
+        self.assertNotIn('mfl_test', self.stub.indices)
+        self.assertEquals(
+            set([rebuild.build.index_name]), self.stub.aliases['mfl_test'])
+
+    def test_failed_rebuild_keeps_the_old_index(self):
+        rebuild = self._rebuild()
+        with patch.object(IndexRebuild, 'stream') as stream:
+            stream.side_effect = IndexRebuildError('Bulk indexing failed')
+            with self.assertRaises(IndexRebuildError):
+                rebuild.run()
+
+        self.assertEquals(set(['mfl_test_v1']), self.stub.aliases['mfl_test'])
+        self.assertEquals(['mfl_test_v1'], list(self.stub.indices))
+        build = SearchIndexBuild.objects.get()
+        self.assertEquals('FAILED', build.status)
+        self.assertEquals('Bulk indexing failed', build.except_message)
+
+    def test_writes_during_the_rebuild_go_to_both_indices(self):
+        rebuild = self._rebuild()
+        index_name = rebuild.create_index()
+        facility = self.facilities[0]
+
+        with patch('search.search_utils.ELASTIC_URL', self.stub.url):
+            self.assertTrue(index_instance(
+                'facilities', 'Facility', str(facility.id), 'mfl_test'))
+
+        self.assertIn(str(facility.id), self._documents('mfl_test_v1'))
+        self.assertIn(str(facility.id), self._documents(index_name))
+        write = SearchIndexWrite.objects.get()
+        self.assertEquals(
+            ('facilities', 'Facility', str(facility.id)),
+            (write.app_label, write.model_name, write.object_pk))
+
+    def test_writes_are_replayed_before_the_swap(self):
+        rebuild = self._rebuild()
+        index_name = rebuild.create_index()
+        renamed, removed = self.facilities[:2]
+        for facility in (renamed, removed):
+            SearchIndexWrite.objects.create(
+                build=rebuild.build, app_label='facilities',
+                model_name='Facility', object_pk=str(facility.id))
+            self.stub.indices[index_name][
+                ('facility', str(facility.id))] = {"name": facility.name}
+        Facility.objects.filter(id=renamed.id).update(name='Renamed')
+        Facility.objects.filter(id=removed.id).update(deleted=True)
+
+        self.assertEquals(1, rebuild.replay_writes())
+        self.assertEquals(
+            {str(renamed.id): 'Renamed'}, self._documents(index_name))
+        self.assertFalse(SearchIndexWrite.objects.exists())
+
+    def test_rebuild_index_command(self):
+        out = StringIO()
+        with patch('search.search_utils.ELASTIC_URL', self.stub.url):
+            call_command('rebuild_index', chunk_size=2, stdout=out)
+
+        index_name, = self.stub.aliases['mfl_test']
+        self.assertTrue(index_name.startswith('mfl_test_v'))
+        self.assertNotIn('mfl_test_v1', self.stub.indices)
+        self.assertIn(' documents into {}'.format(index_name), out.getvalue())
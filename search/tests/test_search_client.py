@@ -0,0 +1,163 @@
+import logging
+import time
+
+from mock import patch
+from requests.exceptions import ConnectionError, Timeout
+
+from django.test import TestCase
+from django.test.utils import override_settings
+
+from model_mommy import mommy
+
+from facilities.models import Facility
+
+from ..backends import ElasticSearchBackend
+from ..search_utils import ElasticAPI
+from .elastic_stub import StubElasticServer
+
+
+LOGGER = logging.getLogger(__name__)
+
+SEARCH_CLIENT_SETTINGS = {
+    "ELASTIC_ENABLED": True,
+    "ELASTIC_HEALTH_CHECK_SECONDS": 30,
+    "INDEX_NAME": "test_index",
+    "SEARCH_RESULT_SIZE": 50,
+    "FULL_TEXT_SEARCH_FIELDS": {"models": []},
+    "AUTOCOMPLETE_MODEL_FIELDS": [],
+}
+
+
+@override_settings(SEARCH=SEARCH_CLIENT_SETTINGS)
+class TestElasticClient(TestCase):
+
+    def setUp(self):
+        ElasticAPI.breaker.reset()
+        self.stub = StubElasticServer().start()
+        self.api = ElasticAPI(url=self.stub.url)
+        super(TestElasticClient, self).setUp()
+
+    def tearDown(self):
+        self.stub.stop()
+        ElasticAPI.breaker.reset()
+        super(TestElasticClient, self).tearDown()
+
+    def test_health_is_cached(self):
+        for _ in range(10):
+            self.assertTrue(self.api._is_on)
+        self.assertEquals(1, len(self.stub.requests_to('GET', '/')))
+
+    def test_health_is_checked_again_after_ttl(self):
+        settings = dict(SEARCH_CLIENT_SETTINGS)
+        settings['ELASTIC_HEALTH_CHECK_SECONDS'] = 0
+        with override_settings(SEARCH=settings):
+            self.assertTrue(self.api._is_on)
+            self.assertTrue(self.api._is_on)
+        self.assertEquals(2, len(self.stub.requests_to('GET', '/')))
+
+    def test_disabled(self):
+        settings = dict(SEARCH_CLIENT_SETTINGS)
+        settings['ELASTIC_ENABLED'] = False
+        with override_settings(SEARCH=settings):
+            self.assertFalse(self.api._is_on)
+        self.assertEquals([], self.stub.requests)
+
+    def test_failed_request_opens_breaker(self):
+        self.assertTrue(self.api._is_on)
+        with patch(
+                'search.search_utils.requests.Session.request') as request:
+            request.side_effect = ConnectionError
+            with self.assertRaises(ConnectionError):
+                self.api.get_index('test_index')
+            self.assertFalse(self.api._is_on)
+            # the breaker is open, Elasticsearch is not contacted again
+            self.assertEquals(1, request.call_count)
+
+    def test_unreachable_server(self):
+        self.stub.stop()
+        self.assertFalse(self.api._is_on)
+        self.assertFalse(self.api._is_on)
+
+    def test_requests_time_out(self):
+        self.stub.delay = 0.5
+        with patch('search.search_utils.ELASTIC_TIMEOUT', (1, 0.1)):
+            with self.assertRaises(Timeout):
+                self.api.get_index('test_index')
+        self.assertFalse(self.api._is_on)
+
+    def test_connections_are_pooled(self):
+        for _ in range(20):
+            self.api.get_index('test_index')
+        self.assertEquals(20, len(self.stub.requests))
+        self.assertEquals(1, self.stub.connections)
+
+
+@override_settings(SEARCH=SEARCH_CLIENT_SETTINGS)
+class TestElasticSearchBackend(TestCase):
+
+    def setUp(self):
+        ElasticAPI.breaker.reset()
+        self.facilities = [
+            mommy.make(Facility, name='Facility {}'.format(i))
+            for i in range(5)
+        ]
+        super(TestElasticSearchBackend, self).setUp()
+
+    def tearDown(self):
+        ElasticAPI.breaker.reset()
+        super(TestElasticSearchBackend, self).tearDown()
+
+    def _backend(self, stub):
+        backend = ElasticSearchBackend()
+        backend.api = ElasticAPI(url=stub.url)
+        return backend
+
+    def test_results_follow_hit_order(self):
+        hits = [self.facilities[3].id, self.facilities[0].id,
+                self.facilities[4].id]
+        with StubElasticServer(hits=hits) as stub:
+            backend = self._backend(stub)
+            results = backend.search(Facility.objects.all(), 'facility')
+            self.assertEquals(hits, [facility.id for facility in results])
+
+    def test_no_hits(self):
+        with StubElasticServer() as stub:
+            results = self._backend(stub).search(
+                Facility.objects.all(), 'facility')
+            self.assertEquals([], list(results))
+
+    def test_falls_back_to_postgres_when_search_fails(self):
+        with StubElasticServer() as stub:
+            backend = self._backend(stub)
+        # the server is gone
+        results = backend.search(Facility.objects.all(), 'Facility 2')
+        self.assertEquals(self.facilities[2], list(results)[0])
+
+    def test_search_latency_benchmark(self):
+        """
+        Benchmarks searches against the stub server.
+
+        The health is checked once and every search reuses the same pooled
+        connection, so a search costs a single round trip.
+        """
+        iterations = 200
+        hits = [facility.id for facility in self.facilities]
+        with StubElasticServer(hits=hits) as stub:
+            backend = self._backend(stub)
+            timings = []
+            for _ in range(iterations):
+                start = time.perf_counter()
+                self.assertTrue(backend.is_available())
+                list(backend.search(Facility.objects.all(), 'facility'))
+                timings.append(time.perf_counter() - start)
+
+            timings.sort()
+            LOGGER.info(
+                "{} searches: median {:.2f}ms, p95 {:.2f}ms".format(
+                    iterations, timings[iterations // 2] * 1000,
+                    timings[int(iterations * 0.95)] * 1000))
+            self.assertEquals(1, len(stub.requests_to('GET', '/')))
+            self.assertEquals(
+                iterations,
+                len(stub.requests_to('POST', '/test_index/facility/_search')))
+            self.assertEquals(1, stub.connections)
@@ -122,4 +122,8 @@ setup(
         "python-dateutil",
         "html5lib==0.9999999"
     ],
+    extras_require={
+        # renders JSON with orjson when FAST_JSON_RENDERER is on
+        'fast': ['orjson>=3.9'],
+    },
 )
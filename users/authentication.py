@@ -0,0 +1,130 @@
+"""
+Bearer token authentication backed by a short lived cache of the tokens.
+
+Every API request carries an OAuth2 access token. The token middleware and
+the DRF authentication used to validate it separately, each loading the
+``AccessToken`` and its user from the database. Here a token is validated
+once per request and the result is shared by both. Valid tokens are cached
+with their user, scopes and expiry for ``OAUTH2_TOKEN_CACHE_SECONDS`` so
+that requests with a recently seen token are authenticated without
+queries. A cached token is dropped as soon as it is revoked, changed or
+its user is saved.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.cache import patch_vary_headers
+from oauth2_provider.contrib.rest_framework import OAuth2Authentication
+from oauth2_provider.models import AccessToken
+from oauth2_provider.oauth2_backends import get_oauthlib_core
+
+
+TOKEN_KEY = 'oauth2_token:{}'
+
+
+def _bearer_token(request):
+    auth = request.META.get('HTTP_AUTHORIZATION', '').split()
+    if len(auth) == 2 and auth[0].lower() == 'bearer':
+        return auth[1]
+    return None
+
+
+def token_cache_key(token):
+    return TOKEN_KEY.format(hashlib.sha256(token.encode('utf-8')).hexdigest())
+
+
+def cache_access_token(access_token):
+    seconds = min(
+        settings.OAUTH2_TOKEN_CACHE_SECONDS,
+        int((access_token.expires - timezone.now()).total_seconds()))
+    if seconds <= 0:
+        return
+    cache.set(token_cache_key(access_token.token), {
+        "id": access_token.id,
+        "user": access_token.user,
+        "application_id": access_token.application_id,
+        "scope": access_token.scope,
+        "expires": access_token.expires,
+    }, seconds)
+
+
+def forget_access_tokens(tokens):
+    cache.delete_many([token_cache_key(token) for token in tokens])
+
+
+def forget_user_access_tokens(user_id):
+    forget_access_tokens(AccessToken.objects.filter(
+        user_id=user_id, expires__gt=timezone.now()
+    ).values_list('token', flat=True))
+
+
+def _cached_access_token(token):
+    entry = cache.get(token_cache_key(token))
+    if entry is None or entry['expires'] <= timezone.now():
+        return None
+    user = entry.pop('user')
+    access_token = AccessToken(token=token, user=user, **entry)
+    return user, access_token
+
+
+def authenticate_bearer_token(request):
+    """
+    Returns ``(user, access_token)`` for the request's bearer token or None
+    if the token is not valid. The result is kept on the request so that
+    the token is validated once per request.
+    """
+    http_request = getattr(request, '_request', request)
+    if hasattr(http_request, '_oauth2_identity'):
+        return http_request._oauth2_identity
+
+    identity = None
+    token = _bearer_token(http_request)
+    if token:
+        identity = _cached_access_token(token)
+        if identity is None:
+            valid, oauth_request = get_oauthlib_core().verify_request(
+                request, scopes=[])
+            if valid:
+                cache_access_token(oauth_request.access_token)
+                identity = oauth_request.user, oauth_request.access_token
+            else:
+                http_request.oauth2_error = getattr(
+                    oauth_request, 'oauth2_error', {})
+    http_request._oauth2_identity = identity
+    return identity
+
+
+class CachedOAuth2Authentication(OAuth2Authentication):
+
+    """OAuth2Authentication that validates tokens through the cache"""
+
+    def authenticate(self, request):
+        identity = authenticate_bearer_token(request)
+        if identity is None:
+            request.oauth2_error = getattr(
+                request._request, 'oauth2_error', {})
+        return identity
+
+
+class CachedOAuth2TokenMiddleware(object):
+
+    """
+    Signs in the user of a request's bearer token, like
+    ``oauth2_provider.middleware.OAuth2TokenMiddleware``, sharing the
+    validated token with ``CachedOAuth2Authentication``.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if _bearer_token(request) and (
+                not hasattr(request, 'user') or request.user.is_anonymous):
+            identity = authenticate_bearer_token(request)
+            if identity:
+                request.user = request._cached_user = identity[0]
+        response = self.get_response(request)
+        patch_vary_headers(response, ('Authorization',))
+        return response
@@ -1,7 +1,22 @@
+import uuid
+
 from .models import MflUser
 from django.contrib.auth.hashers import check_password
 from django.contrib.auth.backends import ModelBackend
 from django.conf import settings
+from django.core.cache import cache
+
+
+PERMISSIONS_KEY = 'user_permissions:{}'
+PERMISSIONS_GENERATION_KEY = 'user_permissions_generation'
+
+
+def invalidate_cached_permissions():
+    """
+    Starts a new generation of the cached permissions, done whenever groups,
+    permissions or group memberships change
+    """
+    cache.set(PERMISSIONS_GENERATION_KEY, uuid.uuid4().hex, None)
 
 
 class MflUserAuthBackend(ModelBackend):
@@ -26,4 +41,37 @@ class MflUserAuthBackend(ModelBackend):
             return MflUser.objects.get(pk=user_id)
         except MflUser.DoesNotExist:
             print('ERROR 2')
-            return None
\ No newline at end of file
+            return None
+
+
+class CachedPermissionBackend(ModelBackend):
+
+    """
+    Caches each user's permissions across requests.
+
+    Every request loads its user afresh, so Django's per user object cache
+    of the permissions is rebuilt on every request. The permissions are
+    cached along with the generation they were resolved in and looked up
+    with a single cache read; entries from older generations are ignored.
+    """
+
+    def get_all_permissions(self, user_obj, obj=None):
+        if not user_obj.is_active or user_obj.is_anonymous or \
+                obj is not None:
+            return set()
+        if not hasattr(user_obj, '_perm_cache'):
+            key = PERMISSIONS_KEY.format(user_obj.pk)
+            cached = cache.get_many([key, PERMISSIONS_GENERATION_KEY])
+            generation = cached.get(PERMISSIONS_GENERATION_KEY)
+            entry = cached.get(key)
+            if entry and entry[0] == generation and \
+                    entry[1] == user_obj.is_superuser:
+                user_obj._perm_cache = entry[2]
+            else:
+                perms = super(
+                    CachedPermissionBackend, self).get_all_permissions(
+                    user_obj, obj)
+                cache.set(
+                    key, (generation, user_obj.is_superuser, perms),
+                    settings.PERMISSION_CACHE_SECONDS)
+        return user_obj._perm_cache
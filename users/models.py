@@ -1,5 +1,6 @@
 import reversion
 import datetime
+import time
 import uuid
 
 from smtplib import socket, SMTPAuthenticationError
@@ -14,30 +15,30 @@ from django.contrib.auth.models import (
     AbstractBaseUser, BaseUserManager, PermissionsMixin, Group, Permission
 )
 from django.conf import settings
-from django.template import Context, loader
+from django.template import loader
 from django.core.mail import EmailMultiAlternatives
 
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
 from celery import shared_task
 from oauth2_provider.models import AbstractApplication, AccessToken
 from oauth2_provider.settings import oauth2_settings
+from oauth2_provider.signals import app_authorized
 
 
-@shared_task(name='send_user_email')
-def send_email_on_signup(
-        user_id, email, first_name, employee_number, user_password=None):
-    from common.models import ErrorQueue
-    sent = False
+def build_signup_email(
+        email, first_name, employee_number, user_password=None):
+    """Builds the email that welcomes a newly registered user"""
     html_email_template = loader.get_template(
         "registration/registration_success.html")
-    context = Context(
-        {
-            "email": email,
-            "first_name": first_name,
-            "employee_number": employee_number,
-            "user_password": user_password,
-            "login_url": settings.FRONTEND_URL
-        }
-    )
+    context = {
+        "email": email,
+        "first_name": first_name,
+        "employee_number": employee_number,
+        "user_password": user_password,
+        "login_url": settings.FRONTEND_URL
+    }
     plain_text = loader.get_template("registration/registration_success.txt")
     subject = "Account Created"
     plain_text_content = plain_text.render(context)
@@ -46,6 +47,16 @@ def send_email_on_signup(
     msg = EmailMultiAlternatives(
         subject, plain_text_content, mfl_email, [email])
     msg.attach_alternative(html_content, "text/html")
+    return msg
+
+
+@shared_task(name='send_user_email')
+def send_email_on_signup(
+        user_id, email, first_name, employee_number, user_password=None):
+    from common.models import ErrorQueue
+    sent = False
+    msg = build_signup_email(
+        email, first_name, employee_number, user_password)
     try:
         msg.send()
         sent = True
@@ -263,26 +274,13 @@ class MflUser(AbstractBaseUser, PermissionsMixin):
 
     @property
     def user_groups(self):
-        user_groups = self.groups.all()
-        proxy_groups = ProxyGroup.objects.filter(
-            id__in=[group.id for group in user_groups]
-        )
-
-        reg, admin, county, sub_county, national = (False,) * 5
-
-        for proxy in proxy_groups:
-            reg = True if proxy.is_regulator else reg
-            admin = True if proxy.is_administrator else admin
-            county = True if proxy.is_county_level else county
-            sub_county = True if proxy.is_sub_county_level else sub_county
-            national = True if proxy.is_national else national
-
+        capabilities = CustomGroup.get_capabilities()
+        user_groups = [
+            capabilities.get(group.id, {}) for group in self.groups.all()]
         return {
-            "is_regulator": reg,
-            "is_administrator": admin,
-            "is_county_level": county,
-            "is_national": national,
-            "is_sub_county_level": sub_county
+            "is_{}".format(capability): any(
+                group.get(capability, False) for group in user_groups)
+            for capability in GROUP_CAPABILITIES
         }
 
     @property
@@ -389,8 +387,24 @@ class MFLOAuthApplication(AbstractApplication):
         default_permissions = ('add', 'change', 'delete', 'view', )
 
 
+GROUP_CAPABILITIES = (
+    'regulator', 'administrator', 'county_level', 'national',
+    'sub_county_level')
+
+_GROUP_CAPABILITIES = {}
+
+
 # @encoding.python_2_unicode_compatible
 class CustomGroup(models.Model):
+
+    """
+    What the users in a group can do.
+
+    The capabilities of all the groups are loaded with one query and cached
+    in process. The cache is cleared whenever a custom group is saved or
+    deleted and expires after ``GROUP_CAPABILITIES_CACHE_SECONDS`` so that
+    the changes made in other processes are picked up.
+    """
     group = models.OneToOneField(
         Group, on_delete=models.PROTECT, related_name='custom_group_fields')
     regulator = models.BooleanField(
@@ -409,6 +423,39 @@ class CustomGroup(models.Model):
         help_text='Will the user be creating users below the sub county level '
         'users?')
 
+    @classmethod
+    def get_capabilities(cls):
+        """Returns {group_id: {capability: flag}} for the custom groups"""
+        groups = _GROUP_CAPABILITIES.get('groups')
+        loaded = _GROUP_CAPABILITIES.get('loaded', 0)
+        if groups is None or time.monotonic() - loaded > \
+                settings.GROUP_CAPABILITIES_CACHE_SECONDS:
+            groups = {
+                row[0]: dict(zip(GROUP_CAPABILITIES, row[1:]))
+                for row in cls.objects.values_list(
+                    'group_id', *GROUP_CAPABILITIES)
+            }
+            _GROUP_CAPABILITIES.update(
+                groups=groups, loaded=time.monotonic())
+        return groups
+
+    @classmethod
+    def has_capability(cls, group_id, capability):
+        return cls.get_capabilities().get(group_id, {}).get(
+            capability, False)
+
+    @classmethod
+    def clear_cache(cls):
+        _GROUP_CAPABILITIES.clear()
+
+    def save(self, *args, **kwargs):
+        super(CustomGroup, self).save(*args, **kwargs)
+        self.clear_cache()
+
+    def delete(self, *args, **kwargs):
+        super(CustomGroup, self).delete(*args, **kwargs)
+        self.clear_cache()
+
     def __str__(self):
         return "{}".format(self.group)
 
@@ -419,38 +466,23 @@ class ProxyGroup(Group):
 
     @property
     def is_regulator(self):
-        try:
-            return CustomGroup.objects.get(group=self).regulator
-        except CustomGroup.DoesNotExist:
-            return False
+        return CustomGroup.has_capability(self.id, 'regulator')
 
     @property
     def is_administrator(self):
-        try:
-            return CustomGroup.objects.get(group=self).administrator
-        except CustomGroup.DoesNotExist:
-            return False
+        return CustomGroup.has_capability(self.id, 'administrator')
 
     @property
     def is_national(self):
-        try:
-            return CustomGroup.objects.get(group=self).national
-        except CustomGroup.DoesNotExist:
-            return False
+        return CustomGroup.has_capability(self.id, 'national')
 
     @property
     def is_county_level(self):
-        try:
-            return CustomGroup.objects.get(group=self).county_level
-        except CustomGroup.DoesNotExist:
-            return False
+        return CustomGroup.has_capability(self.id, 'county_level')
 
     @property
     def is_sub_county_level(self):
-        try:
-            return CustomGroup.objects.get(group=self).sub_county_level
-        except CustomGroup.DoesNotExist:
-            return False
+        return CustomGroup.has_capability(self.id, 'sub_county_level')
 
     class Meta(object):
         proxy = True
@@ -459,6 +491,102 @@ class ProxyGroup(Group):
         return self.name
 
 
+@receiver(app_authorized)
+def update_last_login_on_token_issue(sender, request, token, **kwargs):
+    """
+    Record the login as the token is issued instead of polling for it.
+
+    Only active when ``LAST_LOGIN_ON_TOKEN_ISSUE`` is on.
+    """
+    if settings.LAST_LOGIN_ON_TOKEN_ISSUE and token.user_id:
+        MflUser.objects.filter(pk=token.user_id).update(
+            last_login=timezone.now())
+
+
+def _invalidate_linked_profile(sender, instance, **kwargs):
+    from .profile import invalidate_session_profile
+    if instance.user_id is not None:
+        invalidate_session_profile(instance.user_id)
+
+
+def _invalidate_user_profile(sender, instance, **kwargs):
+    from .profile import invalidate_session_profile
+    invalidate_session_profile(instance.pk)
+
+
+def _invalidate_contact_profiles(sender, instance, **kwargs):
+    from common.models import UserContact
+    from .profile import invalidate_session_profile
+    for user_id in UserContact.everything.filter(
+            contact_id=instance.pk).values_list('user_id', flat=True):
+        invalidate_session_profile(user_id)
+
+
+def _invalidate_all_profiles(sender, **kwargs):
+    from .profile import invalidate_session_profile
+    invalidate_session_profile()
+
+
+def _invalidate_member_profiles(sender, instance, reverse, **kwargs):
+    from .profile import invalidate_session_profile
+    if reverse:
+        invalidate_session_profile()
+    else:
+        invalidate_session_profile(instance.pk)
+
+
+# the cached profiles of the signed in users, see users.profile
+for profile_link in (
+        'common.UserCounty', 'common.UserConstituency',
+        'common.UserSubCounty', 'common.UserContact',
+        'facilities.RegulatoryBodyUser', AccessToken):
+    post_save.connect(_invalidate_linked_profile, sender=profile_link)
+    post_delete.connect(_invalidate_linked_profile, sender=profile_link)
+for profile_model in (Group, CustomGroup, JobTitle):
+    post_save.connect(_invalidate_all_profiles, sender=profile_model)
+    post_delete.connect(_invalidate_all_profiles, sender=profile_model)
+post_save.connect(_invalidate_user_profile, sender=MflUser)
+post_save.connect(_invalidate_contact_profiles, sender='common.Contact')
+m2m_changed.connect(
+    _invalidate_member_profiles, sender=MflUser.groups.through)
+m2m_changed.connect(
+    _invalidate_member_profiles, sender=MflUser.user_permissions.through)
+m2m_changed.connect(
+    _invalidate_all_profiles, sender=Group.permissions.through)
+
+
+def _invalidate_cached_permissions(sender, **kwargs):
+    from .backends import invalidate_cached_permissions
+    invalidate_cached_permissions()
+
+
+# the permissions cached by users.backends.CachedPermissionBackend
+for permission_model in (Group, Permission):
+    post_save.connect(_invalidate_cached_permissions, sender=permission_model)
+    post_delete.connect(
+        _invalidate_cached_permissions, sender=permission_model)
+for permission_link in (
+        MflUser.groups.through, MflUser.user_permissions.through,
+        Group.permissions.through):
+    m2m_changed.connect(_invalidate_cached_permissions, sender=permission_link)
+
+
+def _forget_access_token(sender, instance, **kwargs):
+    from .authentication import forget_access_tokens
+    forget_access_tokens([instance.token])
+
+
+def _forget_user_access_tokens(sender, instance, **kwargs):
+    from .authentication import forget_user_access_tokens
+    forget_user_access_tokens(instance.pk)
+
+
+# the tokens cached by users.authentication
+post_save.connect(_forget_access_token, sender=AccessToken)
+post_delete.connect(_forget_access_token, sender=AccessToken)
+post_save.connect(_forget_user_access_tokens, sender=MflUser)
+
+
 # model registration done here
 reversion.register(MFLOAuthApplication, follow=['user'])
 reversion.register(Permission)
@@ -0,0 +1,130 @@
+"""
+The profile of the signed in user, served by ``/api/rest-auth/user/``.
+
+The frontend fetches it on nearly every page load. The user is loaded with
+the areas, regulator, groups and contacts prefetched and the serialized
+profile is cached per user along with an ETag, so that repeated requests
+are answered without serializing the user again, or with a
+``304 Not Modified``.
+
+A profile is cached under the user's generation and a global one. Saving
+the user or the rows linked to it starts a new generation for the user,
+saving groups or job titles starts a new global generation.
+"""
+import hashlib
+import json
+import uuid
+
+from django.conf import settings
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Prefetch
+
+
+PROFILE_KEY = 'session_profile:{}:{}:{}'
+GENERATION_KEY = 'session_profile_generation:{}'
+GLOBAL_GENERATION = 'all'
+
+
+def _generation(name):
+    return cache.get(GENERATION_KEY.format(name)) or '0'
+
+
+def invalidate_session_profile(user_id=None):
+    """
+    Starts a new generation of the user's cached profile, or of all the
+    profiles if no user is given
+    """
+    name = GLOBAL_GENERATION if user_id is None else user_id
+    cache.set(GENERATION_KEY.format(name), uuid.uuid4().hex, None)
+
+
+def _first_active(links):
+    for link in links:
+        if link.active:
+            return link
+    return None
+
+
+def load_profile_user(user_id):
+    """
+    Loads the user with everything the profile needs, the linked area
+    or regulator that the profile shows is set as ``profile_<name>``
+    """
+    from common.models import (
+        UserConstituency, UserContact, UserCounty, UserSubCounty)
+    from facilities.models import RegulatoryBodyUser
+    from .models import MflUser
+
+    user = MflUser.objects.select_related('job_title').prefetch_related(
+        Prefetch(
+            'groups', queryset=Group.objects.prefetch_related('permissions')),
+        Prefetch(
+            'user_counties',
+            queryset=UserCounty.objects.select_related('county', 'user')),
+        Prefetch(
+            'user_constituencies',
+            queryset=UserConstituency.objects.select_related(
+                'constituency__county', 'user')),
+        Prefetch(
+            'user_sub_counties',
+            queryset=UserSubCounty.objects.select_related(
+                'sub_county__county', 'user')),
+        Prefetch(
+            'regulatory_users',
+            queryset=RegulatoryBodyUser.objects.select_related(
+                'regulatory_body', 'user')),
+        Prefetch(
+            'user_contacts',
+            queryset=UserContact.objects.select_related(
+                'contact__contact_type')),
+    ).get(pk=user_id)
+
+    links = {
+        'county': _first_active(user.user_counties.all()),
+        'constituency': _first_active(user.user_constituencies.all()),
+        'sub_county': _first_active(user.user_sub_counties.all()),
+        'regulator': _first_active(user.regulatory_users.all()),
+    }
+    user.profile_county = getattr(links['county'], 'county', None)
+    user.profile_constituency = getattr(
+        links['constituency'], 'constituency', None)
+    user.profile_sub_county = getattr(links['sub_county'], 'sub_county', None)
+    user.profile_regulator = getattr(
+        links['regulator'], 'regulatory_body', None)
+    user.profile_contacts = [
+        {
+            "id": user_contact.id,
+            "contact": user_contact.contact.id,
+            "contact_text": user_contact.contact.contact,
+            "contact_type": user_contact.contact.contact_type.id,
+            "contact_type_name": user_contact.contact.contact_type.name
+        } for user_contact in user.user_contacts.all()
+    ]
+    return user
+
+
+def serialize_profile(user, request=None):
+    from .serializers import SessionProfileSerializer
+    return SessionProfileSerializer(
+        load_profile_user(user.pk), context={'request': request}).data
+
+
+def get_session_profile(user, request=None):
+    """
+    Returns ``(data, etag)`` for the user's profile, from the cache if it
+    has not changed since it was cached
+    """
+    key = PROFILE_KEY.format(
+        _generation(GLOBAL_GENERATION), _generation(user.pk), user.pk)
+    profile = cache.get(key)
+    if profile is None:
+        content = json.dumps(
+            serialize_profile(user, request), cls=DjangoJSONEncoder,
+            sort_keys=True)
+        profile = (
+            json.loads(content),
+            hashlib.sha1(content.encode('utf-8')).hexdigest())
+        cache.set(key, profile, settings.SESSION_PROFILE_CACHE_SECONDS)
+    return profile
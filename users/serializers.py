@@ -550,6 +550,32 @@ class MflUserSerializer(PartialResponseMixin, serializers.ModelSerializer):
         ]
 
 
+class SessionProfileSerializer(MflUserSerializer):
+
+    """
+    Represents the signed in user the way ``MflUserSerializer`` does, from a
+    user loaded by ``users.profile.load_profile_user``.
+    """
+    all_permissions = serializers.SerializerMethodField()
+    regulator = serializers.ReadOnlyField(source='profile_regulator.id')
+    regulator_name = serializers.ReadOnlyField(
+        source='profile_regulator.name')
+    county = serializers.ReadOnlyField(source='profile_county.id')
+    county_name = serializers.ReadOnlyField(source='profile_county.name')
+    constituency = serializers.ReadOnlyField(source='profile_constituency.id')
+    constituency_name = serializers.ReadOnlyField(
+        source='profile_constituency.name')
+    sub_county_name = serializers.ReadOnlyField(
+        source='profile_sub_county.name')
+    contacts = serializers.ReadOnlyField(source='profile_contacts')
+
+    def get_all_permissions(self, user):
+        return sorted(user.get_all_permissions())
+
+    class Meta(MflUserSerializer.Meta):
+        pass
+
+
 class MFLOAuthApplicationSerializer(serializers.ModelSerializer):
 
     """This powers the creation of OAuth2 applications"""
@@ -1,17 +1,99 @@
-import pydoc
+import socket
 import logging
+import datetime
 
-from django.core.mail import mail_admins
+from collections import defaultdict
+from smtplib import SMTPException
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.core.mail import mail_admins, get_connection
+from django.utils import timezone
 
 from celery.task.schedules import crontab
 from celery.decorators import periodic_task
 
+from oauth2_provider.models import AccessToken
+from oauth2_provider.settings import oauth2_settings
+
 from common.models import ErrorQueue
-from users.models import send_email_on_signup, MflUser
+from users.models import build_signup_email, MflUser
 
 
 LOGGER = logging.getLogger(__name__)
 
+RETRY_BACKOFF_BASE = datetime.timedelta(minutes=1)
+RETRY_BACKOFF_MAX = datetime.timedelta(days=1)
+
+
+def _next_attempt_at(retries, now):
+    """Exponential backoff; doubles the wait after every failed retry"""
+    backoff = RETRY_BACKOFF_BASE * (2 ** retries)
+    return now + min(backoff, RETRY_BACKOFF_MAX)
+
+
+def _load_error_queue_objects(errors):
+    """
+    Loads the instances referred to by the error queue rows.
+
+    The rows are grouped by model so that there is a single query per model.
+    Returns {(app_label, model_name, object_pk): instance}
+    """
+    pks_by_model = defaultdict(list)
+    for error in errors:
+        pks_by_model[(error.app_label, error.model_name)].append(
+            error.object_pk)
+
+    instances = {}
+    for (app_label, model_name), pks in pks_by_model.items():
+        model = apps.get_model(app_label, model_name)
+        for pk, instance in model.objects.in_bulk(pks).items():
+            instances[(app_label, model_name, str(pk))] = instance
+    return instances
+
+
+def _build_signup_emails(errors):
+    """Returns [(error, message)] for the errors whose users still exist"""
+    instances = _load_error_queue_objects(errors)
+    messages = []
+    for error in errors:
+        instance = instances.get(
+            (error.app_label, error.model_name, str(error.object_pk)))
+        if instance is None:
+            LOGGER.info("The user has been deleted")
+            continue
+        messages.append((error, build_signup_email(
+            instance.email, instance.first_name, instance.employee_number)))
+    return messages
+
+
+def _send_messages(messages):
+    """
+    Sends [(error, message)] over one SMTP connection.
+
+    Returns the errors whose messages were sent and those that failed.
+    """
+    sent, failed = [], []
+    mail_connection = get_connection()
+    try:
+        mail_connection.open()
+    except (socket.error, SMTPException):
+        LOGGER.exception("Unable to connect to the email server")
+        return sent, [error for error, _ in messages]
+    try:
+        for error, message in messages:
+            message.connection = mail_connection
+            try:
+                message.send()
+                sent.append(error)
+            except (socket.error, SMTPException):
+                failed.append(error)
+    finally:
+        mail_connection.close()
+    return sent, failed
+
 
 @periodic_task(
     run_every=(crontab(minute='*/1')),
@@ -20,33 +102,72 @@ LOGGER = logging.getLogger(__name__)
 def resend_user_signup_emails():
     """
     Resends emails that failed to be sent during user registration
+
+    All the due emails are sent over one SMTP connection. Failed emails are
+    retried with an exponential backoff and the admins get a single alert
+    per run about the emails that keep failing.
     """
+    now = timezone.now()
+    errors = list(ErrorQueue.objects.filter(
+        error_type='SEND_EMAIL_ERROR').filter(
+        Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=now)))
+    if not errors:
+        return
+
+    sent, failed = _send_messages(_build_signup_emails(errors))
+    if sent:
+        ErrorQueue.objects.filter(id__in=[error.id for error in sent]).delete()
+
+    for error in failed:
+        error.retries = error.retries + 1
+        error.next_attempt_at = _next_attempt_at(error.retries, now)
+    if failed:
+        ErrorQueue.objects.bulk_update(failed, ['retries', 'next_attempt_at'])
+
+    persistent_failures = [error for error in failed if error.retries > 2]
+    if persistent_failures:
+        mail_admins(
+            subject="Send User Email Error",
+            message="Sending emails to users on registration is "
+            "failing for {} users. Check the email settings in the "
+            "environment".format(len(persistent_failures))
+        )
+    LOGGER.info("Resent {} user emails, {} failed".format(
+        len(sent), len(failed)))
+
+
+SYNC_LAST_LOGIN_SQL = """
+UPDATE {user_table} AS u
+SET last_login = t.token_login
+FROM (
+    SELECT user_id, MAX(expires) - %s AS token_login
+    FROM {token_table}
+    WHERE user_id IS NOT NULL
+    GROUP BY user_id
+) AS t
+WHERE u.id = t.user_id
+AND NOT u.deleted
+AND (u.last_login IS NULL OR u.last_login < t.token_login);
+"""
+
+
+def sync_last_logins():
+    """
+    Sets each user's last_login to their latest token login in one statement.
+
+    A token login is derived from the latest access token expiry, the same
+    way as ``MflUser.lastlog``. Only the rows whose last_login is older than
+    the token login are written. Returns the number of rows touched.
+    """
+    sql = SYNC_LAST_LOGIN_SQL.format(
+        user_table=connection.ops.quote_name(MflUser._meta.db_table),
+        token_table=connection.ops.quote_name(AccessToken._meta.db_table))
+    delta = datetime.timedelta(
+        seconds=oauth2_settings.ACCESS_TOKEN_EXPIRE_SECONDS)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [delta])
+        return cursor.rowcount
 
-    objects_with_errors = ErrorQueue.objects.filter(
-        error_type='SEND_EMAIL_ERROR')
-    for obj in objects_with_errors:
-        obj_path = "{0}.models.{1}".format(obj.app_label, obj.model_name)
-        model = pydoc.locate(obj_path)
-        try:
-            instance = model.objects.get(id=obj.object_pk)
-            user_id = instance.id
-            email = instance.email
-            first_name = instance.first_name
-            employee_number = instance.employee_number
-            mail_sent = send_email_on_signup(
-                user_id, email, first_name, employee_number)
-            if mail_sent:
-                obj.delete()
-            else:
-                obj.retries = obj.retries + 1
-                obj.save()
-                mail_admins(
-                    subject="Send User Email Error",
-                    message="Sending emails to users on registration is "
-                    "failing. Check the email settings in the environment"
-                ) if obj.retries > 2 else None
-        except MflUser.DoesNotExist:
-            LOGGER.info("The user has been deleted")
 
 @periodic_task(
     run_every=(crontab(minute='*/1')),
@@ -55,9 +176,12 @@ def resend_user_signup_emails():
 def update_user_last_login():
     """
     Synchronize last login for token and session based authentications
+
+    This is not needed when last_login is updated as tokens are issued
+    i.e when ``LAST_LOGIN_ON_TOKEN_ISSUE`` is on.
     """
-    for user in MflUser.objects.all():
-        user.last_login = user.lastlog
-        user.save()
-        LOGGER.info(user.lastlog)
-        print user.email, user.last_login
+    if settings.LAST_LOGIN_ON_TOKEN_ISSUE:
+        return 0
+    rows_touched = sync_last_logins()
+    LOGGER.info("Updated the last login of {} users".format(rows_touched))
+    return rows_touched
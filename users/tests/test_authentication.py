@@ -0,0 +1,97 @@
+import datetime
+
+from django.core.cache import cache
+from django.core.urlresolvers import reverse
+from django.test import RequestFactory
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from mock import patch
+from model_mommy import mommy
+from oauth2_provider.models import AccessToken
+from rest_framework.test import APITestCase
+
+from ..authentication import (
+    CachedOAuth2Authentication,
+    authenticate_bearer_token,
+    token_cache_key
+)
+from ..models import MflUser, MFLOAuthApplication
+
+
+@override_settings(CACHES={
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "oauth2-tokens",
+    }
+})
+class TestCachedOAuth2Authentication(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = mommy.make(MflUser, is_active=True)
+        self.app = MFLOAuthApplication.objects.create(
+            name="test", user=self.user, client_type="confidential",
+            authorization_grant_type="password")
+        self.expires = timezone.now() + datetime.timedelta(hours=1)
+        self.token = AccessToken.objects.create(
+            user=self.user, application=self.app, token="token_1",
+            expires=self.expires, scope="read write")
+        super(TestCachedOAuth2Authentication, self).setUp()
+
+    def _request(self, token="token_1"):
+        return RequestFactory().get(
+            '/api/', HTTP_AUTHORIZATION='Bearer {}'.format(token))
+
+    def test_cached_token_is_validated_without_queries(self):
+        user, access_token = authenticate_bearer_token(self._request())
+        self.assertEquals(self.user.id, user.id)
+        self.assertIsNotNone(cache.get(token_cache_key("token_1")))
+
+        with self.assertNumQueries(0):
+            user, access_token = authenticate_bearer_token(self._request())
+        self.assertEquals(self.user.id, user.id)
+        self.assertEquals(self.token.id, access_token.id)
+        self.assertTrue(access_token.is_valid(['read']))
+        self.assertFalse(access_token.allow_scopes(['admin']))
+
+    def test_token_validated_once_per_request(self):
+        request = self._request()
+        user = authenticate_bearer_token(request)[0]
+        with self.assertNumQueries(0):
+            user_again, _ = CachedOAuth2Authentication().authenticate(
+                type('DRFRequest', (object,), {'_request': request})())
+        self.assertIs(user, user_again)
+
+    def test_invalid_token(self):
+        self.assertIsNone(authenticate_bearer_token(self._request("nope")))
+        self.assertIsNone(cache.get(token_cache_key("nope")))
+
+    def test_expired_token_is_rejected(self):
+        authenticate_bearer_token(self._request())
+        later = self.expires + datetime.timedelta(seconds=1)
+        with patch('django.utils.timezone.now', return_value=later):
+            self.assertIsNone(authenticate_bearer_token(self._request()))
+
+    def test_revoked_token_is_rejected(self):
+        authenticate_bearer_token(self._request())
+        self.token.revoke()
+        self.assertIsNone(cache.get(token_cache_key("token_1")))
+        self.assertIsNone(authenticate_bearer_token(self._request()))
+
+    def test_saving_the_user_drops_the_cached_tokens(self):
+        authenticate_bearer_token(self._request())
+        self.user.first_name = 'Renamed'
+        self.user.save()
+        self.assertIsNone(cache.get(token_cache_key("token_1")))
+        user, _ = authenticate_bearer_token(self._request())
+        self.assertEquals('Renamed', user.first_name)
+
+    def test_api_requests_with_a_revoked_token(self):
+        url = reverse("api:users:mfl_users_list")
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer token_1')
+        self.assertEquals(200, self.client.get(url).status_code)
+        self.assertEquals(200, self.client.get(url).status_code)
+
+        self.token.revoke()
+        self.assertEquals(401, self.client.get(url).status_code)
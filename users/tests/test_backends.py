@@ -0,0 +1,67 @@
+from django.contrib.auth.models import Group, Permission
+from django.core.cache import cache
+from django.test import TestCase
+from django.test.utils import override_settings
+
+from model_mommy import mommy
+
+from ..backends import CachedPermissionBackend
+from ..models import MflUser
+
+
+@override_settings(CACHES={
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "permissions",
+    }
+})
+class TestCachedPermissionBackend(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.backend = CachedPermissionBackend()
+        self.group = mommy.make(Group)
+        self.permission = Permission.objects.get(
+            codename='view_classified_facilities')
+        self.group.permissions.add(self.permission)
+        self.user = mommy.make(MflUser, is_active=True, is_superuser=False)
+        self.user.groups.add(self.group)
+        super(TestCachedPermissionBackend, self).setUp()
+
+    def _fresh_user(self):
+        # each request loads its own user
+        return MflUser.objects.get(pk=self.user.pk)
+
+    def test_permissions_are_cached_across_requests(self):
+        self.assertTrue(self.backend.has_perm(
+            self._fresh_user(), 'facilities.view_classified_facilities'))
+
+        user = self._fresh_user()
+        with self.assertNumQueries(0):
+            self.assertTrue(self.backend.has_perm(
+                user, 'facilities.view_classified_facilities'))
+            self.assertFalse(self.backend.has_perm(
+                user, 'facilities.view_closed_facilities'))
+
+    def test_group_permission_changes_are_picked_up(self):
+        self.backend.get_all_permissions(self._fresh_user())
+        self.group.permissions.remove(self.permission)
+        self.assertFalse(self.backend.has_perm(
+            self._fresh_user(), 'facilities.view_classified_facilities'))
+
+    def test_membership_changes_are_picked_up(self):
+        self.backend.get_all_permissions(self._fresh_user())
+        self.user.groups.remove(self.group)
+        self.assertEquals(
+            set(), self.backend.get_all_permissions(self._fresh_user()))
+
+    def test_superuser_changes_are_picked_up(self):
+        self.backend.get_all_permissions(self._fresh_user())
+        MflUser.objects.filter(pk=self.user.pk).update(is_superuser=True)
+        self.assertTrue(self.backend.has_perm(
+            self._fresh_user(), 'facilities.view_closed_facilities'))
+
+    def test_inactive_users_have_no_permissions(self):
+        MflUser.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEquals(
+            set(), self.backend.get_all_permissions(self._fresh_user()))
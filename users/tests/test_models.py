@@ -224,3 +224,34 @@ class TestCustomAndProxyGroup(TestCase):
         self.assertFalse(proxy_group.is_national)
         self.assertFalse(proxy_group.is_county_level)
         self.assertFalse(proxy_group.is_sub_county_level)
+
+    def test_group_capabilities_are_cached(self):
+        groups = mommy.make(Group, _quantity=3)
+        for group in groups:
+            mommy.make(CustomGroup, group=group, county_level=True)
+        self.user.groups.add(*groups)
+        CustomGroup.clear_cache()
+        self.user.user_groups
+
+        with self.assertNumQueries(1):
+            # the user's groups
+            self.assertTrue(self.user.user_groups['is_county_level'])
+        proxy_groups = list(ProxyGroup.objects.filter(
+            id__in=[group.id for group in groups]))
+        with self.assertNumQueries(0):
+            for group in proxy_groups:
+                self.assertTrue(group.is_county_level)
+                self.assertFalse(group.is_national)
+
+    def test_group_capabilities_cleared_on_save(self):
+        group = mommy.make(Group)
+        custom_group = mommy.make(CustomGroup, group=group)
+        proxy_group = ProxyGroup.objects.get(id=group.id)
+        self.assertFalse(proxy_group.is_national)
+
+        custom_group.national = True
+        custom_group.save()
+        self.assertTrue(proxy_group.is_national)
+
+        custom_group.delete()
+        self.assertFalse(proxy_group.is_national)
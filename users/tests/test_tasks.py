@@ -1,12 +1,23 @@
+import datetime
+
 from mock import patch
 from socket import gaierror
 from smtplib import SMTPAuthenticationError
 
+from django.core import mail
+from django.core.mail import get_connection
 from django.core.management import call_command
+from django.test import override_settings
+from django.utils import timezone
+from model_mommy import mommy
+from oauth2_provider.models import AccessToken
+from oauth2_provider.settings import oauth2_settings
+from oauth2_provider.signals import app_authorized
 
 from common.tests.test_models import BaseTestCase
 from common.models import ErrorQueue
-from ..models import MflUser
+from ..models import MflUser, MFLOAuthApplication
+from ..tasks import update_user_last_login, resend_user_signup_emails
 
 
 class TestMflUserModel(BaseTestCase):
@@ -117,6 +128,11 @@ class TestMflUserModel(BaseTestCase):
             error_queue_object = ErrorQueue.objects.all()[0]
             self.assertEquals(1, error_queue_object.retries)
 
+            # not retried until the backoff elapses
+            call_command("resend_user_emails")
+            self.assertEquals(1, ErrorQueue.objects.all()[0].retries)
+
+            ErrorQueue.objects.update(next_attempt_at=timezone.now())
             call_command("resend_user_emails")
             self.assertEquals(1, ErrorQueue.objects.count())
             error_queue_object = ErrorQueue.objects.all()[0]
@@ -125,3 +141,106 @@ class TestMflUserModel(BaseTestCase):
             error_queue_object.save
 
         call_command("resend_user_emails")
+
+
+class TestResendUserSignupEmails(BaseTestCase):
+
+    def _queue_user(self, **kwargs):
+        user = mommy.make(MflUser, **kwargs)
+        return ErrorQueue.objects.create(
+            object_pk=str(user.id),
+            app_label='users',
+            model_name='MflUser',
+            error_type='SEND_EMAIL_ERROR',
+            except_message='Error sending user email')
+
+    def test_emails_sent_over_one_connection(self):
+        for i in range(5):
+            self._queue_user(email='user{}@example.com'.format(i))
+
+        with patch('users.tasks.get_connection',
+                   wraps=get_connection) as connection_mock:
+            with self.assertNumQueries(3):
+                # the due rows, the users and deleting the sent rows
+                resend_user_signup_emails()
+
+        self.assertEqual(1, connection_mock.call_count)
+        self.assertEqual(5, len(mail.outbox))
+        self.assertEqual(0, ErrorQueue.objects.count())
+
+    def test_backoff_and_single_admin_alert(self):
+        for i in range(3):
+            self._queue_user(email='user{}@example.com'.format(i))
+        ErrorQueue.objects.update(retries=2)
+
+        with patch('django.core.mail.EmailMultiAlternatives.send') as send_mock:  # noqa
+            send_mock.side_effect = gaierror
+            with patch('users.tasks.mail_admins') as mail_admins_mock:
+                resend_user_signup_emails()
+
+        self.assertEqual(1, mail_admins_mock.call_count)
+        for error in ErrorQueue.objects.all():
+            self.assertEqual(3, error.retries)
+            self.assertTrue(
+                error.next_attempt_at >
+                timezone.now() + datetime.timedelta(minutes=7))
+
+        # none of the rows are due yet
+        with self.assertNumQueries(1):
+            resend_user_signup_emails()
+
+
+class TestUpdateUserLastLogin(BaseTestCase):
+
+    def setUp(self):
+        super(TestUpdateUserLastLogin, self).setUp()
+        self.app = MFLOAuthApplication.objects.create(
+            name="test", user=self.user, client_type="confidential",
+            authorization_grant_type="password"
+        )
+        self.token_user = mommy.make(MflUser, last_login=None)
+        self.idle_user = mommy.make(MflUser, last_login=None)
+        self.expires = timezone.now() + datetime.timedelta(hours=1)
+        AccessToken.objects.create(
+            user=self.token_user, application=self.app, token="token_1",
+            expires=self.expires, scope="read write")
+        self.token_login = self.expires - datetime.timedelta(
+            seconds=oauth2_settings.ACCESS_TOKEN_EXPIRE_SECONDS)
+
+    def test_only_changed_rows_are_touched(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(1, update_user_last_login())
+
+        self.assertEqual(
+            self.token_login,
+            MflUser.objects.get(id=self.token_user.id).last_login)
+        self.assertIsNone(MflUser.objects.get(id=self.idle_user.id).last_login)
+        self.assertEqual(
+            self.token_user.lastlog,
+            MflUser.objects.get(id=self.token_user.id).last_login)
+
+        # nothing has changed since the last run
+        self.assertEqual(0, update_user_last_login())
+
+    def test_later_session_login_is_kept(self):
+        session_login = self.token_login + datetime.timedelta(minutes=5)
+        MflUser.objects.filter(id=self.token_user.id).update(
+            last_login=session_login)
+        self.assertEqual(0, update_user_last_login())
+        self.assertEqual(
+            session_login,
+            MflUser.objects.get(id=self.token_user.id).last_login)
+
+    @override_settings(LAST_LOGIN_ON_TOKEN_ISSUE=True)
+    def test_polling_skipped_in_event_mode(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(0, update_user_last_login())
+
+    @override_settings(LAST_LOGIN_ON_TOKEN_ISSUE=True)
+    def test_last_login_updated_on_token_issue(self):
+        token = AccessToken.objects.create(
+            user=self.idle_user, application=self.app, token="token_2",
+            expires=self.expires, scope="read write")
+        app_authorized.send(sender=self, request=None, token=token)
+        self.assertIsNotNone(
+            MflUser.objects.get(id=self.idle_user.id).last_login)
@@ -2,6 +2,11 @@ import json
 
 from django.core.urlresolvers import reverse
 from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext, override_settings
 
 from rest_framework.test import APITestCase
 from rest_framework.exceptions import ValidationError
@@ -13,7 +18,9 @@ from common.models import (
     ContactType, Contact, UserContact, SubCounty, UserSubCounty)
 from common.tests.test_views import LoginMixin
 from ..models import MflUser, CustomGroup
-from ..serializers import _lookup_groups, GroupSerializer
+from ..serializers import (
+    _lookup_groups, GroupSerializer, MflUserSerializer)
+from ..views import UserList
 
 
 class TestLogin(APITestCase):
@@ -675,6 +682,194 @@ class TestUserFiltering(APITestCase):
         self.assertEquals(2, len(response.data.get('results')))
 
 
+class TestUserListVisibility(APITestCase):
+
+    """
+    The users each tier of administrator sees are found in one query,
+    however many users there are
+    """
+
+    def setUp(self):
+        self.county = mommy.make(County)
+        self.constituency = mommy.make(Constituency, county=self.county)
+        other_constituency = mommy.make(Constituency)
+        self.county_user = mommy.make(MflUser)
+        self.constituency_user = mommy.make(MflUser)
+        self.other_county_user = mommy.make(MflUser)
+        self.other_constituency_user = mommy.make(MflUser)
+        mommy.make(UserCounty, user=self.county_user, county=self.county)
+        mommy.make(
+            UserConstituency, user=self.constituency_user,
+            constituency=self.constituency, created_by=self.county_user,
+            updated_by=self.county_user)
+        mommy.make(UserCounty, user=self.other_county_user)
+        mommy.make(
+            UserConstituency, user=self.other_constituency_user,
+            constituency=other_constituency, created_by=self.county_user,
+            updated_by=self.county_user)
+        super(TestUserListVisibility, self).setUp()
+
+    def _visible(self, user):
+        request = RequestFactory().get('/')
+        request.user = user
+        view = UserList()
+        view.request = request
+        queryset = view.get_queryset()
+        with self.assertNumQueries(1):
+            return set(queryset.values_list('id', flat=True))
+
+    def test_county_admin(self):
+        admin = mommy.make(MflUser)
+        mommy.make(UserCounty, user=admin, county=self.county)
+        self.assertEquals(
+            set([self.county_user.id, self.constituency_user.id]),
+            self._visible(admin))
+
+    def test_national_admin(self):
+        admin = mommy.make(MflUser, is_national=True)
+        national_user = mommy.make(MflUser, is_national=True)
+        visible = self._visible(admin)
+        self.assertNotIn(admin.id, visible)
+        self.assertNotIn(national_user.id, visible)
+        self.assertEquals(
+            set(MflUser.objects.filter(
+                is_national=False).values_list('id', flat=True)),
+            visible)
+
+    def test_sub_county_admin(self):
+        sub_county_group = mommy.make(Group)
+        CustomGroup.objects.create(
+            group=sub_county_group, sub_county_level=True)
+        county_group = mommy.make(Group)
+        CustomGroup.objects.create(group=county_group, county_level=True)
+        admin = self.constituency_user
+
+        no_groups = mommy.make(MflUser, created_by=admin)
+        sub_county_only = mommy.make(MflUser, created_by=admin)
+        sub_county_only.groups.add(sub_county_group)
+        mixed = mommy.make(MflUser, created_by=admin)
+        mixed.groups.add(sub_county_group, county_group)
+        not_created = mommy.make(MflUser)
+        not_created.groups.add(sub_county_group)
+
+        self.assertEquals(
+            set([no_groups.id, sub_county_only.id]), self._visible(admin))
+
+    def test_superuser(self):
+        admin = mommy.make(MflUser, is_superuser=True)
+        self.assertEquals(
+            set(MflUser.objects.values_list('id', flat=True)),
+            self._visible(admin))
+
+    def test_user_without_an_area(self):
+        self.assertEquals(set(), self._visible(mommy.make(MflUser)))
+
+
+PROFILE_CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "session-profiles",
+    }
+}
+
+
+@override_settings(CACHES=PROFILE_CACHES)
+class TestSessionProfile(LoginMixin, APITestCase):
+
+    def setUp(self):
+        super(TestSessionProfile, self).setUp()
+        cache.clear()
+        self.url = reverse("api:rest_user_details")
+        self.county = mommy.make(County)
+        mommy.make(UserCounty, user=self.user, county=self.county)
+        group = mommy.make(Group)
+        CustomGroup.objects.create(group=group, county_level=True)
+        self.user.groups.add(group)
+        self.contact_type = mommy.make(ContactType, name='PHONE')
+
+    def _add_contacts(self, count):
+        for i in range(count):
+            contact = mommy.make(
+                Contact, contact_type=self.contact_type,
+                contact='07000000{}'.format(i))
+            mommy.make(UserContact, user=self.user, contact=contact)
+
+    def test_profile_matches_the_user_serializer(self):
+        self._add_contacts(2)
+        response = self.client.get(self.url)
+        self.assertEquals(200, response.status_code)
+        self.user.refresh_from_db()
+
+        expected = json.loads(json.dumps(
+            MflUserSerializer(self.user).data, cls=DjangoJSONEncoder))
+        profile = response.data
+        self.assertEquals(
+            sorted(expected.pop('all_permissions')),
+            profile.pop('all_permissions'))
+        self.assertEquals(expected, profile)
+        self.assertEquals(str(self.county.id), profile['county'])
+        self.assertTrue(profile['user_groups']['is_county_level'])
+
+    def test_queries_do_not_grow_with_the_contacts(self):
+        self._add_contacts(1)
+        with CaptureQueriesContext(connection) as few_contacts:
+            self.client.get(self.url)
+        self._add_contacts(10)
+        with CaptureQueriesContext(connection) as many_contacts:
+            self.client.get(self.url)
+        self.assertEquals(len(few_contacts), len(many_contacts))
+
+    @override_settings(COMPRESSION_MIN_SIZE=0)
+    def test_unchanged_compressed_profile_is_not_sent_again(self):
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEquals('gzip', response['Content-Encoding'])
+        etag = response['ETag']
+        self.assertTrue(etag.startswith('W/'))
+
+        response = self.client.get(
+            self.url, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=etag)
+        self.assertEquals(304, response.status_code)
+
+    def test_unchanged_profile_is_not_sent_again(self):
+        response = self.client.get(self.url)
+        etag = response['ETag']
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEquals(304, response.status_code)
+        profile_tables = [
+            query['sql'] for query in queries
+            if 'common_usercontact' in query['sql']]
+        self.assertEquals([], profile_tables)
+
+    def test_profile_changes_are_served(self):
+        etag = self.client.get(self.url)['ETag']
+        self._add_contacts(1)
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEquals(200, response.status_code)
+        self.assertNotEqual(etag, response['ETag'])
+        self.assertEquals(1, len(response.data['contacts']))
+
+        contact = Contact.objects.get()
+        contact.contact = '0711111111'
+        contact.save()
+        response = self.client.get(self.url)
+        self.assertEquals(
+            '0711111111', response.data['contacts'][0]['contact_text'])
+
+        self.user.first_name = 'Renamed'
+        self.user.save()
+        self.assertEquals(
+            'Renamed', self.client.get(self.url).data['first_name'])
+
+    def test_partial_profile(self):
+        response = self.client.get(self.url, {"fields": "id,email"})
+        self.assertEquals(
+            {"id": self.user.id, "email": self.user.email},
+            dict(response.data))
+
+
 class TestGroupFilters(LoginMixin, APITestCase):
     def setUp(self):
         self.groups_list_url = reverse("api:users:groups_list")
@@ -2,11 +2,14 @@ from rest_framework import generics
 from rest_framework.generics import GenericAPIView, RetrieveUpdateAPIView
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.views import Response, status
+from dj_rest_auth.views import UserDetailsView
 
 from django.contrib.auth.models import Permission, Group
+from django.utils.cache import patch_cache_control
+from django.db.models import Exists, OuterRef, Q
 from django.shortcuts import get_object_or_404
 
-from common.utilities import CustomRetrieveUpdateDestroyView
+from common.utilities import CustomRetrieveUpdateDestroyView, etag_matches
 from common.models import (
     UserCounty, UserSubCounty, UserConstituency, UserContact)
 
@@ -20,6 +23,7 @@ from .serializers import (
 )
 
 from .filters import MFLUserFilter, PermissionFilter, GroupFilter
+from .profile import get_session_profile
 
 
 class PermissionsListView(generics.ListAPIView):
@@ -44,21 +48,20 @@ class GroupListView(generics.ListCreateAPIView):
 
     def get_queryset(self, *args, **kwargs):
         user = self.request.user
+        groups = ProxyGroup.objects.prefetch_related('permissions')
 
         if user.county:
-            group_ids = [
-                grp.id for grp in ProxyGroup.objects.all()
-                if grp.is_county_level
-            ]
-            return ProxyGroup.objects.filter(id__in=group_ids)
+            capability = 'county_level'
         elif user.sub_county or user.constituency:
-            group_ids = [
-                grp.id for grp in ProxyGroup.objects.all()
-                if grp.is_sub_county_level
-            ]
-            return ProxyGroup.objects.filter(id__in=group_ids)
+            capability = 'sub_county_level'
         else:
-            return ProxyGroup.objects.all()
+            return groups.all()
+        group_ids = [
+            group_id for group_id, capabilities in
+            CustomGroup.get_capabilities().items()
+            if capabilities[capability]
+        ]
+        return groups.filter(id__in=group_ids)
 
 
 class GroupDetailView(CustomRetrieveUpdateDestroyView):
@@ -90,44 +93,30 @@ class UserList(generics.ListCreateAPIView):
     )
 
     def get_queryset(self, *args, **kwargs):
-        from common.models import UserCounty, UserConstituency
         user = self.request.user
         custom_queryset = kwargs.pop('custom_queryset', None)
         if hasattr(custom_queryset, 'count'):
             self.queryset = custom_queryset
-        if user.county and not user.is_national:
-            county_users = [
-                const_user.user.id for const_user in
-                UserCounty.objects.filter(
-                    county=user.county).distinct()
-            ]
-            sub_county_users = [
-                const_user.user.id for const_user in
-                UserConstituency.objects.filter(
-                    constituency__county=user.county).distinct()
-            ]
-            area_users = county_users + sub_county_users
+        county = user.county
+        if county and not user.is_national:
             return self.queryset.filter(
-                id__in=area_users).exclude(id=self.request.user.id)
+                Q(id__in=UserCounty.objects.filter(
+                    county=county).values('user_id')) |
+                Q(id__in=UserConstituency.objects.filter(
+                    constituency__county=county).values('user_id'))
+            ).exclude(id=user.id)
         elif user.is_national and not user.is_superuser:
             return self.queryset.exclude(is_national=True)
 
         elif user.constituency or user.sub_county:
-            all_users = MflUser.objects.all()
-            users_to_see = []
-            sub_county_level_groups = [
-                c_group.group for c_group in
-                CustomGroup.objects.filter(sub_county_level=True)]
-            for user in all_users:
-                users_to_see.append(user.id) if set(
-                    user.groups.all()).issubset(
-                    sub_county_level_groups) else None
-
-                users_to_see.append(user.id) if not user.groups.all() else None
-
+            # only the users whose groups are all sub county level groups
+            other_groups = MflUser.groups.through.objects.filter(
+                mfluser_id=OuterRef('pk')
+            ).exclude(group_id__in=CustomGroup.objects.filter(
+                sub_county_level=True).values('group_id'))
             return self.queryset.filter(
-                id__in=users_to_see, created_by_id=self.request.user.id
-            ).exclude(id=self.request.user.id)
+                ~Exists(other_groups), created_by_id=user.id
+            ).exclude(id=user.id)
         elif user.is_superuser:
             return self.queryset.all()
 
@@ -268,3 +257,26 @@ class MFLOauthApplicationDetailView(CustomRetrieveUpdateDestroyView):
     """View, update and retire specific OAuth2 application authorizations"""
     queryset = MFLOAuthApplication.objects.all()
     serializer_class = MFLOAuthApplicationSerializer
+
+
+class SessionProfileView(UserDetailsView):
+    """
+    The signed in user's profile, served from the cache with an ETag.
+
+    Requests for a subset of the fields are serialized as they come.
+    """
+
+    def get(self, request, *args, **kwargs):
+        if request.query_params.get('fields'):
+            return super(SessionProfileView, self).get(
+                request, *args, **kwargs)
+
+        data, etag = get_session_profile(request.user, request)
+        etag = '"{}"'.format(etag)
+        if etag_matches(request, etag):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(data)
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response